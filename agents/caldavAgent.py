@@ -20,9 +20,17 @@
 2025-05-28
 
 Class to handle CalDav (WebDAV) requests. Based on a NextCloud environment.
-ICS file and User-Agent may be overridden via properties.
+User-Agent may be overridden via properties. If an ICS file is set, a copy of each uploaded event is written to it.
 Current capabilities: 
-  * Events creation: Writes an ICS file with event details and send PUT request
+  * Events creation: Renders an ICS with event details and send PUT request.
+                     With an ETag cache (core/etagCache.py) writes are conditional and unchanged events are skipped
+  * Events rendering: ICS payload only, no network (offline agent, dry-run, archives)
+  * Calendars discovery: PROPFIND on the user calendar home
+  * Events sync: create or update by UID (sync_event), delete (delete_event)
+  * Events verification: calendar-multiget REPORT over the submitted UIDs, MULTIGET_MAX per request (verify_events)
+  * Free/busy: VFREEBUSY request (RFC 6638) to the scheduling outbox, FREEBUSY_MAX addresses per request (free_busy)
+  * Events reading: calendar-query REPORT with time-range, QUERY_WINDOW_DAYS per request, recurring events
+                    expanded by the server (iter_events)
 
 'user_settings' dict format:
        {
@@ -36,8 +44,10 @@ Current capabilities:
            "organizer_role" : "IT",
            "organizer_email" : "info@example.com",
            "location" : "Main Office",
+           "timezone" : "Europe/Rome",
            "report" : "path/to/reports-folder"
        }
+'timezone' is optional: fixed hours events without a timezone (settings or event 'timezone' key) are floating times.
 
 See README.me for full details.
 """
@@ -53,43 +63,84 @@ PROD_URL = "github.com/ynad/calendar-pyhandler"
 
 
 import os
+import uuid
 import logging
-import requests
-from datetime import datetime
-from icalendar import Calendar, Event, Alarm, vCalAddress, vText
-from requests.auth import HTTPBasicAuth
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from urllib.parse import urlparse, unquote
+from datetime import datetime, date, time, timedelta, timezone
+from icalendar import Calendar, Event, Alarm, FreeBusy, vCalAddress, vText
+from core.timezones import get_zone, vtimezone_ical, event_timezone
+from core.attendees import as_list
+from agents.httpTransport import HttpTransport, CircuitOpenError
+from core.settings import require
+from core.etagCache import EtagCache, content_hash
+from core.icsImport import read_events, parse_line, parse_duration, PATTERN_FOLD
 
 
 
 # logger
 logger = logging.getLogger(__name__)
 
+# WebDAV / CalDAV XML namespaces
+NS = {'d': 'DAV:', 'cal': 'urn:ietf:params:xml:ns:caldav'}
+
+# hrefs per calendar-multiget REPORT
+MULTIGET_MAX = 500
+
+# days of events read per calendar-query REPORT
+QUERY_WINDOW_DAYS = 31
+
+# free-busy requests: addresses and days per request
+FREEBUSY_MAX = 50
+FREEBUSY_DAYS = 62
+
 
 
 class CaldavAgent():
 
     def __init__(self,
                 user_settings: dict,
-                ics_file: str = 'tmp_caldav-event.ics',
+                ics_file: str = None,
                 user_agent: str = None,
+                offline: bool = False,
+                etag_cache: EtagCache = None,
         ):
         logger.info("init CaldavAgent")
 
-        # check user settings
-        assert 'server' in user_settings and 'password' in user_settings, 'incomplete CalDav server settings, some keys are missing'
-        assert 'organizer_name' in user_settings and 'organizer_role' in user_settings and 'organizer_email' in user_settings, 'incomplete CalDav user settings, some keys are missing'
+        # check user settings, offline agents only render payloads and need no server
+        if not offline:
+            require(user_settings, ('server', 'username', 'password'), 'CalDav server settings')
+        require(user_settings, ('domain', 'organizer_name', 'organizer_role', 'organizer_email'), 'CalDav user settings')
 
         self.__user_settings = user_settings
         self.ics_file = ics_file
+        self.etag_cache = etag_cache
         self.user_agent = user_agent if user_agent else f"{PROD_NAME}/{VERSION_NUM}"
 
+        # pooled HTTP/1.1 or HTTP/2 client, see httpTransport.py
+        self.__http = None if offline else HttpTransport(user_settings, auth=(user_settings['username'], user_settings['password']))
+
+        # 'lean' payloads skip redundant properties, alarm description is the event name only
+        self.lean = user_settings.get('payload_profile', 'full') == 'lean'
+
+        # addresses and days per free_busy request
+        self.free_busy_limits = (FREEBUSY_MAX, FREEBUSY_DAYS)
+
 
-    def create_event(self, event_data: dict) -> tuple[bool, str]:
-        # compile ICS file
-        self.__create_ics(event_data)
+    # close the pooled connections
+    def close(self) -> None:
+        if self.__http:
+            self.__http.close()
+
+
+    # ics: payload already rendered (e.g. by core/renderPool.py), otherwise compiled here
+    def create_event(self, event_data: dict, ics: bytes = None) -> tuple[bool, str]:
+        # compile ICS
+        data = ics if ics is not None else self.render_event(event_data)
 
         # upload it to caldav server
-        res, msg = self.__webdav_put_ics(event_data['calendar'], event_data['uid'])
+        res, msg = self.__webdav_put_ics(event_data['calendar'], event_data['uid'], data)
 
         # append result message
         msg = f"{event_data['name']}\n{msg}"
@@ -97,8 +148,239 @@ class CaldavAgent():
         return res, msg
 
 
-    # create ICS file with provided event details
-    def __create_ics(self, event_details: dict) -> None:
+    # collection the event is sent to, used to track load per endpoint
+    def endpoint(self, event_data: dict) -> str:
+        return f"{self.__user_settings['server']}/{self.__user_settings['username']}/{event_data['calendar'] or 'personal'}/"
+
+
+    # create or update (same UID) an event, returns (res, msg, server id). On CalDAV the server id is the UID
+    def sync_event(self, event_data: dict, event_id: str = None, ics: bytes = None) -> tuple[bool, str, str]:
+        res, msg = self.create_event(event_data, ics=ics)
+        return res, msg, event_data['uid']
+
+
+    def delete_event(self, event_id: str, calendar: str, group: bool = False) -> tuple[bool, str]:
+        href = f"{calendar}/{event_id}"
+        headers = {'User-Agent': self.user_agent}
+        cached = self.etag_cache.get(href) if self.etag_cache else None
+        if cached and cached[0]:
+            headers['If-Match'] = cached[0]
+
+        try:
+            res = self.__http.request('DELETE', f"{self.__user_settings['server']}/{self.__user_settings['username']}/{href}", headers=headers)
+            # already gone counts as deleted
+            if res.status_code in (200, 204, 404):
+                msg = f"Event deleted ({res.status_code})"
+                logger.info(f"{msg}: {href}")
+                if self.etag_cache:
+                    self.etag_cache.drop(href)
+                return True, msg
+            msg = f"ERROR: {res.status_code}, {res.reason}: {res.text}"
+
+        except CircuitOpenError:
+            raise
+
+        except Exception as exc:
+            msg = str(exc)
+
+        logger.error(f"delete {href}: {msg}")
+        return False, msg
+
+
+    # check events are on the server: refs [(event_id, calendar, group)], one calendar-multiget REPORT per calendar
+    # and MULTIGET_MAX hrefs. Returns the refs not found. Missing events are dropped from the ETag cache, to be sent again
+    def verify_events(self, refs: list) -> list:
+        by_calendar = {}
+        for ref in refs:
+            by_calendar.setdefault(ref[1] or 'personal', []).append(ref)
+
+        base = urlparse(self.__user_settings['server']).path.rstrip('/')
+        missing = []
+        for calendar, cal_refs in by_calendar.items():
+            url = f"{self.__user_settings['server']}/{self.__user_settings['username']}/{calendar}/"
+            path = f"{base}/{self.__user_settings['username']}/{calendar}/"
+            for i in range(0, len(cal_refs), MULTIGET_MAX):
+                chunk = cal_refs[i:i + MULTIGET_MAX]
+                hrefs = "".join(f"<d:href>{escape(path + ref[0])}</d:href>" for ref in chunk)
+                found = self.__multiget(url, hrefs)
+                for ref in chunk:
+                    href = f"{calendar}/{ref[0]}"
+                    if ref[0] in found:
+                        # 202 accepted events had no ETag yet
+                        cached = self.etag_cache.get(href) if self.etag_cache else None
+                        if cached and not cached[0] and found[ref[0]]:
+                            self.etag_cache.set(href, found[ref[0]], cached[1])
+                    else:
+                        missing.append(ref)
+                        if self.etag_cache:
+                            self.etag_cache.drop(href)
+
+        logger.info(f"verify_events: {len(refs) - len(missing)} found, {len(missing)} missing")
+        return missing
+
+
+    # calendar-multiget REPORT, returns {uid: etag} of the hrefs found
+    def __multiget(self, url: str, hrefs: str) -> dict:
+        logger.info(f"webdav: REPORT calendar-multiget {url}")
+        body = ('<?xml version="1.0" encoding="utf-8"?>'
+                '<cal:calendar-multiget xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">'
+                f'<d:prop><d:getetag/></d:prop>{hrefs}</cal:calendar-multiget>')
+        res = self.__http.request('REPORT', url, data=body.encode('utf-8'),
+                                  headers={'Depth': '1', 'Content-Type': 'application/xml; charset=utf-8', 'User-Agent': self.user_agent})
+        if res.status_code != 207:
+            raise Exception(f"Cannot verify events: {res.status_code}, {res.reason}: {res.text}")
+
+        found = {}
+        for response in ET.fromstring(res.content).iterfind('d:response', NS):
+            # missing hrefs have a 404 status, and no propstat
+            status = response.findtext('d:propstat/d:status', '', NS)
+            if ' 200 ' not in status:
+                continue
+            uid = unquote(response.findtext('d:href', '', NS)).rstrip('/').rsplit('/', 1)[-1]
+            found[uid] = response.findtext('d:propstat/d:prop/d:getetag', '', NS) or None
+        return found
+
+
+    # list calendars in the user calendar home: [{'name', 'id', 'group'}], id is the collection name
+    def list_calendars(self) -> list:
+        url = f"{self.__user_settings['server']}/{self.__user_settings['username']}/"
+        logger.info(f"webdav: PROPFIND {url}")
+        body = ('<?xml version="1.0" encoding="utf-8"?>'
+                '<d:propfind xmlns:d="DAV:"><d:prop><d:displayname/><d:resourcetype/></d:prop></d:propfind>')
+        res = self.__http.request('PROPFIND', url, data=body.encode('utf-8'),
+                                  headers={'Depth': '1', 'Content-Type': 'application/xml; charset=utf-8', 'User-Agent': self.user_agent})
+        if res.status_code != 207:
+            raise Exception(f"Cannot list user calendars: {res.status_code}, {res.reason}: {res.text}")
+
+        found = []
+        for response in ET.fromstring(res.content).iterfind('d:response', NS):
+            # only calendar collections
+            if response.find('.//d:resourcetype/cal:calendar', NS) is None:
+                continue
+            cal_id = response.findtext('d:href', '', NS).rstrip('/').rsplit('/', 1)[-1]
+            name = response.findtext('.//d:displayname', '', NS) or cal_id
+            found.append({'name': name, 'id': cal_id, 'group': False})
+
+        logger.info(f"list_calendars: {len(found)} calendars found")
+        return found
+
+
+    # busy intervals of the addresses from start to end (UTC datetimes), one VFREEBUSY request to the scheduling outbox
+    # {address: [(start, end)]}, lowercase addresses, None for addresses without free/busy (unknown, other servers)
+    def free_busy(self, addresses: list, start: datetime, end: datetime) -> dict:
+        cal = Calendar()
+        cal.add("prodid", f"-//{PROD_NAME}//{VERSION_NUM}//{self.__user_settings['domain']}//{PROD_URL}//")
+        cal.add("version", "2.0")
+        cal.add("method", "REQUEST")
+        request = FreeBusy()
+        request.add("uid", f"{uuid.uuid4()}@{self.__user_settings['domain']}")
+        request.add("dtstamp", datetime.now(timezone.utc))
+        request.add("dtstart", start)
+        request.add("dtend", end)
+        request.add("organizer", vCalAddress(f"mailto:{self.__user_settings['organizer_email']}"))
+        for address in addresses:
+            request.add("attendee", vCalAddress(f"mailto:{address}"))
+        cal.add_component(request)
+
+        url = f"{self.__user_settings['server']}/{self.__user_settings['username']}/outbox/"
+        logger.info(f"webdav: POST free-busy {url}, {len(addresses)} addresses, {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+        res = self.__http.request('POST', url, data=cal.to_ical(),
+                                  headers={'Content-Type': 'text/calendar; charset=utf-8', 'User-Agent': self.user_agent})
+        if res.status_code != 200:
+            raise Exception(f"Cannot get free/busy: {res.status_code}, {res.reason}: {res.text}")
+
+        found = {address.lower(): None for address in addresses}
+        for response in ET.fromstring(res.content).iterfind('cal:response', NS):
+            address = response.findtext('cal:recipient/d:href', '', NS).removeprefix('mailto:').lower()
+            status = response.findtext('cal:request-status', '', NS)
+            if not status.startswith('2.'):
+                logger.warning(f"free/busy of {address} not available: {status}")
+                continue
+            found[address] = self.__busy_periods(response.findtext('cal:calendar-data', '', NS))
+        return found
+
+
+    # FREEBUSY periods of a VFREEBUSY reply, FBTYPE=FREE skipped: [(start, end)]
+    @staticmethod
+    def __busy_periods(calendar_data: str) -> list:
+        periods = []
+        for line in PATTERN_FOLD.sub('', calendar_data).splitlines():
+            name, params, value = parse_line(line)
+            if name != 'FREEBUSY' or params.get('FBTYPE', 'BUSY').upper() == 'FREE':
+                continue
+            for period in value.split(','):
+                period_start, _, period_end = period.strip().partition('/')
+                period_start = datetime.strptime(period_start, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)
+                if period_end.startswith(('P', '+P')):
+                    periods.append((period_start, period_start + parse_duration(period_end)))
+                else:
+                    periods.append((period_start, datetime.strptime(period_end, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc)))
+        return periods
+
+
+    # read the events of a calendar from start to end (dates, end excluded), one calendar-query REPORT per window of
+    # QUERY_WINDOW_DAYS, yields a list of 'events_list' items per window. Events spanning windows are yielded once
+    def iter_events(self, start: date, end: date, calendar: str, group: bool = False):
+        url = f"{self.__user_settings['server']}/{self.__user_settings['username']}/{calendar or 'personal'}/"
+        window = start
+        while window < end:
+            window_end = min(window + timedelta(days=QUERY_WINDOW_DAYS), end)
+            lower = datetime.combine(window, time(), timezone.utc)
+            page = []
+            for calendar_data in self.__query(url, lower, datetime.combine(window_end, time(), timezone.utc)):
+                for event in read_events(calendar_data, calendar, False, self.__user_settings['domain']):
+                    # already yielded by the previous window
+                    if window > start and self.__start_utc(event) < lower:
+                        continue
+                    page.append(event)
+            logger.info(f"iter_events: {len(page)} events from {window} to {window_end}")
+            yield page
+            window = window_end
+
+
+    # event start as an aware UTC datetime: dates at UTC midnight, as the query time-range. Naive times are local to
+    # the event TZID, or to the settings timezone (floating times, unknown TZIDs)
+    def __start_utc(self, event: dict) -> datetime:
+        value = event['start']
+        if not isinstance(value, datetime):
+            return datetime.combine(value, time(), timezone.utc)
+        if not value.tzinfo:
+            value = value.replace(tzinfo=get_zone(event.get('timezone') or self.__user_settings.get('timezone') or "UTC"))
+        return value.astimezone(timezone.utc)
+
+
+    # calendar-query REPORT over a time range, returns the calendar-data of the events found
+    def __query(self, url: str, start: datetime, end: datetime) -> list:
+        logger.info(f"webdav: REPORT calendar-query {url}, {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+        time_range = f'start="{start:%Y%m%dT%H%M%SZ}" end="{end:%Y%m%dT%H%M%SZ}"'
+        body = ('<?xml version="1.0" encoding="utf-8"?>'
+                '<cal:calendar-query xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">'
+                f'<d:prop><d:getetag/><cal:calendar-data><cal:expand {time_range}/></cal:calendar-data></d:prop>'
+                '<cal:filter><cal:comp-filter name="VCALENDAR"><cal:comp-filter name="VEVENT">'
+                f'<cal:time-range {time_range}/></cal:comp-filter></cal:comp-filter></cal:filter></cal:calendar-query>')
+        res = self.__http.request('REPORT', url, data=body.encode('utf-8'),
+                                  headers={'Depth': '1', 'Content-Type': 'application/xml; charset=utf-8', 'User-Agent': self.user_agent})
+        if res.status_code != 207:
+            raise Exception(f"Cannot read events: {res.status_code}, {res.reason}: {res.text}")
+
+        return [data.encode('utf-8') for data in
+                (response.findtext('d:propstat/d:prop/cal:calendar-data', '', NS) for response in ET.fromstring(res.content).iterfind('d:response', NS))
+                if data]
+
+
+    # ICS payload for the event, without uploading it
+    def render_event(self, event_data: dict) -> bytes:
+        ics = self.__create_ics(event_data).to_ical()
+
+        # add timezone definition for fixed hours events, generated once per zone and year
+        tz = event_timezone(event_data, self.__user_settings)
+        if tz and not event_data['fullday']:
+            ics = ics.replace(b"BEGIN:VEVENT", vtimezone_ical(tz, event_data['start'].year) + b"BEGIN:VEVENT", 1)
+        return ics
+
+
+    # create ICS calendar with provided event details
+    def __create_ics(self, event_details: dict) -> Calendar:
         # init calendar
         logger.info(f"ICS: create calendar")
         mycal = Calendar()
@@ -114,8 +396,15 @@ class CaldavAgent():
         #myevent.add('name', event_details['name'])
         myevent.add('summary', event_details['name'])
         myevent.add('description', event_details['description'])
-        myevent.add('dtstart', event_details['start'])
-        myevent.add('dtend', event_details['end'])
+        # fixed hours in event timezone, if any, otherwise floating
+        start, end = event_details['start'], event_details['end']
+        tz = event_timezone(event_details, self.__user_settings)
+        if tz and not event_details['fullday']:
+            zone = get_zone(tz)
+            start = start.replace(tzinfo=zone) if start.tzinfo is None else start.astimezone(zone)
+            end = end.replace(tzinfo=zone) if end.tzinfo is None else end.astimezone(zone)
+        myevent.add('dtstart', start)
+        myevent.add('dtend', end)
         myevent.add('status', "confirmed")
 
         # add location
@@ -130,7 +419,8 @@ class CaldavAgent():
         
         # uid - unique event ID
         myevent['uid'] = event_details['uid']
-        myevent.add('priority', 5)
+        if not self.lean:
+            myevent.add('priority', 5)
 
         # add organizer
         logger.info(f"ICS: organizer: {self.__user_settings['organizer_email']}")
@@ -140,12 +430,13 @@ class CaldavAgent():
         myevent['organizer'] = organizer
 
         # add invites if present
-        if 'invite' in event_details:
-            invitees = event_details['invite'].split()
+        invitees = as_list(event_details['invite']) if 'invite' in event_details else []
+        if invitees:
+            logger.info(f"ICS: adding invites for {len(invitees)} attendees")
             for i in invitees:
-                logger.info(f"ICS: adding invite for: {i}")
                 attendee = vCalAddress(f"MAILTO:{i}")
-                attendee.params['CN'] = vText(i)
+                if not self.lean:
+                    attendee.params['CN'] = vText(i)
                 attendee.params['role'] = vText('REQ-PARTICIPANT')
                 attendee.params['PARTSTAT'] = vText('NEEDS-ACTION')
                 attendee.params['RSVP'] = vText('TRUE')
@@ -157,13 +448,11 @@ class CaldavAgent():
             myalarm = Alarm()
             myalarm.add("action", event_details['alarm_type'])
             myalarm.add('summary', event_details['name'])
-            myalarm.add('description', event_details['description'])
+            myalarm.add('description', event_details['name'] if self.lean else event_details['description'])
 
             # if invitees are present, add email notification
-            if 'invite' in event_details:
-                invitees = event_details['invite'].split()
+            if invitees:
                 for i in invitees:
-                    logger.info(f"ICS: alarm invite for: {i}")
                     attendee = vCalAddress(f"MAILTO:{i}")
                     #attendee.params['name'] = vText(i)
                     #attendee.params['role'] = vText('REQ-PARTICIPANT')
@@ -171,54 +460,79 @@ class CaldavAgent():
 
             # set trigger time
             #myalarm.add("trigger", timedelta(days=-reminder_days))
-            if event_details['fullday']:
-                logger.info(f"ICS: fullday event")
-                myalarm.add("TRIGGER;RELATED=START", f"-P{event_details['alarm_time']}{event_details['alarm_format']}")
+            # 'D': days before, 'H': hours and minutes before as "h:mm" (or whole hours)
+            if event_details['alarm_format'] == 'D':
+                logger.info(f"ICS: alarm in days")
+                myalarm.add("TRIGGER;RELATED=START", f"-P{event_details['alarm_time']}D")
             else:
-                logger.info(f"ICS: fixed hours event")
-                myalarm.add("TRIGGER;RELATED=START", f"-PT{event_details['alarm_time']}{event_details['alarm_format']}")
+                logger.info(f"ICS: alarm in hours")
+                hours, _, minutes = str(event_details['alarm_time']).partition(':')
+                myalarm.add("TRIGGER;RELATED=START", f"-PT{int(hours)}H{int(minutes or 0)}M")
             myevent.add_component(myalarm)
 
         # add event to the calendar
         mycal.add_component(myevent)
 
-        # write event to ICS file
-        logger.info(f"ICS: write to file {self.ics_file}")
-        with open(self.ics_file, 'wb') as f:
-            f.write(mycal.to_ical())
-
+        return mycal
 
-    # make PUT request to upload ICS event file to given calendar
-    def __webdav_put_ics(self, calendar: str, event_id: str) -> tuple[bool, str]:
-        # check ICS existance
-        if not os.path.exists(self.ics_file):
-            err = f"ERROR: missing ICS file {self.ics_file}, can't continue"
-            print(err)
-            logger.error(err)
-            return False
 
-        # read ICS ifle
-        logger.info(f"webdav: read ics from file {self.ics_file}")
-        with open(self.ics_file, 'rb') as f:
-            data = f.read()
+    # make PUT request to upload ICS event data to given calendar
+    def __webdav_put_ics(self, calendar: str, event_id: str, data: bytes) -> tuple[bool, str]:
+        # keep a local copy of the ICS, if requested
+        if self.ics_file:
+            logger.info(f"webdav: write ics copy to file {self.ics_file}")
+            with open(self.ics_file, 'wb') as f:
+                f.write(data)
 
         # if calendar is not set go default
         if calendar == None:
             calendar = 'personal'
         logger.info(f"webdav: calendar set to: {calendar}")
 
+        href = f"{calendar}/{event_id}"
+        cached = self.etag_cache.get(href) if self.etag_cache else None
+        ics_hash = content_hash(data) if self.etag_cache else None
+
+        # same content already on the server, no request
+        if cached and cached[1] == ics_hash:
+            msg = f"Event unchanged, skipped"
+            logger.info(f"{msg}: {href}")
+            return True, msg
+
         # make PUT request
         try:
             headers = {
                 'Content-Type': 'text/calendar', 
-                'User-Agent': self.user_agent
+                'User-Agent': self.user_agent,
+                # RFC 8144: no response body needed
+                'Prefer': 'return=minimal'
             }
+            # conditional write: update only the known version, create only if missing
+            if cached and cached[0]:
+                headers['If-Match'] = cached[0]
+            elif self.etag_cache and not cached:
+                headers['If-None-Match'] = '*'
             logger.info(f"webdav: put request headers: {headers}")
 
-            res = requests.put(url=f"{self.__user_settings['server']}/{self.__user_settings['username']}/{calendar}/{event_id}",
-                                data=data,
-                                headers=headers,
-                                auth = HTTPBasicAuth(self.__user_settings['username'], self.__user_settings['password']))
+            url = f"{self.__user_settings['server']}/{self.__user_settings['username']}/{href}"
+            res = self.__http.request('PUT', url, data=data, headers=headers)
+
+            # If-None-Match failed: event already on the server (cache lost, shared calendar, first run with the cache).
+            # Its version is read and our content written over it with If-Match, unless it is the same already
+            if (res.status_code == 412 and 'If-None-Match' in headers):
+                current = self.__http.request('GET', url, headers={'User-Agent': self.user_agent})
+                etag = current.headers.get('ETag')
+                if current.status_code != 200 or not etag:
+                    raise Exception(f"ERROR: {res.status_code}, event already on the server and not readable ({current.status_code}), not overwritten")
+                if content_hash(current.content) == ics_hash:
+                    msg = f"Event already exists, unchanged ({res.status_code})"
+                    logger.info(f"{msg}: {href}")
+                    self.etag_cache.set(href, etag, ics_hash)
+                    return True, msg
+                del headers['If-None-Match']
+                headers['If-Match'] = etag
+                logger.info(f"webdav: {href} already on the server, put again with If-Match: {etag}")
+                res = self.__http.request('PUT', url, data=data, headers=headers)
 
             if (res.status_code == 201):
                 msg = f"Event created ({res.status_code})"
@@ -235,26 +549,28 @@ class CaldavAgent():
                 print(msg)
                 logger.info(msg)
 
+            elif (res.status_code == 412):
+                self.etag_cache.drop(href)
+                raise Exception(f"ERROR: {res.status_code}, event changed on the server meanwhile, not overwritten")
+
             else:
                 msg = (
                     f"ERROR: {res.status_code}, {res.reason}: {res.text}"
                 )
                 raise Exception(msg)
 
+            if self.etag_cache:
+                self.etag_cache.set(href, res.headers.get('ETag'), ics_hash)
             put_ack = True
 
+        # backend down, the caller stops the batch
+        except CircuitOpenError:
+            raise
+
         except Exception as exc:
             print(exc)
             logger.error(exc)
+            msg = str(exc)
             put_ack = False
 
-        finally:
-            # rm tmp ics files
-            if os.path.exists(self.ics_file):
-                logger.info(f"webdav: remove ics file {self.ics_file}")
-                os.remove(self.ics_file)
-            #pass
-
         return put_ack, msg
-
-
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# httpTransport.py
+2025-06-26
+
+HTTP transport shared by agents: one pooled client per agent, instead of a new connection per request.
+  * default:  HTTP/1.1 keep-alive pool (requests.Session), 'http_pool_size' connections (default 10)
+  * 'http2':  HTTP/2 multiplexed connections (httpx.Client), concurrent requests share few connections.
+              true = negotiated via TLS ALPN (https servers), "prior_knowledge" = HTTP/2 also on plain http (h2c).
+              Optional dependency: pip install httpx[http2]. If missing, HTTP/1.1 is used with a warning.
+  * 'gzip_requests': request bodies over GZIP_MIN_SIZE bytes are sent with Content-Encoding: gzip.
+              If the server answers 415 (Unsupported Media Type) the request is sent again uncompressed
+              and compression is disabled for the following ones.
+  * timeouts:  'connect_timeout' (default 5s) and 'read_timeout' (default 30s), no request hangs on a dead server.
+  * circuit breaker per backend host, shared by all transports of the process: after BREAKER_THRESHOLD consecutive
+              failures (connection errors, timeouts, 5xx but 503 + Retry-After) requests fail fast with CircuitOpenError for
+              BREAKER_COOLDOWN seconds, then a single probe request is let through (half-open): success closes it.
+
+Responses expose the requests-like attributes the agents use: status_code, reason, headers, text, content, json().
+"""
+
+import gzip
+import json
+import time
+import logging
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 30.0
+
+# consecutive failures that open the circuit, and seconds before a probe
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# smaller bodies do not pay back compression
+GZIP_MIN_SIZE = 1024
+
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+
+class CircuitBreaker():
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.last_error = ""
+        self.__opened_at = None
+        self.__probing = False
+        self.__lock = threading.Lock()
+
+
+    # raise CircuitOpenError if requests may not be sent now
+    def before(self) -> None:
+        with self.__lock:
+            if self.__opened_at is None:
+                return
+            # half-open: one probe after the cooldown, the others keep failing fast
+            if not self.__probing and time.monotonic() - self.__opened_at >= self.cooldown:
+                self.__probing = True
+                logger.info(f"circuit {self.name}: half-open, probing")
+                return
+            raise CircuitOpenError(f"{self.name} unreachable, requests suspended: {self.last_error}")
+
+
+    def success(self) -> None:
+        with self.__lock:
+            if self.__opened_at is not None:
+                logger.info(f"circuit {self.name}: closed")
+            self.failures = 0
+            self.__opened_at = None
+            self.__probing = False
+
+
+    def failure(self, error: str) -> None:
+        with self.__lock:
+            self.failures += 1
+            self.last_error = error
+            if self.__probing or (self.__opened_at is None and self.failures >= self.threshold):
+                logger.error(f"circuit {self.name}: open after {self.failures} failures, last: {error}")
+                self.__opened_at = time.monotonic()
+            self.__probing = False
+
+
+# backend host -> breaker
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+
+class HttpTransport():
+
+    def __init__(self,
+                user_settings: dict,
+                auth: tuple = None,
+        ):
+        self.http2 = user_settings.get('http2', False)
+        self.gzip = bool(user_settings.get('gzip_requests', False))
+        pool_size = int(user_settings.get('http_pool_size', DEFAULT_POOL_SIZE))
+        connect_timeout = float(user_settings.get('connect_timeout', CONNECT_TIMEOUT))
+        read_timeout = float(user_settings.get('read_timeout', READ_TIMEOUT))
+        self.__timeout = (connect_timeout, read_timeout)
+
+        self.__client = None
+        if self.http2:
+            if httpx is None:
+                logger.warning(f"http2 set but httpx is not installed, using HTTP/1.1. Install with: pip install httpx[http2]")
+                self.http2 = False
+            else:
+                try:
+                    self.__client = httpx.Client(
+                        http2=True,
+                        http1=(self.http2 != 'prior_knowledge'),
+                        auth=auth,
+                        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+                    )
+                except ImportError as exc:
+                    logger.warning(f"http2 set but h2 is not installed, using HTTP/1.1: {exc}")
+                    self.http2 = False
+
+        if not self.__client:
+            self.__client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.__client.mount('http://', adapter)
+            self.__client.mount('https://', adapter)
+            self.__client.auth = auth
+
+        logger.info(f"HttpTransport: {'HTTP/2' if self.http2 else 'HTTP/1.1'}, pool size: {pool_size}, gzip: {self.gzip}, timeouts: {self.__timeout}")
+
+
+    # same arguments as requests.request: headers, data, json
+    def request(self, method: str, url: str, **kwargs):
+        if not self.gzip:
+            return self.__send(method, url, **kwargs)
+
+        # serialize here to compress the body
+        if 'json' in kwargs:
+            kwargs['data'] = json.dumps(kwargs.pop('json')).encode('utf-8')
+            kwargs['headers'] = {'Content-Type': 'application/json'} | (kwargs.get('headers') or {})
+        data = kwargs.get('data')
+        if not data or len(data) < GZIP_MIN_SIZE:
+            return self.__send(method, url, **kwargs)
+
+        response = self.__send(method, url, **(kwargs | {
+            'data': gzip.compress(data, compresslevel=6),
+            'headers': (kwargs.get('headers') or {}) | {'Content-Encoding': 'gzip'}
+        }))
+        if response.status_code == 415:
+            logger.warning(f"gzip request bodies not accepted by the server, compression disabled")
+            self.gzip = False
+            response = self.__send(method, url, **kwargs)
+        return response
+
+
+    def __send(self, method: str, url: str, **kwargs):
+        breaker = get_breaker(url)
+        breaker.before()
+        try:
+            response = self.__request(method, url, **kwargs)
+        except Exception as exc:
+            breaker.failure(repr(exc))
+            raise
+        # 503 with Retry-After is throttling, handled by the caller
+        if response.status_code >= 500 and not (response.status_code == 503 and 'Retry-After' in response.headers):
+            breaker.failure(f"{response.status_code} {response.reason}")
+        else:
+            breaker.success()
+        return response
+
+
+    def __request(self, method: str, url: str, **kwargs):
+        if not self.http2:
+            return self.__client.request(method, url, timeout=self.__timeout, **kwargs)
+
+        # httpx takes raw bodies as content
+        if 'data' in kwargs:
+            kwargs['content'] = kwargs.pop('data')
+        response = self.__client.request(method, url, **kwargs)
+        response.reason = response.reason_phrase
+        return response
+
+
+    def close(self) -> None:
+        self.__client.close()
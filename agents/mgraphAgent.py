@@ -24,6 +24,12 @@ Generates an OAuth access token with interactive user login.
 Token cache file and User-Agent may be overridden via properties.
 Current capabilities: 
   * Events creation: user calendars, shared calendars, group calendars
+  * Events rendering: JSON payload only, no login nor network (offline agent, dry-run)
+  * Calendars discovery: user calendars and Microsoft 365 groups the user is member of
+  * Events sync: create or update by ID (sync_event), delete (delete_event)
+  * Events verification: JSON batching of GETs by event ID, BATCH_MAX per request (verify_events)
+  * Free/busy: getSchedule of up to SCHEDULE_MAX addresses and SCHEDULE_DAYS per request (free_busy)
+  * Events reading: calendarView in UTC, VIEW_PAGE_SIZE per page, recurring events expanded by Graph (iter_events)
 
 'user_settings' dict format:
        {
@@ -37,8 +43,10 @@ Current capabilities:
            "organizer_role" : "IT",
            "organizer_email" : "info@example.com",
            "location" : "Main Office",
+           "timezone" : "Europe/Rome",
            "report" : "path/to/reports-folder"
        }
+'timezone' is optional, default is Europe/Berlin. It may be overridden per event with the event 'timezone' key.
 
 See README.me for full details.
 """
@@ -49,22 +57,45 @@ VERSION_NUM = "0.7.1"
 DEV_EMAIL = "info@danielevercelli.it"
 PROD_NAME = "mgraph-pyAgent"
 PROD_URL = "github.com/ynad/calendar-pyhandler"
+DEFAULT_TIMEZONE = "Europe/Berlin"
 ###################################################################################################
 
 
 
 import os
 import json
+import hashlib
+import regex as re
 import logging
-import requests
 import msal
-from datetime import datetime, timezone
+from datetime import datetime, date, timezone
+from core.timezones import get_zone, event_timezone
+from core.attendees import as_list
+from agents.httpTransport import HttpTransport, CircuitOpenError
+from core.settings import require
 
 
 
 # logger
 logger = logging.getLogger(__name__)
 
+# result message per write method
+WRITE_ACTIONS = {'POST': 'created', 'PATCH': 'updated', 'DELETE': 'deleted'}
+
+# JSON batching limit of Graph, requests per $batch
+BATCH_MAX = 20
+
+# events per calendarView page
+VIEW_PAGE_SIZE = 250
+
+# getSchedule: addresses and days per request, schedule items counted as busy
+SCHEDULE_MAX = 20
+SCHEDULE_DAYS = 62
+BUSY_STATUSES = ('busy', 'oof', 'tentative')
+
+# event ID in Location headers: .../events('ID') or .../events/ID
+PATTERN_LOCATION_ID = re.compile(r"events(?:\('([^']+)'\)|/([^/?]+))")
+
 
 
 class MGraphAgent():
@@ -73,11 +104,12 @@ class MGraphAgent():
                 user_settings: dict,
                 user_agent: str = None,
                 cache_file: str = "token_cache.json",
+                offline: bool = False,
         ):
         logger.info("init MGraphAgent")
 
         # check user settings
-        assert 'azure_client_id' in user_settings and 'azure_tenant_id' in user_settings, 'missing Azure user settings'
+        require(user_settings, ('azure_client_id', 'azure_tenant_id'), 'Azure user settings')
 
         self.__user_settings = user_settings
         self.user_agent = user_agent if user_agent else f"{PROD_NAME}/{VERSION_NUM}"
@@ -98,7 +130,25 @@ class MGraphAgent():
             "https://graph.microsoft.com/offline_access"
         ]
 
-        self.access_token = self.__get_access_token()
+        # offline agents only render payloads, skip login
+        self.access_token = None if offline else self.__get_access_token()
+
+        # pooled HTTP/1.1 or HTTP/2 client, see httpTransport.py
+        self.__http = HttpTransport(user_settings)
+
+        # 'lean' payloads skip read-only and server-defaulted fields
+        self.lean = user_settings.get('payload_profile', 'full') == 'lean'
+
+        # addresses and days per free_busy request
+        self.free_busy_limits = (SCHEDULE_MAX, SCHEDULE_DAYS)
+
+        # EMAIL alarms set as reminders, warned once
+        self.__email_warned = False
+
+
+    # close the pooled connections
+    def close(self) -> None:
+        self.__http.close()
 
 
     def __get_access_token(self) -> str:
@@ -140,42 +190,89 @@ class MGraphAgent():
 
 
     def __request_post(self, url: str, payload: dict) -> tuple[bool, str]:
-        logger.info(f"request POST, url endpoint: {url}, payload: {payload}")
+        res, msg, _ = self.__request_write('POST', url, payload)
+        return res, msg
+
+
+    # POST / PATCH / DELETE request, returns (res, msg, response). minimal: created or updated event is not read back
+    def __request_write(self, method: str, url: str, payload: dict = None, minimal: bool = True) -> tuple[bool, str, object]:
+        logger.info(f"request {method}, url endpoint: {url}, payload: {payload}")
         headers = {
             "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json",
             "User-Agent": self.user_agent
         }
-        response = requests.post(url, headers=headers, json=payload)
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+        if minimal:
+            headers["Prefer"] = "return=minimal"
+        try:
+            response = self.__http.request(method, url, headers=headers, json=payload)
+        # backend down, the caller stops the batch
+        except CircuitOpenError:
+            raise
+        except Exception as exc:
+            msg = f"ERROR: {repr(exc)}"
+            logger.error(msg)
+            return False, msg, None
         logger.debug(f"request headers: {response.request.headers}")
         logger.debug(f"response headers: {response.headers}")
-    
-        if response.status_code == 201:
-            msg = f"Event created ({response.status_code})"
+
+        if response.status_code in (200, 201, 204):
+            msg = f"Event {WRITE_ACTIONS.get(method, 'sent')} ({response.status_code})"
             logger.info(msg)
         else:
             msg = f"ERROR: {response.status_code}, {response.reason}: {response.text}"
             logger.error(msg)
 
-        return bool(response.status_code == 201), msg
+        return bool(response.status_code in (200, 201, 204)), msg, response
+
+
+    # GET request following @odata.nextLink pages, returns all 'value' items
+    def __request_get_all(self, url: str) -> tuple[bool, list]:
+        logger.info(f"request GET, url endpoint: {url}")
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "User-Agent": self.user_agent
+        }
+        items = []
+        while url:
+            response = self.__http.request('GET', url, headers=headers)
+            if response.status_code != 200:
+                msg = f"ERROR: {response.status_code}, {response.reason}: {response.text}"
+                logger.error(msg)
+                return False, msg
+
+            data = response.json()
+            items.extend(data.get('value', []))
+            url = data.get('@odata.nextLink')
+
+        return True, items
+
+
+    # list calendars available to the user: [{'name', 'id', 'group'}]
+    def list_calendars(self) -> list:
+        res, calendars = self.__request_get_all(f"{self.graph_url}/me/calendars?$select=id,name")
+        if not res:
+            raise Exception(f"Cannot list user calendars: {calendars}")
+        found = [{'name': c['name'], 'id': c['id'], 'group': False} for c in calendars]
+
+        # only Microsoft 365 (unified) groups have a calendar
+        res, groups = self.__request_get_all(f"{self.graph_url}/me/memberOf/microsoft.graph.group?$select=id,displayName,groupTypes")
+        if res:
+            found.extend({'name': g['displayName'], 'id': g['id'], 'group': True} for g in groups if 'Unified' in (g.get('groupTypes') or []))
+        else:
+            logger.warning(f"Cannot list user groups: {groups}")
+
+        logger.info(f"list_calendars: {len(found)} calendars found")
+        return found
 
 
     def create_event(self, event_data: dict) -> tuple[bool, str]:
         # prepare event json
         event_details = self.__format_event(event_data)
 
-        # endpoint: personal default calendar
-        if event_data['calendar'] == 'personal':
-            url = f"{self.graph_url}/me/events"
-        # group calendar
-        elif 'group' in event_data and event_data['group']:
-            url = f"{self.graph_url}/groups/{event_data['calendar']}/events"
-        # other calendars (personal/shared)
-        else:
-            url = f"{self.graph_url}/me/calendars/{event_data['calendar']}/events"
-
         # send to ms graph API
-        res, msg = self.__request_post(url, event_details)
+        res, msg = self.__request_post(self.__events_url(event_data['calendar'], event_data.get('group')), event_details)
 
         # append result message
         msg = f"{event_data['name']}\n{msg}"
@@ -184,25 +281,220 @@ class MGraphAgent():
         return res, msg
 
 
+    # create, or update if event_id is given, returns (res, msg, server id). Updates of events deleted on the server create them again
+    def sync_event(self, event_data: dict, event_id: str = None) -> tuple[bool, str, str]:
+        event_details = self.__format_event(event_data)
+        url = self.__events_url(event_data['calendar'], event_data.get('group'))
+
+        if event_id:
+            res, msg, _ = self.__request_write('PATCH', f"{url}/{event_id}", event_details)
+            if res or not msg.startswith("ERROR: 404"):
+                msg = f"{event_data['name']}\n{msg}"
+                print(msg)
+                return res, msg, event_id
+
+        # new event, created ID is read back
+        res, msg, response = self.__request_write('POST', url, event_details, minimal=False)
+        if res:
+            event_id = self.__created_id(response)
+        msg = f"{event_data['name']}\n{msg}"
+        print(msg)
+        return res, msg, event_id
+
+
+    def delete_event(self, event_id: str, calendar: str, group: bool = False) -> tuple[bool, str]:
+        res, msg, _ = self.__request_write('DELETE', f"{self.__events_url(calendar, group)}/{event_id}")
+        # already gone counts as deleted
+        if res or msg.startswith("ERROR: 404"):
+            return True, f"Event deleted"
+        return False, msg
+
+
+    # check events are on the server: refs [(event_id, calendar, group)], GETs by ID in $batch requests of BATCH_MAX
+    # Returns the refs not found (404). Events not checked (no ID, throttled) are not returned: sending them again would duplicate them
+    def verify_events(self, refs: list) -> list:
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "User-Agent": self.user_agent,
+            "Content-Type": "application/json"
+        }
+        checked = [ref for ref in refs if ref[0]]
+        missing = []
+        unverified = len(refs) - len(checked)
+        for i in range(0, len(checked), BATCH_MAX):
+            chunk = checked[i:i + BATCH_MAX]
+            batch = [{'id': str(j), 'method': 'GET', 'url': f"{self.__events_url(ref[1], ref[2])[len(self.graph_url):]}/{ref[0]}?$select=id"}
+                        for j, ref in enumerate(chunk)]
+            logger.info(f"request POST $batch, {len(batch)} GET requests")
+            response = self.__http.request('POST', f"{self.graph_url}/$batch", headers=headers, json={'requests': batch})
+            if response.status_code != 200:
+                raise Exception(f"Cannot verify events: {response.status_code}, {response.reason}: {response.text}")
+
+            for item in response.json().get('responses', []):
+                if item.get('status') == 404:
+                    missing.append(chunk[int(item['id'])])
+                elif item.get('status') != 200:
+                    unverified += 1
+
+        if unverified:
+            logger.warning(f"verify_events: {unverified} events not verified (no ID or request failed)")
+        logger.info(f"verify_events: {len(refs) - len(missing) - unverified} found, {len(missing)} missing")
+        return missing
+
+
+    # busy intervals of the addresses from start to end (UTC datetimes) with one getSchedule request: {address: [(start, end)]}
+    # lowercase addresses, None for addresses without free/busy (unknown, not shared)
+    def free_busy(self, addresses: list, start: datetime, end: datetime) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "User-Agent": self.user_agent,
+            "Content-Type": "application/json",
+            "Prefer": 'outlook.timezone="UTC"'
+        }
+        payload = {
+            "schedules": addresses,
+            "startTime": {"dateTime": start.strftime('%Y-%m-%dT%H:%M:%S'), "timeZone": "UTC"},
+            "endTime": {"dateTime": end.strftime('%Y-%m-%dT%H:%M:%S'), "timeZone": "UTC"},
+            "availabilityViewInterval": 60
+        }
+        logger.info(f"request POST getSchedule, {len(addresses)} addresses, {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+        response = self.__http.request('POST', f"{self.graph_url}/me/calendar/getSchedule", headers=headers, json=payload)
+        if response.status_code != 200:
+            raise Exception(f"Cannot get free/busy: {response.status_code}, {response.reason}: {response.text}")
+
+        found = {address.lower(): None for address in addresses}
+        for schedule in response.json().get('value', []):
+            address = schedule.get('scheduleId', '').lower()
+            if schedule.get('error'):
+                logger.warning(f"free/busy of {address} not available: {schedule['error'].get('message')}")
+                continue
+            found[address] = [tuple(datetime.fromisoformat(item[k]['dateTime'][:19]).replace(tzinfo=timezone.utc) for k in ('start', 'end'))
+                              for item in schedule.get('scheduleItems', []) if item.get('status') in BUSY_STATUSES]
+        return found
+
+
+    # read the events of a calendar from start to end (dates, end excluded) with calendarView, recurring events expanded
+    # by Graph. Yields a list of 'events_list' items per page of VIEW_PAGE_SIZE, following @odata.nextLink
+    def iter_events(self, start: date, end: date, calendar: str, group: bool = False):
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "User-Agent": self.user_agent,
+            "Prefer": 'outlook.timezone="UTC", outlook.body-content-type="text"'
+        }
+        url = (f"{self.__events_url(calendar, group)[:-len('events')]}calendarView"
+               f"?startDateTime={start.isoformat()}T00:00:00Z&endDateTime={end.isoformat()}T00:00:00Z&$top={VIEW_PAGE_SIZE}"
+               "&$select=id,subject,body,start,end,isAllDay,isCancelled,location,attendees,isReminderOn,reminderMinutesBeforeStart")
+        while url:
+            logger.info(f"request GET, url endpoint: {url}")
+            response = self.__http.request('GET', url, headers=headers)
+            if response.status_code != 200:
+                raise Exception(f"Cannot read events: {response.status_code}, {response.reason}: {response.text}")
+
+            data = response.json()
+            page = [self.__parse_event(item, calendar, group) for item in data.get('value', []) if not item.get('isCancelled')]
+            logger.info(f"iter_events: {len(page)} events")
+            yield page
+            url = data.get('@odata.nextLink')
+
+
+    # Graph event (UTC times) to an 'events_list' item, the Graph ID is kept as 'source_id'
+    def __parse_event(self, item: dict, calendar: str, group: bool) -> dict:
+        fullday = bool(item.get('isAllDay'))
+        start, end = (datetime.fromisoformat(item[k]['dateTime'][:19]) for k in ('start', 'end'))
+        event_data = {
+            'name' : item.get('subject') or "",
+            'description' : (item.get('body') or {}).get('content', "").strip(),
+            'calendar' : calendar,
+            'group' : group,
+            'uid' : f"{hashlib.sha1(item['id'].encode('utf-8')).hexdigest()}@{self.__user_settings['domain']}",
+            'start' : start.date() if fullday else start.replace(tzinfo=timezone.utc),
+            'end' : end.date() if fullday else end.replace(tzinfo=timezone.utc),
+            'fullday' : fullday,
+            'source_id' : item['id']
+        }
+
+        location = (item.get('location') or {}).get('displayName')
+        if location:
+            event_data['location'] = location
+
+        invite = [a['emailAddress']['address'] for a in item.get('attendees') or [] if (a.get('emailAddress') or {}).get('address')]
+        if invite:
+            event_data['invite'] = invite
+
+        # reminders in whole days or within a day, like CLI alarms
+        minutes = item.get('reminderMinutesBeforeStart') or 0
+        if item.get('isReminderOn') and minutes > 0:
+            if minutes % 1440 == 0:
+                event_data['alarm_type'], event_data['alarm_format'], event_data['alarm_time'] = 'DISPLAY', 'D', minutes // 1440
+            elif minutes < 1440:
+                event_data['alarm_type'], event_data['alarm_format'], event_data['alarm_time'] = 'DISPLAY', 'H', f"{minutes // 60}:{minutes % 60:02d}"
+
+        return event_data
+
+
+    # events collection the event is sent to, used to track load per endpoint
+    def endpoint(self, event_data: dict) -> str:
+        return self.__events_url(event_data['calendar'], event_data.get('group'))
+
+
+    # events collection endpoint of a calendar
+    def __events_url(self, calendar: str, group: bool = False) -> str:
+        # endpoint: personal default calendar
+        if calendar == 'personal':
+            return f"{self.graph_url}/me/events"
+        # group calendar
+        elif group:
+            return f"{self.graph_url}/groups/{calendar}/events"
+        # other calendars (personal/shared)
+        else:
+            return f"{self.graph_url}/me/calendars/{calendar}/events"
+
+
+    # ID of a created event: from the body, or from the Location header of minimal responses
+    @staticmethod
+    def __created_id(response) -> str:
+        if response.content:
+            try:
+                return response.json().get('id')
+            except ValueError:
+                pass
+        match = PATTERN_LOCATION_ID.search(response.headers.get('Location', ''))
+        return (match.group(1) or match.group(2)) if match else None
+
+
+    # JSON payload for the event, without sending it
+    def render_event(self, event_data: dict) -> dict:
+        return self.__format_event(event_data)
+
+
     def __format_event(self, event_details: dict) -> dict:
+        # event timezone, aware datetimes are converted to it
+        tz = event_timezone(event_details, self.__user_settings, default=DEFAULT_TIMEZONE)
+        zone = get_zone(tz)
+        start, end = event_details['start'], event_details['end']
+        if isinstance(start, datetime) and start.tzinfo is not None:
+            start, end = start.astimezone(zone), end.astimezone(zone)
+
         # base date
         event_data = {
             "subject": event_details['name'],
             "start": {
-                "dateTime": datetime.strftime(event_details['start'], '%Y-%m-%dT%H:%M:%S'), 
-                "timeZone": "Europe/Berlin"
+                "dateTime": datetime.strftime(start, '%Y-%m-%dT%H:%M:%S'), 
+                "timeZone": tz
             },
             "end": {
-                "dateTime": datetime.strftime(event_details['end'], '%Y-%m-%dT%H:%M:%S'),
-                "timeZone": "Europe/Berlin"
+                "dateTime": datetime.strftime(end, '%Y-%m-%dT%H:%M:%S'),
+                "timeZone": tz
             },
             "body": {
                 "content": event_details['description'],
                 "contentType": "text"
-            },
-            "createdDateTime" : datetime.now(timezone.utc).isoformat(),
-            "importance" : "normal"
+            }
         }
+        # read-only and default values, ignored by Graph
+        if not self.lean:
+            event_data['createdDateTime'] = datetime.now(timezone.utc).isoformat()
+            event_data['importance'] = "normal"
         # bool flag for full day event
         if event_details['fullday']:
             event_data['isAllDay'] = True
@@ -215,7 +507,7 @@ class MGraphAgent():
 
         # list of attendees
         if 'invite' in event_details:
-            invitees = event_details['invite'].split()
+            invitees = as_list(event_details['invite'])
             event_data['attendees'] = []
             for i in invitees:
                 event_data['attendees'].append(
@@ -228,8 +520,8 @@ class MGraphAgent():
                     }
                 )
 
-        # optional organizer info
-        if 'organizer_email' in self.__user_settings:
+        # optional organizer info, Graph sets the calendar owner anyway
+        if 'organizer_email' in self.__user_settings and not self.lean:
             if 'organizer_name' in self.__user_settings:
                 if 'organizer_role' in self.__user_settings:
                     name = f"{self.__user_settings['organizer_name']} ({self.__user_settings['organizer_role']})"
@@ -246,9 +538,13 @@ class MGraphAgent():
                         }
                     }
 
-        # add an alarm for the event
+        # add an alarm for the event. Graph has reminders only: EMAIL alarms (e.g. imported or mirrored from CalDAV)
+        # are set as reminders
         if 'alarm_type' in event_details:
-            if event_details['alarm_type'] == 'DISPLAY':
+            if event_details['alarm_type'] in ('DISPLAY', 'EMAIL'):
+                if event_details['alarm_type'] == 'EMAIL' and not self.__email_warned:
+                    logger.warning("Alarm EMAIL not available on Graph, set as reminder")
+                    self.__email_warned = True
 
                 try:
                     # calc time in minutes
@@ -266,9 +562,6 @@ class MGraphAgent():
                 event_data['reminderMinutesBeforeStart'] = reminder_mins
                 event_data['isReminderOn'] = True
 
-            elif event_details['alarm_type'] == 'EMAIL':
-                logger.warning("Alarm EMAIL not implemented")
-                raise ValueError("Alarm EMAIL not implemented")
             else:
                 logger.error("Invalid alarm_type")
                 raise ValueError("Invalid alarm_type")
@@ -35,7 +35,18 @@ PROD_REPO = "calendar-pyhandler"
 PROD_NAME = "calendar-pyCLIent"
 PROD_URL = "github.com/ynad/calendar-pyhandler"
 logging_file = "debug.log"
-ics_file = "tmp_calendar-pyhandler-event.ics"
+flush_logging_file = "debug_flush.log"
+calendar_cache_file = "calendar_cache.json"
+etag_cache_file = "etag_cache.json"
+sync_index_file = "sync_index.json"
+outbox_file = "outbox.db"
+SUMMARY_MAX = 50
+TABLE_MAX = 1000
+OUTBOX_BATCH = 500
+# events sent between lease renewals and heartbeats
+OUTBOX_SUB_BATCH = 50
+OUTBOX_IDLE = 5
+OUTBOX_DOWN_PAUSE = 60
 ###################################################################################################
 
 
@@ -47,39 +58,65 @@ import logging
 import json
 import click
 import requests
-import random
 import signal
+import atexit
+import queue
+import threading
 import regex as re
-from datetime import datetime, timedelta
+from datetime import datetime
 import zipfile
 import tempfile
 from packaging import version  # Use packaging.version for semver parsing
 import subprocess
+import time
 
 # GUI libs
 import tkinter as tk
-from tkinter import scrolledtext, messagebox
+from tkinter import scrolledtext, messagebox, ttk
 
 # internal libs
 from agents.caldavAgent import CaldavAgent
 from agents.mgraphAgent import MGraphAgent
-
-
-
-# Enable logging
-logging_file = f"{os.path.dirname(__file__)}/{logging_file}"
-logging.basicConfig(
-    filename=logging_file,
-    filemode='w',
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
-)
+from core.eventBuilder import args_check, check_alarm, iter_slots, build_events
+from core.scheduleParser import parse_schedule
+from core.workingDays import working_calendar
+from core.timezones import get_zone
+from core.exportSink import open_sink, SINKS
+from core.calendarCache import CalendarCache
+from core.attendees import parse_attendees, load_distribution_lists, max_attendees
+from core.eventStore import write_store, EventStore
+from core.icsImport import IcsFile
+from core.settings import load_settings, SettingsError
+from core.etagCache import EtagCache
+from core.syncIndex import SyncIndex
+from core.outbox import Outbox, account_key
+from agents.httpTransport import CircuitOpenError
+from core.profiler import Profiler, profile_dir
+from calendar_pyhandler import Client
+
+
+
+# Enable logging, not in render pool processes re-importing this module (spawn start method) to keep the log file
+# outbox flushers log apart, the run that started them may still be writing its log
+logging_file = f"{os.path.dirname(__file__)}/{flush_logging_file if '--flush' in sys.argv else logging_file}"
+if __name__ == '__main__':
+    logging.basicConfig(
+        filename=logging_file,
+        filemode='w',
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
 logger = logging.getLogger(__name__)
 
 
-# ics tmp file on local path
-ics_file=f"{os.path.dirname(__file__)}/{ics_file}"
-
+# calendars name to ID cache on local path
+calendar_cache_file = f"{os.path.dirname(__file__)}/{calendar_cache_file}"
+# CalDAV events ETags for conditional writes, on local path
+etag_cache_file = f"{os.path.dirname(__file__)}/{etag_cache_file}"
+# logical events to server UIDs/IDs of --sync runs, on local path
+sync_index_file = f"{os.path.dirname(__file__)}/{sync_index_file}"
+# events queued by --enqueue runs, sent by --flush, on local path
+outbox_file = f"{os.path.dirname(__file__)}/{outbox_file}"
 
 
 def message_box(message: str, msg_type: str = 'info') -> None:
@@ -104,18 +141,22 @@ def ask_yes_no_gui(message: str, title: str = 'Info', icon: str = 'info', defaul
     return result
 
 
-def confirm_events(output_tk: str, events_list: list) -> None:
+def confirm_events(output_tk: str, events_list: list, export: str = "", sync: SyncIndex = None) -> None:
     # Create main window
     root = tk.Tk()
     root.title(string_header(terminal=False))
     root.geometry("700x400")
 
+    # confirmation view, replaced by the progress view on OK
+    confirm_frame = tk.Frame(root)
+    confirm_frame.pack(fill=tk.BOTH, expand=True)
+
     # Label for instruction or title
-    label = tk.Label(root, text=f"\nI seguenti eventi saranno creati:\n")
+    label = tk.Label(confirm_frame, text=f"\nI seguenti eventi saranno creati:\n")
     label.pack(pady=5)
 
     # ScrolledText widget for displaying the text
-    text = scrolledtext.ScrolledText(root, wrap=tk.WORD, width=70, height=16)
+    text = scrolledtext.ScrolledText(confirm_frame, wrap=tk.WORD, width=70, height=16)
     text.pack(pady=1)
 
     # insert output text
@@ -123,11 +164,11 @@ def confirm_events(output_tk: str, events_list: list) -> None:
     text.configure(state='disabled')  # Make the text read-only
 
     # Button frame to organize Confirm and Cancel buttons
-    button_frame = tk.Frame(root)
+    button_frame = tk.Frame(confirm_frame)
     button_frame.pack(pady=10)
 
     # Confirm and Cancel buttons
-    confirm_button = tk.Button(button_frame, text="     OK     ", command=lambda: [create_events(events_list), root.destroy(), root.quit()])
+    confirm_button = tk.Button(button_frame, text="     OK     ", command=lambda: [confirm_frame.destroy(), progress_events(root, events_list, export, sync)])
     cancel_button = tk.Button(button_frame, text="  Cancel  ", command=lambda: [print('Aborted'), root.destroy(), root.quit()])
 
     confirm_button.pack(side=tk.LEFT, padx=10)
@@ -137,6 +178,106 @@ def confirm_events(output_tk: str, events_list: list) -> None:
     root.mainloop()
 
 
+# progress window: events are sent by a background worker, results are streamed back via queue to a live table
+def progress_events(root: tk.Tk, events_list: list, export: str = "", sync: SyncIndex = None) -> None:
+    results = queue.Queue()
+    state = {'done': False, 'aborting': False}
+    cancel = threading.Event()
+
+    label = tk.Label(root, text=f"\nInvio di {len(events_list)} eventi in corso...\n")
+    label.pack(pady=5)
+
+    bar = ttk.Progressbar(root, maximum=max(len(events_list), 1), length=660)
+    bar.pack(pady=1)
+
+    # per-event status table
+    table_frame = tk.Frame(root)
+    table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+    table = ttk.Treeview(table_frame, columns=('n', 'name', 'start', 'status'), show='headings', height=10)
+    for col, heading, width in (('n', '#', 40), ('name', 'Evento', 260), ('start', 'Inizio', 130), ('status', 'Stato', 220)):
+        table.heading(col, text=heading)
+        table.column(col, width=width, anchor=tk.W)
+    scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+    table.configure(yscrollcommand=scrollbar.set)
+    table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    # big runs list only failed events, rows are added as results arrive
+    full_table = len(events_list) <= TABLE_MAX
+    if full_table:
+        for j, event_n in enumerate(events_list):
+            table.insert('', tk.END, iid=str(j), values=(j+1, event_n['name'], datetime.strftime(event_n['start'], '%d/%m/%Y %H:%M'), 'in attesa'))
+
+    close_button = tk.Button(root, text="  Close  ", state=tk.DISABLED, command=lambda: [root.destroy(), root.quit()])
+    close_button.pack(pady=10)
+
+    # closing while sending aborts the remaining events: the window is closed once the worker is done with the
+    # requests in flight and has saved export, caches and sync index
+    def on_close():
+        if state['done']:
+            root.destroy()
+            root.quit()
+        elif not state['aborting'] and messagebox.askyesno("Abort", "Events submission in progress, abort it?", icon='warning', parent=root):
+            print('Aborted')
+            logger.warning("events submission aborted by user")
+            state['aborting'] = True
+            cancel.set()
+            label.configure(text="\nInterruzione in corso, attesa delle richieste in corso...\n", fg='red')
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # background submission, the GUI thread only reads the queue
+    def worker():
+        try:
+            ok, failed = create_events(events_list, export, on_result=lambda j, res, msg: results.put(('event', j, res, msg)), sync=sync, cancel=cancel)
+            results.put(('done', ok, failed))
+        except Exception as exc:
+            results.put(('error', str(exc)))
+    threading.Thread(target=worker, name="create_events-worker", daemon=True).start()
+
+    def poll():
+        while True:
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+
+            if item[0] == 'event':
+                j, res, msg = item[1:]
+                status = 'OK' if res else f"ERRORE: {msg.splitlines()[-1]}"
+                if full_table:
+                    table.set(str(j), 'status', status)
+                    table.see(str(j))
+                elif not res:
+                    event_n = events_list[j]
+                    table.insert('', tk.END, iid=str(j), values=(j+1, event_n['name'], datetime.strftime(event_n['start'], '%d/%m/%Y %H:%M'), status))
+                bar.step(1)
+            else:
+                state['done'] = True
+                if state['aborting']:
+                    root.destroy()
+                    root.quit()
+                    return
+                if item[0] == 'done':
+                    label.configure(text=f"\nCompletato: {item[1]} eventi creati, {item[2]} errori\n", fg='black' if not item[2] else 'red')
+                else:
+                    label.configure(text=f"\nErrore, invio interrotto: {item[1]}\n", fg='red')
+                close_button.configure(state=tk.NORMAL)
+
+        if not state['done']:
+            root.after(100, poll)
+    root.after(100, poll)
+
+
+# no confirmation and no window (cron, SSH, no display): failed events and summary on the console
+def progress_console(events_list: list, export: str = "", sync: SyncIndex = None) -> None:
+    def on_result(j, res, msg):
+        if not res:
+            print(f"Evento {j+1}/{len(events_list)} non creato: {msg}")
+
+    ok, failed = create_events(events_list, export, on_result, sync)
+    print(f"{ok} eventi creati, {failed} falliti")
+
+
 # show command syntax
 def string_header(terminal: bool = False, short: bool = False) -> str:
     header = f"Calendar pyCLIent" 
@@ -157,10 +298,13 @@ def show_syntax() -> str:
             "    --end_day dd/mm/YYYY [dd/mm/YYYY [...]]\n"
             "   [--start_hr HH:MM [HH:MM [...]]]\n"
             "   [--end_hr HH:MM [HH:MM [...]]]\n"
+            "   [--schedule \"dd/mm/YYYY[ - dd/mm/YYYY][, HH:MM _ HH:MM][; ...]\" : compact schedule, replaces start/end days & hours]\n"
+            "   [--schedule \"every working day|Mon/Wed from dd/mm/YYYY to dd/mm/YYYY|for N weeks[, HH:MM _ HH:MM]\" : one event per day]\n"
             "   [--loc \"event location\"]\n"
-            "   [--cal \"calendar-name-or-ID\". Default: \"personal\"]\n"
+            "   [--tz \"Europe/Rome\" : IANA timezone of the event hours. Default: user settings \"timezone\"]\n"
+            "   [--cal \"calendar-name-or-ID\". Names are resolved to IDs and cached. Default: \"personal\"]\n"
             "   [--group : bool flag to set this as a group calendar. Default: False]\n"
-            "   [--invite \"user1@mail.org user2@mail.net\" : email(s) to be invited, separated by space]\n"
+            "   [--invite \"user1@mail.org user2@mail.net list-name\" : email(s) or distribution lists to be invited, separated by space]\n"
             "\nAlarm settings, all 3 parameters must be set or none is considered:\n"
             "   [--alarm_type : \"DISPLAY\" or \"EMAIL\". Alarm to be set on event. Default: none]\n"
             "   [--alarm_format : \"h\" = hours, \"d\" = days]\n"
@@ -170,21 +314,38 @@ def show_syntax() -> str:
             "   [--noprompt : bool, skip user confirmation]\n"
             "   [--noreport : bool, skip report log copy for developer]\n"
             "   [--noupdate : bool, skip software updates auto-check]\n"
+            "   [--store_write \"path\\to\\events.evs\" : write events to a compact on-disk store and exit, for very large schedules]\n"
+            "   [--store_read \"path\\to\\events.evs\" : send events read from an on-disk store, event options are ignored]\n"
+            "   [--import_ics \"path\\to\\export.ics\" : send the events of an ICS file, streamed; --cal, --group and --loc apply]\n"
+            "   [--export \"path\\to\\archive.ics|.zip|.jsonl\" : write an archive copy of the events while they are sent]\n"
+            "   [--sync \"scope-name\" : send only events new or changed since the last run with the same scope]\n"
+            "   [--sync_delete : bool, with --sync, delete events removed from the schedule since the last run]\n"
+            "   [--dryrun : bool, render events payloads (ICS or JSON) without sending them]\n"
+            "   [--dryrun_dir \"path\\to\\output-dir\" : write --dryrun payloads to files. Default: stdout]\n"
+            "   [--enqueue : bool, queue events in the local outbox and return, a background run sends them]\n"
+            "   [--flush : bool, send the events queued in the local outbox for the user settings account]\n"
+            "   [--verify : bool, after sending check the events are on the server and send the missing ones again]\n"
+            "   [--profile \"cprofile\"|\"sample\" : profile the run, written to the report path of user settings]\n"
+            "   [--trace_alloc : bool, trace memory allocations, top sites written to the report path of user settings]\n"
     )
 
 
-# load user settings from file
+# show invalid arguments error and exit
+def syntax_error(err: str) -> None:
+    logger.warning(err)
+    print(f"Error: {err}\n")
+    print(show_syntax())
+    message_box(err, msg_type='warning')
+    #input("Press enter to exit.")
+    #return 20
+    sys.exit(20)
+
+
+# load user settings from file, validated and cached by core/settings.py. Raises SettingsError if invalid
 def load_user_settings(user_config: str) -> dict:
     logger.info(f"Calendar pyCLIent - v{VERSION_NUM}")
     if os.path.exists(user_config):
-        logger.info("Loading user settings JSON from file: " + str(user_config))
-        with open(user_config, 'r') as f:
-            user_settings = json.load(f)
-
-        # assert mandatory settings keys
-        assert 'mode' in user_settings, "invalid user settings, 'mode' key missing"
-        assert 'domain' in user_settings, "invalid user settings, 'domain' key missing"
-        assert 'username' in user_settings, "invalid user settings, 'username' key missing"
+        user_settings = load_settings(user_config)
 
         logger.info(f"Running instance for: {user_settings['domain']}, user: {user_settings['username']}, calendar: {user_settings['calendar'] if 'calendar' in user_settings else 'None'}, mode: {user_settings['mode']}")
         return user_settings
@@ -193,6 +354,12 @@ def load_user_settings(user_config: str) -> dict:
         return None
 
 
+# stop profiling and list the profiles written, at exit
+def write_profiles(profiler: Profiler) -> None:
+    for path in profiler.stop():
+        print(f"Profile written: {path}")
+
+
 # send report of usage to developer
 def report_copy(user_settings: dict) -> None:
     # copy log to report dir, if path is provided in user_settings
@@ -348,127 +515,205 @@ def check_and_update():
     restart_app()
 
 
-# check string date format
-def check_date(date: str) -> tuple[bool, str]:
-    try:
-        datetime.strptime(date, "%d/%m/%Y")
-    except ValueError as err:
-        return False, err
-    return True, ""
-
-
-# check string time format
-def check_time(time: str) -> tuple[bool, str]:
-    try:
-        datetime.strptime(time, "%H:%M")
-    except ValueError as err:
-        return False, err
-    return True, ""
-
-
-# check if first date is after the second one
-def is_after_date(date_i: str, date_j: str) -> bool:
-    return datetime.strptime(date_i, "%d/%m/%Y") > datetime.strptime(date_j, "%d/%m/%Y")
-
-
-# check if first hour is after the second one
-def is_after_hour(date_i: str, date_j: str) -> bool:
-    return datetime.strptime(date_i, "%H:%M") > datetime.strptime(date_j, "%H:%M")
-
-
-# check arguments and return error strings
-def args_check(start_day: str, end_day: str, start_hr: str, end_hr: str) -> tuple[bool, str]:
-    logger.info(f"Running args check")
-
-    # start and end day are mandatory
-    if not start_day or not end_day:
-        return False, "Missing event start date or end date!"
+# instantiate the agent for the user backend mode. Offline agents only render payloads, no login/network
+def get_agent(user_settings: dict, offline: bool = False, etag_cache: EtagCache = None):
+    logger.info(f"get_agent, mode: {user_settings['mode']}, offline: {offline}")
 
-    # check START date format
-    start_day_list = start_day.split()
-    for start_d in start_day_list:
-        date_ok, date_err = check_date(start_d)
-        if not date_ok:
-            return False, date_err
+    # CalDav - WebDav
+    if user_settings['mode'] == 'caldav':
+        return CaldavAgent(user_settings, offline=offline, etag_cache=etag_cache)
 
-    # check END date format
-    end_day_list = end_day.split()
-    for end_d in end_day_list:
-        date_ok, date_err = check_date(end_d)
-        if not date_ok:
-            return False, date_err
+    # Microsoft Graph REST API
+    elif user_settings['mode'] == 'microsoft_graph':
+        return MGraphAgent(user_settings, offline=offline)
 
-    # check list lenght, must be equal for start and end days
-    if len(start_day_list) != len(end_day_list):
-        return False, "Start & end days count cannot differ!"
-
-    # check START date is not after END date
-    for i, day in enumerate(start_day_list):
-        if is_after_date(start_day_list[i], end_day_list[i]):
-            err = f"Event start date cannot be after end date: {start_day_list[i]}, {end_day_list[i]}"
-            return False, err
+    else:
+        msg = f"Invalid client mode: {user_settings['mode']}, cannot continue"
+        logger.error(msg)
+        raise RuntimeError(f"Not implemented client mode: {user_settings['mode']}")
 
-    # check time format, if any is given
-    if start_hr and end_hr:
 
-        start_hr_list = start_hr.split()
-        for start_hour in start_hr_list:
-            time_ok, time_err = check_time(start_hour)
-            if not time_ok:
-                return False, time_err
+# determine user backend mode and create events accordingly. Events are archived to export file, if given
+# each result is passed to on_result(index, res, msg), returns created and failed counts
+# with a sync index, events are created or updated on their previous IDs and removed ones are deleted
+# cancel: threading.Event, when set the remaining events are not sent (caches, export and sync index are still saved)
+def create_events(events_list: list, export: str = "", on_result=None, sync: SyncIndex = None, cancel: threading.Event = None) -> tuple[int, int]:
+    try:
+        logger.info(f"create_events, mode: {user_settings['mode']}, export: {export if export else 'None'}")
+
+        def report(r):
+            # events removed from the schedule since the last sync
+            if r.action == 'delete':
+                print(r.message)
+            elif on_result:
+                on_result(r.index, r.ok, r.message)
+
+        # same code path of the library API, see calendar_pyhandler/client.py
+        with Client(user_settings, etag_cache_file=etag_cache_file, sync_index_file=sync_index_file, cancel=cancel) as client:
+            verify = user_settings.get('verify_events', False)
+            if sync:
+                result = client.send_sync(sync, events_list, export, on_result=report, verify=verify)
+            else:
+                result = client.create(events_list, export, on_result=report, return_ids=False, verify=verify)
 
-        end_hr_list = end_hr.split()
-        for end_hour in end_hr_list:
-            time_ok, time_err = check_time(end_hour)
-            if not time_ok:
-                return False, time_err
+        if result.verified is not None:
+            print(f"Verifica: {result.verified} eventi confermati sul server, {result.requeued} mancanti inviati di nuovo")
 
-        # check list lenght, must be equal for start and end hours as well as for days count
-        if (len(start_hr_list) != len(end_hr_list)) or (len(start_hr_list) != len(start_day_list)):
-            return False, "Start and end hours count cannot differ!"
+        # backend down: the rest of the batch failed fast, one summarized error
+        if result.error:
+            raise CircuitOpenError(result.error)
 
-        # check START hour is not after END hour
-        for i, hour in enumerate(start_hr_list):
-            if is_after_hour(start_hr_list[i], end_hr_list[i]):
-                err = f"Event start hour cannot be after end hour: {start_hr_list[i]}, {end_hr_list[i]}"
-                return False, err
+    except Exception as exc:
+        logger.error(f"Exception on create_events: {repr(exc)}")
+        print(f"Exception on create_events: {repr(exc)}")
+        raise
+
+    ok = result.ok - result.actions.get('delete', 0)
+    logger.info(f"create_events done: {ok} created, {result.failed} failed")
+    return ok, result.failed
+
+
+# append events to the local outbox and start a background flusher if none is running, no network call here
+def enqueue_events(events_list: list, config: str) -> int:
+    account = account_key(user_settings)
+    with Outbox(outbox_file) as outbox:
+        count = outbox.put(events_list, account)
+        # heartbeat taken on behalf of the new flusher, next runs don't start another one
+        start = outbox.claim_flusher(account)
+    if start:
+        start_flusher(config)
+    return count
+
+
+# detached "--flush" run for the same settings file, outliving this one
+def start_flusher(config: str) -> None:
+    args = [sys.executable, os.path.abspath(__file__), '--config', os.path.abspath(config), '--flush', '--noupdate']
+    if os.name == 'nt':
+        flags = {'creationflags': subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        flags = {'start_new_session': True}
+    subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True, **flags)
+    logger.info(f"outbox flusher started: {args}")
 
-    return True, ""
 
+# queued events keep the calendar name (--enqueue runs make no network call), resolved to its ID once per name
+def resolve_queued(event: dict, cache: CalendarCache, resolved: dict, client: Client) -> None:
+    name = event['calendar']
+    if name == 'personal':
+        return
+    if name not in resolved:
+        try:
+            resolved[name] = cache.resolve(name, fetch=client.calendars)
+        except Exception as exc:
+            logger.warning(f"Calendar discovery failed, '{name}' used as ID: {repr(exc)}")
+            resolved[name] = (name, None)
+    event['calendar'], group = resolved[name]
+    if group:
+        event['group'] = True
+
+
+# send the events queued in the outbox for this account, in batches of OUTBOX_BATCH sent OUTBOX_SUB_BATCH at a time.
+# Waits OUTBOX_IDLE seconds for more events before exiting, so bursts of --enqueue runs are sent together.
+# Returns sent and failed counts
+def flush_outbox() -> tuple[int, int]:
+    account = account_key(user_settings)
+    sent = failed = 0
+    idle_since = time.time()
+    calendars = CalendarCache(calendar_cache_file, user_settings)
+    resolved = {}
+    with Outbox(outbox_file) as outbox, Client(user_settings, etag_cache_file=etag_cache_file, sync_index_file=sync_index_file) as client:
+        try:
+            while True:
+                outbox.heartbeat(account)
+                batch = outbox.claim(account, OUTBOX_BATCH)
+                if not batch:
+                    # retries due soon are waited for, later ones are left to the next flusher
+                    due = outbox.next_due(account)
+                    if time.time() - idle_since >= OUTBOX_IDLE and (due is None or due - time.time() > OUTBOX_IDLE):
+                        # events queued since the last claim (their run saw this flusher alive) keep it running
+                        if outbox.retire(account, time.time() + OUTBOX_IDLE):
+                            break
+                        continue
+                    time.sleep(0.5)
+                    continue
+
+                ids = [outbox_id for outbox_id, _ in batch]
+                for _, event in batch:
+                    resolve_queued(event, calendars, resolved, client)
+                down = False
+                for i in range(0, len(batch), OUTBOX_SUB_BATCH):
+                    # slow servers or verify never let the lease of the events still to send expire
+                    outbox.renew(ids[i:])
+                    outbox.heartbeat(account)
+                    sub_ids = ids[i:i + OUTBOX_SUB_BATCH]
+                    # final result of each event, verify may report an event again
+                    outcomes = {}
+                    result = client.create([event for _, event in batch[i:i + OUTBOX_SUB_BATCH]], return_ids=False,
+                                           on_result=lambda r: outcomes.update({r.index: r}),
+                                           verify=user_settings.get('verify_events', False))
+                    outbox.ack([sub_ids[j] for j, r in outcomes.items() if r.ok])
+                    outbox.retry([(sub_ids[j], r.message) for j, r in outcomes.items() if not r.ok])
+                    sent += result.ok
+                    failed += result.failed
+                    print(f"Coda: {result.ok} eventi inviati, {result.failed} falliti")
+
+                    # backend down: the rest is kept for a later run
+                    if result.error:
+                        outbox.defer([outbox_id for j, outbox_id in enumerate(sub_ids) if j not in outcomes] + ids[i + OUTBOX_SUB_BATCH:], OUTBOX_DOWN_PAUSE)
+                        logger.error(f"flush_outbox stopped: {result.error}")
+                        print(result.error)
+                        down = True
+                        break
+                if down:
+                    break
+                idle_since = time.time()
+        finally:
+            outbox.heartbeat(account, alive=False)
+
+        pending, dead = outbox.counts(account)
+    logger.info(f"flush_outbox done: {sent} sent, {failed} failed, {pending} pending, {dead} failed permanently")
+    print(f"Coda: {sent} eventi inviati, {failed} tentativi falliti, {pending} in attesa, {dead} falliti definitivamente")
+    return sent, failed
+
+
+# flush archive and warn if incomplete
+def close_sink(sink) -> None:
+    if sink and not sink.close():
+        msg = f"Export archive incomplete: {sink.path}, error: {sink.error}"
+        logger.warning(msg)
+        print(msg)
 
-# determine user backend mode and create events accordingly
-def create_events(events_list: list) -> None:
-    try:
-        logger.info(f"create_events, mode: {user_settings['mode']}")
 
-        # CalDav - WebDav
-        if user_settings['mode'] == 'caldav':
-            agent = CaldavAgent(user_settings, ics_file=ics_file)
+# render events payloads (ICS for CalDAV, JSON for Graph) without any network call, to stdout or to a directory
+def dry_run(events_list: list, output_dir: str = "", export: str = "") -> None:
+    logger.info(f"dry_run, mode: {user_settings['mode']}, output: {output_dir if output_dir else 'stdout'}")
+    agent = get_agent(user_settings, offline=True)
 
-        # Microsoft Graph REST API
-        elif user_settings['mode'] == 'microsoft_graph':
-            agent = MGraphAgent(user_settings)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
+    sink = open_sink(export, user_settings) if export else None
+    for event_n in events_list:
+        if sink:
+            sink.write(event_n)
+        payload = agent.render_event(event_n)
+        if isinstance(payload, bytes):
+            payload, ext = payload.decode('utf-8'), 'ics'
         else:
-            msg = f"Invalid client mode: {user_settings['mode']}, cannot continue"
-            logger.error(msg)
-            message_box(msg, msg_type='error')
-            raise RuntimeError(f"Not implemented client mode: {user_settings['mode']}")
-
-        for event_n in events_list:
-            res, msg = agent.create_event(event_n)
-            if res:
-                message_box(msg, msg_type='info')
-            else:
-                message_box(msg, msg_type='error')
-
-    except Exception as exc:
-        logger.error(f"Exception on create_events: {repr(exc)}")
-        print(f"Exception on create_events: {repr(exc)}")
-
-        # show an error message
-        message_box(f"Exception on create_events: {str(exc)}", msg_type='error')
+            payload, ext = json.dumps(payload, indent=4, default=str), 'json'
+
+        if output_dir:
+            # UIDs may contain chars not allowed in file names
+            file_name = re.sub(r'[^\w.@-]', '_', event_n['uid'])
+            out_file = os.path.join(output_dir, f"{file_name}.{ext}")
+            with open(out_file, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            logger.info(f"dry_run: payload written to {out_file}")
+        else:
+            print(payload)
 
+    close_sink(sink)
+    print(f"Dry run: {len(events_list)} event(s) rendered to {output_dir if output_dir else 'stdout'}, nothing sent")
 
 
 @click.command()
@@ -514,12 +759,24 @@ def create_events(events_list: list) -> None:
     default="",
     help='HH:MM [HH:MM [...]]'
 )
+@click.option(
+    "--schedule",
+    type=str,
+    default="",
+    help='"dd/mm/YYYY[ - dd/mm/YYYY][, HH:MM _ HH:MM][; ...]", replaces start/end days & hours'
+)
 @click.option(
     "--loc",
     type=str,
     default="",
     help='event location'
 )
+@click.option(
+    "--tz",
+    type=str,
+    default="",
+    help='IANA timezone of the event hours. Default: user settings "timezone"'
+)
 @click.option(
     "--cal",
     type=str,
@@ -535,7 +792,7 @@ def create_events(events_list: list) -> None:
     "--invite",
     type=str,
     default="",
-    help='email(s) to be invited, separated by space'
+    help='email(s) or distribution lists to be invited, separated by space'
 )
 @click.option(
     "--alarm_type",
@@ -570,15 +827,93 @@ def create_events(events_list: list) -> None:
     is_flag=True,
     help='skip software updates auto-check'
 )
+@click.option(
+    "--store_write",
+    type=str,
+    default="",
+    help='"path\\to\\events.evs", write events to an on-disk store and exit'
+)
+@click.option(
+    "--store_read",
+    type=str,
+    default="",
+    help='"path\\to\\events.evs", send events read from an on-disk store'
+)
+@click.option(
+    "--import_ics",
+    type=str,
+    default="",
+    help='"path\\to\\export.ics", send the events of an ICS file'
+)
+@click.option(
+    "--export",
+    type=str,
+    default="",
+    help='"path\\to\\archive.ics|.zip|.jsonl", archive copy of the events'
+)
+@click.option(
+    "--sync",
+    type=str,
+    default="",
+    help='"scope-name", send only events new or changed since the last run with the same scope'
+)
+@click.option(
+    "--sync_delete",
+    is_flag=True,
+    help='with --sync, delete events removed from the schedule since the last run'
+)
+@click.option(
+    "--dryrun",
+    is_flag=True,
+    help='render events payloads without sending them'
+)
+@click.option(
+    "--dryrun_dir",
+    type=str,
+    default="",
+    help='"path\\to\\output-dir" for --dryrun payloads. Default: stdout'
+)
+@click.option(
+    "--enqueue",
+    is_flag=True,
+    help='queue events in the local outbox and return at once, a background run sends them'
+)
+@click.option(
+    "--flush",
+    is_flag=True,
+    help='send the events queued in the local outbox for the user settings account'
+)
+@click.option(
+    "--verify",
+    is_flag=True,
+    help='after sending, check the events are on the server and send the missing ones again'
+)
+@click.option(
+    "--profile",
+    type=str,
+    default="",
+    help='"cprofile" or "sample", profile the run and write it to the report path of user settings'
+)
+@click.option(
+    "--trace_alloc",
+    is_flag=True,
+    help='trace memory allocations and write top sites to the report path of user settings'
+)
 
 
 ## Main
-def main(config, name, descr, start_day, start_hr, end_day, end_hr, loc, cal, group, invite, alarm_type, alarm_format, alarm_time, noprompt, noreport, noupdate):
+def main(config, name, descr, start_day, start_hr, end_day, end_hr, schedule, loc, tz, cal, group, invite, alarm_type, alarm_format, alarm_time, noprompt, noreport, noupdate, store_write, store_read, import_ics, export, sync, sync_delete, dryrun, dryrun_dir, enqueue, flush, verify, profile, trace_alloc):
 
     global user_settings
 
     # load user settings from json file
-    user_settings = load_user_settings(config)
+    try:
+        user_settings = load_user_settings(config)
+    except SettingsError as err:
+        logger.error(f"{err}")
+        print(err)
+        message_box(f"{err}", msg_type='error')
+        sys.exit(10)
     if not user_settings:
         err = f"User config file missing: {config}"
         logger.error(err)
@@ -588,33 +923,43 @@ def main(config, name, descr, start_day, start_hr, end_day, end_hr, loc, cal, gr
         #return 10
         sys.exit(10)
 
+    # command line option overrides user settings
+    if verify:
+        user_settings['verify_events'] = True
+
+    # opt-in profiling, profiles are written at exit whatever the return path
+    if profile or trace_alloc:
+        try:
+            profiler = Profiler(profile, trace_alloc, profile_dir(user_settings))
+        except ValueError as err:
+            syntax_error(str(err))
+        profiler.start()
+        atexit.register(write_profiles, profiler)
+
     # print software header
     print(f"\n{string_header(terminal=True)}")
 
-    # check software updates
-    if not noupdate:
+    # check software updates, not on outbox runs: they must not wait on the network nor restart
+    if not noupdate and not enqueue and not flush:
         check_and_update()
 
+    # send queued events, other event options are ignored
+    if flush:
+        flush_outbox()
+        if not noreport:
+            report_copy(user_settings)
+        return 0
 
-    # check command line arguments
-    args_ack, err = args_check(start_day, end_day, start_hr, end_hr)
-    if not args_ack:
-        logger.warning(err)
-        print(f"Error: {err}\n")
-        print(show_syntax())
-        message_box(err, msg_type='warning')
-        #input("Press enter to exit.")
-        #return 20
-        sys.exit(20)
+    if enqueue and (sync or export or dryrun or store_write):
+        syntax_error("--enqueue cannot be used with --sync, --export, --dryrun or --store_write")
 
 
-    # if more than one start & end days/hours are provided, split them and repeat all procedure for each one
-    start_day_list = start_day.split()
-    end_day_list = end_day.split()
-    # split hours
-    if start_hr and end_hr:
-        start_hr_list = start_hr.split()
-        end_hr_list = end_hr.split()
+    # check command line arguments, a compact schedule is checked while expanded
+    if not schedule and not store_read and not import_ics:
+        args_ack, err = args_check(start_day, end_day, start_hr, end_hr)
+        if not args_ack:
+            syntax_error(err)
+
 
     # if a calendar is given via command line option overrides user settings, if any
     if not cal and 'calendar' in user_settings and len(user_settings['calendar']) > 1:
@@ -630,105 +975,115 @@ def main(config, name, descr, start_day, start_hr, end_day, end_hr, loc, cal, gr
         group = True
     # else 'group' stays as set by cmd line option
 
+    # resolve calendar name to ID via local cache, calendars are discovered only on cache miss
+    # --enqueue runs make no network call, names are resolved by the flusher
+    if cal != 'personal' and not enqueue:
+        cache = CalendarCache(calendar_cache_file, user_settings)
+        try:
+            cal, cal_group = cache.resolve(cal, fetch=None if dryrun else lambda: get_agent(user_settings).list_calendars())
+            if cal_group:
+                group = True
+        except Exception as exc:
+            logger.warning(f"Calendar discovery failed, '{cal}' used as ID: {repr(exc)}")
+            print(f"Calendar discovery failed, '{cal}' used as ID: {str(exc)}")
+
     # if a location is given via command line option overrides user settings, if any
     if not loc and 'location' in user_settings and user_settings['location']:
         loc = user_settings['location']
     
-    events_list = []
-    # cycle by key over list of event dates and to list one event each
-    for i, day in enumerate(start_day_list):
-
-        # build event details
-        event_details = {
-            'name' : name,
-            'description' : descr,
-            'calendar' : cal,
-            'group' : group,
-            'uid' : (f"{str(datetime.now().timestamp())}_{random.randint(100000, 999999)}_{name}@{user_settings['domain']}").replace(" ", "-")
-        }
-        logger.info(f"Building event details with UID: {event_details['uid']}")
-
-        # add location if any
-        if loc:
-            event_details['location'] = loc
-
-        # event with fixed hours
-        if start_hr and end_hr:
-            # hours set to 00:00 equals full day event
-            if (start_hr_list[i] == "00:00") and (end_hr_list[i] == "00:00"):
-                event_details.update( { 'start' : datetime.strptime(f"{start_day_list[i]}", "%d/%m/%Y").date() } )
-                event_details.update( { 'end' : datetime.strptime(f"{end_day_list[i]}", "%d/%m/%Y").date() + timedelta(days=1) } )
-                event_details.update( { 'fullday' : True } )
-                logger.info(f"Full day event, all-0 hours")
-            else:
-            # set fixed hours
-                event_details.update( { 'start' : datetime.strptime(f"{start_day_list[i]} {start_hr_list[i]}", "%d/%m/%Y %H:%M") } )
-                event_details.update( { 'end' : datetime.strptime(f"{end_day_list[i]} {end_hr_list[i]}", "%d/%m/%Y %H:%M") } )
-                event_details.update( { 'fullday' : False } )
-                logger.info(f"Fixed hours event")
-        # full day event
-        else:
-            event_details.update( { 'start' : datetime.strptime(f"{start_day_list[i]}", "%d/%m/%Y").date() } )
-            event_details.update( { 'end' : datetime.strptime(f"{end_day_list[i]}", "%d/%m/%Y").date() + timedelta(days=1) } )
-            event_details.update( { 'fullday' : True } )
-            logger.info(f"Full day event")
-        
-        # add invitees, can be 1 or more separated by a space
-        if invite:
-            event_details.update( { 'invite' : invite } )
-            logger.info(f"Invites requested for: {invite}")
-
-        # set alarm - all 3 parameters must be given otherwise none is set
-        if alarm_type and alarm_format and alarm_time:
-            alarm_type = alarm_type.upper()
-            alarm_format = alarm_format.upper()
-            if ( alarm_type == 'DISPLAY' or alarm_type == 'EMAIL') and ( alarm_format == 'H' or alarm_format == 'D' ):
-                
-                # check HH:MM format
-                if alarm_format == 'H':
-                    pattern_hour = r'^([0-9]|1[0-9]|2[0-3]):([0-9]|[0-5][0-9])$'
-                    if not re.match(pattern_hour, alarm_time):
-                        msg = f"Invalid time for alarm_format 'H': 'HH:MM'"
-                        logger.warning(msg)
-                        message_box(msg, msg_type='warning')
-                        raise ValueError(msg)
-
-                # check positive integer for days format
-                elif alarm_format == 'D':
-                    try:
-                        alarm_time = int(alarm_time)
-                        assert alarm_time > 0
-
-                    except Exception as exc:
-                        msg = f"Invalid time for alarm_format 'D': Integer > 0"
-                        logger.warning(msg)
-                        message_box(msg, msg_type='warning')
-                        raise ValueError(msg)
-
-                event_details.update( { 'alarm_type' : alarm_type } )
-                event_details.update( { 'alarm_format' : alarm_format } )
-                event_details.update( { 'alarm_time' : alarm_time } )
-                logger.info(f"Alarm requested: {alarm_type}, {alarm_format}, {alarm_time}")
+    # check timezone, resolved once and cached for all events
+    if tz:
+        try:
+            get_zone(tz)
+        except ValueError as exc:
+            syntax_error(str(exc))
 
-            else:
-                msg = f"Invalid alarm parameters:\n\n'alarm_type': 'DISPLAY' or 'EMAIL'\n'alarm_format': 'D' or 'H'"
-                logger.warning(msg)
-                message_box(msg, msg_type='warning')
-                raise ValueError(msg)
+    # check archive format
+    if export and os.path.splitext(export)[1].lower() not in SINKS:
+        syntax_error(f"Invalid export file: {export}, supported formats: {', '.join(SINKS)}")
 
-        # append event to list
-        events_list.append(event_details)
+    # set alarm - all 3 parameters must be given otherwise none is set
+    try:
+        alarm = check_alarm(alarm_type, alarm_format, alarm_time)
+        if alarm:
+            logger.info(f"Alarm requested: {alarm}")
+    except ValueError as exc:
+        logger.warning(str(exc))
+        message_box(str(exc), msg_type='warning')
+        raise
+
+    # parse, validate and deduplicate invitees once, distribution lists are expanded
+    attendees = []
+    if invite:
+        logger.info(f"Invites requested for: {invite}")
+        try:
+            attendees, invalid = parse_attendees(invite, load_distribution_lists(user_settings.get('distribution_lists')))
+        except (OSError, ValueError) as exc:
+            syntax_error(f"Cannot load distribution lists: {str(exc)}")
+        if invalid:
+            syntax_error(f"Invalid invite email address(es): {', '.join(invalid)}")
+
+    # one event for each start & end days/hours given, or for each schedule item
+    if schedule:
+        logger.info(f"Schedule given: {schedule}")
+        # holidays for the recurring items, weekends only if not configured
+        try:
+            calendar = working_calendar(user_settings.get('holidays'), user_settings.get('holiday_region'))
+        except (OSError, ValueError) as exc:
+            syntax_error(f"Cannot load holidays: {str(exc)}")
+        slots = parse_schedule(schedule, calendar)
+    else:
+        slots = iter_slots(start_day, end_day, start_hr, end_hr)
+    try:
+        # events streamed to an on-disk store, nothing is sent
+        if store_write:
+            count = write_store(store_write, slots, name, descr, cal, group, user_settings['domain'], loc=loc, invite=attendees,
+                                alarm=alarm, tz=tz, max_attendees=max_attendees(user_settings))
+            print(f"{count} events written to store: {store_write}")
+            if not noreport:
+                report_copy(user_settings)
+            return 0
+        # events read from an on-disk store, other event options are ignored
+        elif store_read:
+            events_list = EventStore(store_read)
+        # events parsed from an ICS file as they are read, name and hours options are ignored
+        elif import_ics:
+            events_list = IcsFile(import_ics, cal, group, user_settings['domain'], loc=loc)
+        else:
+            events_list = build_events(slots, name, descr, cal, group, user_settings['domain'], loc=loc, invite=attendees,
+                                       alarm=alarm, tz=tz, max_attendees=max_attendees(user_settings))
+    except (OSError, ValueError) as exc:
+        syntax_error(str(exc))
+
+    # sync: only new and changed events are sent, updates reuse UIDs/IDs of the previous runs
+    sync_index = None
+    if sync:
+        sync_index = SyncIndex(sync_index_file, user_settings, sync)
+        events_list, unchanged = sync_index.plan(events_list)
+        if not sync_delete:
+            sync_index.removed = []
+        print(f"\nSync '{sync}': {len(events_list)} eventi nuovi o modificati, {unchanged} invariati, {len(sync_index.removed)} da eliminare")
+        if not events_list and not sync_index.removed:
+            print("Nessuna modifica da inviare")
+            if not noreport:
+                report_copy(user_settings)
+            return 0
 
 
     # print events summary
     logger.info(f"print events summary")
     output_tk = ''
-    print(f"\nI seguenti ({len(start_day_list)}) eventi saranno creati:\n")
+    print(f"\nI seguenti ({len(events_list)}) eventi saranno creati:\n")
 
-    # cycle over events list
+    # cycle over events list, only the first ones on big runs
     for j, event_n in enumerate(events_list):
+        if j == SUMMARY_MAX:
+            string_output = f"... e altri {len(events_list) - SUMMARY_MAX} eventi\n"
+            output_tk += string_output
+            print(string_output)
+            break
 
-        string_output = (f"Evento {j+1}/{len(start_day_list)}\n"
+        string_output = (f"Evento {j+1}/{len(events_list)}\n"
               f"-----------\n"
               f"NOME:           {event_n['name']}\n"
               f"DESCRIZIONE:    {event_n['description']}\n\n"
@@ -736,8 +1091,10 @@ def main(config, name, descr, start_day, start_hr, end_day, end_hr, loc, cal, gr
               f"DATA FINE:      {datetime.strftime(event_n['end'], '%d/%m/%Y %H:%M:%S')}\n"
               f"LUOGO:          {event_n['location'] if 'location' in event_n else 'None'}\n"
               f"CALENDARIO:     {event_n['calendar']}")
-        if invite:
-            string_output += f"\nINVITATI:       {event_n['invite']}"
+        if 'invite' in event_n:
+            # long lists are cut, first 10 shown
+            more = len(event_n['invite']) - 10
+            string_output += f"\nINVITATI:       {' '.join(event_n['invite'][:10])}{f' (+{more})' if more > 0 else ''}"
         if 'alarm_type' in event_n:
             string_output += f"\nREMINDER:       {event_n['alarm_type']}, {event_n['alarm_time']}{event_n['alarm_format']} prima"
         string_output += "\n----------------------------------------------\n"
@@ -745,14 +1102,34 @@ def main(config, name, descr, start_day, start_hr, end_day, end_hr, loc, cal, gr
         # append and print
         output_tk += string_output
         print(string_output)
+
+    # invitees over the backend limit: each slot is split in copies, the organizer gets all of them
+    limit = max_attendees(user_settings)
+    if len(attendees) > limit:
+        copies = -(-len(attendees) // limit)
+        string_output = (f"ATTENZIONE: {len(attendees)} invitati, oltre il limite di {limit} per evento: ogni evento "
+                         f"è diviso in {copies} copie con UID diversi, l'organizzatore riceverà {copies} copie\n")
+        logger.warning(f"{len(attendees)} attendees over the limit of {limit}, {copies} copies per event")
+        output_tk += string_output
+        print(string_output)
     
-    # skip user confirmation if enabled with --noprompt
-    if noprompt:
+    # render only, skip confirmation and network
+    if dryrun:
+        dry_run(events_list, dryrun_dir, export)
+    # queued and sent in background, no confirmation
+    elif enqueue:
+        count = enqueue_events(events_list, config)
+        print(f"{count} eventi in coda, inviati in background")
+        if not noreport:
+            report_copy(user_settings)
+        return 0
+    # skip user confirmation if enabled with --noprompt, headless
+    elif noprompt:
         logger.info(f"Proceed creating events")
-        create_events(events_list)
+        progress_console(events_list, export, sync_index)
     else:
         logger.info(f"Wait for user prompt to proceed")
-        confirm_events(output_tk, events_list)
+        confirm_events(output_tk, events_list, export, sync_index)
         #input("Press enter to confirm")
 
 
@@ -0,0 +1,33 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# calendar_pyhandler
+2025-07-01
+
+Library API of calendar-pyhandler, see client.py and mirror.py. Import it with the repository root in sys.path.
+"""
+
+from calendar_pyhandler.client import Client, BatchResult, EventResult
+from calendar_pyhandler.mirror import mirror, MirrorResult
+from core.settings import SettingsError
+from core.eventBuilder import build_events, iter_slots
+from core.scheduleParser import parse_schedule
+from core.workingDays import working_calendar
+from agents.httpTransport import CircuitOpenError
+
+__all__ = ['Client', 'BatchResult', 'EventResult', 'mirror', 'MirrorResult', 'SettingsError', 'CircuitOpenError', 'build_events', 'iter_slots', 'parse_schedule', 'working_calendar']
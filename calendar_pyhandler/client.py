@@ -0,0 +1,430 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# client.py
+2025-07-01
+
+In-process API for batch calendar operations, for apps using calendar-pyhandler as a library:
+no GUI, no global state, no sys.exit. One Client holds one agent, so login, connection pools and caches
+are reused across calls; batches are sent with the adaptive concurrency of core/concurrency.py.
+
+Usage:
+    from calendar_pyhandler import Client, build_events, iter_slots
+
+    with Client(config="user_settings.json") as client:
+        events = build_events(iter_slots("01/07/2025", "01/07/2025", "09:00", "13:00"), "Training", "Room B",
+                              "personal", False, client.settings['domain'])
+        created = []
+        result = client.create(events, on_result=lambda r: r.ok and created.append(r.event_id))
+        print(result.ok, result.failed, [r.message for r in result.failures])
+        client.delete([(event_id, "personal", False) for event_id in created])
+
+A BatchResult holds counters and the failed events only, each EventResult is passed to on_result as it completes:
+memory does not grow with the batch size. Errors of single events are in the results; settings errors raise
+SettingsError. If the backend goes down mid-batch the rest is not sent: BatchResult.error tells why and
+BatchResult.not_sent how many.
+With verify=True the sent events are confirmed on the server in bulk and missing ones are sent again once.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from collections.abc import Sequence
+from agents.caldavAgent import CaldavAgent
+from agents.mgraphAgent import MGraphAgent
+from agents.httpTransport import CircuitOpenError
+from core.settings import load_settings, resolve_secrets, validate_settings
+from core.concurrency import AdaptiveController, run_adaptive, DEFAULT_MAX_CONCURRENCY
+from core.etagCache import EtagCache
+from core.exportSink import open_sink
+from core.renderPool import render_ics
+from core.syncIndex import SyncIndex
+from core.freeSlots import BusyCache, WORKING_WEEKDAYS, merge_intervals, working_windows, find_slots
+from core.workingDays import working_calendar
+from core.timezones import get_zone
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+
+
+class EventResult():
+    __slots__ = ('index', 'action', 'ok', 'message', 'event_id')
+
+    def __init__(self, index: int, action: str, ok: bool, message: str, event_id: str = None):
+        self.index = index
+        self.action = action
+        self.ok = ok
+        self.message = message
+        self.event_id = event_id
+
+
+    def __repr__(self) -> str:
+        return f"EventResult({self.index}, {self.action}, ok={self.ok}, event_id={self.event_id!r}, message={self.message!r})"
+
+
+
+# failed events kept in a BatchResult, the others are only counted
+MAX_FAILURES = 1000
+
+
+
+# counters of a batch and the EventResults of the first MAX_FAILURES failed events
+class BatchResult():
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.ok = 0
+        self.failed = 0
+        # events OK per action, e.g. {'create': 10, 'delete': 2}
+        self.actions = {}
+        self.failures = []
+        self.error = None
+        # with verify: events confirmed on the server, and sent again because missing
+        self.verified = None
+        self.requeued = 0
+        # stopped by Client.cancel, the rest of the batch is not sent
+        self.cancelled = False
+
+
+    # count the result of an event
+    def add(self, event_result: EventResult) -> None:
+        if event_result.ok:
+            self.ok += 1
+            self.actions[event_result.action] = self.actions.get(event_result.action, 0) + 1
+        else:
+            self.failed += 1
+            if len(self.failures) < MAX_FAILURES:
+                self.failures.append(event_result)
+
+
+    # an event counted OK failed afterwards (e.g. missing on the server after verify)
+    def fail(self, event_result: EventResult) -> None:
+        self.ok -= 1
+        self.actions[event_result.action] -= 1
+        self.add(event_result)
+
+
+    # events sent, OK or not
+    @property
+    def done(self) -> int:
+        return self.ok + self.failed
+
+
+    @property
+    def not_sent(self) -> int:
+        return max(0, self.total - self.done)
+
+
+
+class Client():
+
+    def __init__(self,
+                user_settings: dict = None,
+                config: str = None,
+                etag_cache_file: str = None,
+                sync_index_file: str = "sync_index.json",
+                user_agent: str = None,
+                freebusy_cache_file: str = None,
+                cancel: threading.Event = None,
+        ):
+        # settings from file (validated and cached) or from a dict
+        self.settings = load_settings(config) if config else validate_settings(resolve_secrets(dict(user_settings)))
+        self.sync_index_file = sync_index_file
+        self.freebusy_cache_file = freebusy_cache_file
+        # set to stop the running batch between events: requests in flight complete, caches and index are saved
+        self.cancel_event = cancel if cancel is not None else threading.Event()
+
+        # CalDAV conditional writes, if a cache file is given
+        self.etag_cache = EtagCache(etag_cache_file, self.settings) if etag_cache_file and self.settings['mode'] == 'caldav' else None
+
+        if self.settings['mode'] == 'caldav':
+            self.agent = CaldavAgent(self.settings, user_agent=user_agent, etag_cache=self.etag_cache)
+        else:
+            self.agent = MGraphAgent(self.settings, user_agent=user_agent)
+        logger.info(f"Client ready, mode: {self.settings['mode']}, user: {self.settings['username']}")
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        if self.etag_cache:
+            self.etag_cache.save()
+        self.agent.close()
+
+
+    # stop the running batch, from any thread
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+
+    # calendars available to the user: [{'name', 'id', 'group'}]
+    def calendars(self) -> list:
+        return self.agent.list_calendars()
+
+
+    # create events. With return_ids the server IDs are read back (Graph answers with the full event)
+    # verify: check the events are on the server after the batch, missing ones are sent again (Graph needs the IDs)
+    def create(self, events, export: str = "", on_result=None, return_ids: bool = True, verify: bool = False) -> BatchResult:
+        if verify:
+            events = events if isinstance(events, Sequence) else list(events)
+            return_ids = True
+
+        def submit(event, ics):
+            args = {'ics': ics} if ics is not None else {}
+            if return_ids:
+                return self.agent.sync_event(event, None, **args)
+            res, msg = self.agent.create_event(event, **args)
+            return res, msg, event['uid'] if self.settings['mode'] == 'caldav' else None
+
+        sent = {} if verify else None
+        result = self.__run(events, submit, lambda event: 'create', export, on_result, sent=sent)
+        if verify and not result.error and not result.cancelled:
+            self.__verify(events, result, submit, lambda event: 'create', sent, on_result)
+        return result
+
+
+    # update events in place: events and their server IDs (CalDAV: the UID), same order
+    def update(self, events: list, event_ids: list, on_result=None) -> BatchResult:
+        def submit(pair, ics):
+            event, event_id = pair
+            if self.settings['mode'] == 'caldav':
+                event = dict(event) | {'uid': event_id}
+            return self.agent.sync_event(event, event_id)
+        # CalDAV UIDs are replaced first, payloads are rendered by the agent
+        return self.__run(list(zip(events, event_ids)), submit, lambda pair: 'update', on_result=on_result, render=False,
+                          event_of=lambda pair: pair[0])
+
+
+    # delete events: [(event_id, calendar, group)]
+    def delete(self, refs: list, on_result=None) -> BatchResult:
+        def submit(ref, ics):
+            res, msg = self.agent.delete_event(*ref)
+            return res, msg, ref[0]
+        return self.__run(refs, submit, lambda ref: 'delete', on_result=on_result, render=False,
+                          event_of=lambda ref: {'calendar': ref[1], 'group': ref[2]})
+
+
+    # read the events of a calendar from start to end (dates, end excluded), recurring events expanded by the server
+    # yields pages, lists of 'events_list' items with the source UID or ID in 'source_id'
+    def events(self, start: date, end: date, calendar: str, group: bool = False):
+        return self.agent.iter_events(start, end, calendar, group)
+
+
+    # earliest count common free slots of the addresses, of duration, inside working hours (start, end times local to
+    # zone, default settings 'timezone') of the working days from start_day to end_day (end excluded, holidays of the
+    # 'holidays' settings file skipped), not in the past
+    # Returns (slots, unknown): [(start, end)] aware datetimes in zone, addresses without free/busy (not considered)
+    def free_slots(self, addresses: list, start_day: date, end_day: date, duration: timedelta, hours: tuple, count: int = 5,
+                   step: timedelta = timedelta(minutes=30), zone: str = "", weekdays=WORKING_WEEKDAYS) -> tuple[list, list]:
+        zone = get_zone(zone or self.settings.get('timezone') or "UTC")
+        calendar = working_calendar(self.settings.get('holidays'), self.settings.get('holiday_region'))
+        windows = list(working_windows(start_day, end_day, hours, zone, weekdays, not_before=datetime.now(timezone.utc), calendar=calendar))
+        # busy days are UTC days: local working hours may cross UTC midnight, fetched from the UTC bounds of the windows
+        fetch_start, fetch_end = (windows[0][0].date(), windows[-1][1].date() + timedelta(days=1)) if windows else (start_day, end_day)
+        busy, unknown = BusyCache(self.freebusy_cache_file, self.settings).busy(self.agent, addresses, fetch_start, fetch_end)
+        merged = merge_intervals(busy)
+        slots = find_slots(merged, windows, duration, count, step)
+        logger.info(f"free_slots: {len(busy)} busy intervals, {len(merged)} merged, {len(slots)} slots found")
+        return [(start.astimezone(zone), end.astimezone(zone)) for start, end in slots], unknown
+
+
+    # compare events with the sync index of the scope: returns (index, events to send, unchanged count)
+    def plan_sync(self, events, scope: str, delete: bool = False) -> tuple[SyncIndex, list, int]:
+        index = SyncIndex(self.sync_index_file, self.settings, scope)
+        changes, unchanged = index.plan(events)
+        if not delete:
+            index.removed = []
+        return index, changes, unchanged
+
+
+    # send a planned sync: new and changed events, then deletion of removed ones. Index is saved
+    # deletions are passed to on_result too, with action 'delete' (index: position in the batch)
+    def send_sync(self, index: SyncIndex, changes: list, export: str = "", on_result=None, verify: bool = False) -> BatchResult:
+        def submit(event, ics):
+            args = {'ics': ics} if ics is not None else {}
+            res, msg, event_id = self.agent.sync_event(event, index.server_id(event), **args)
+            if res:
+                index.record(event, event_id)
+            return res, msg, event_id
+
+        def action(event):
+            return 'update' if index.server_id(event) else 'create'
+
+        try:
+            sent = {} if verify else None
+            result = self.__run(changes, submit, action, export, on_result, sent=sent)
+            if verify and not result.error and not result.cancelled:
+                self.__verify(changes, result, submit, action, sent, on_result)
+            if result.error or result.cancelled:
+                return result
+
+            # removed from the schedule since the last sync
+            result.total += len(index.removed)
+            for key, entry in index.removed:
+                _, event_id, _, calendar, group = entry
+                try:
+                    res, msg = self.agent.delete_event(event_id, calendar, group)
+                except CircuitOpenError as exc:
+                    result.error = f"{exc}. Events sent: {result.ok}, failed: {result.failed}, not sent: {result.not_sent}"
+                    logger.error(result.error)
+                    break
+                if res:
+                    index.forget(key)
+                event_result = EventResult(result.done, 'delete', res, f"{key}\n{msg}", event_id)
+                result.add(event_result)
+                if on_result:
+                    on_result(event_result)
+            return result
+        finally:
+            index.save()
+
+
+    # plan and send in one call
+    def sync(self, events, scope: str, delete: bool = False, export: str = "", on_result=None, verify: bool = False) -> BatchResult:
+        index, changes, unchanged = self.plan_sync(events, scope, delete)
+        return self.send_sync(index, changes, export, on_result, verify)
+
+
+    # check events are on the server: refs [(event_id, calendar, group)], returns the missing ones
+    # CalDAV: calendar-multiget REPORTs, Graph: $batch GETs, a few requests for a whole run
+    def verify(self, refs: list) -> list:
+        return self.agent.verify_events(refs)
+
+
+    # verify the events sent OK (sent: index -> event ID) and send the missing ones again, once. Events sent again
+    # are passed to on_result again with their final result, events still missing after that are counted as failed
+    def __verify(self, events, result: BatchResult, submit, action, sent: dict, on_result=None) -> None:
+        def refs_of(items):
+            return [(event_id, events[j]['calendar'], events[j].get('group', False)) for j, event_id in items]
+
+        try:
+            missing = self.verify(refs_of(sent.items()))
+            result.verified = len(sent) - len(missing)
+            if not missing:
+                return
+
+            # events may be missing because of 202 accepted and then dropped, lost writes, server side cleanup
+            by_id = {event_id: j for j, event_id in sent.items()}
+            indexes = [by_id[ref[0]] for ref in missing]
+            logger.warning(f"verify: {len(missing)} events missing on the server, sending them again")
+            retried = {}
+
+            def collect(r):
+                retried[indexes[r.index]] = EventResult(indexes[r.index], r.action, r.ok, f"{r.message}\nsent again, missing on the server", r.event_id)
+
+            again = self.__run([events[j] for j in indexes], submit, action, on_result=collect)
+            result.requeued = again.done
+
+            still = {ref[0] for ref in self.verify(refs_of((j, r.event_id) for j, r in retried.items() if r.ok))}
+            for j, r in retried.items():
+                if r.event_id in still:
+                    r.ok = False
+                    r.message = f"{r.message}\nERROR: still missing on the server"
+                elif r.ok:
+                    result.verified += 1
+                # counted OK when first sent
+                if not r.ok:
+                    result.fail(r)
+                if on_result:
+                    on_result(r)
+
+        # verification failed (backend down, REPORT or $batch not supported): events are sent, just not verified
+        except Exception as exc:
+            result.verified = None
+            logger.warning(f"verify failed, events not verified: {repr(exc)}")
+
+
+    # send items with submit(item, ics) -> (res, msg, event_id), CalDAV payloads rendered in the pool if set
+    # action(item) names the operation in the results. An exception of one item fails that item only, except
+    # CircuitOpenError (backend down) that stops the batch
+    # on_result(EventResult) is called as each one completes. Archive copy written to export, if given
+    # event_of(item) gives the event dict of an item, for the endpoint of the adaptive limiter
+    # sent: dict filled with index -> event ID of the items sent OK, for verify
+    def __run(self, items, submit, action, export: str = "", on_result=None, render: bool = True, event_of=None,
+              sent: dict = None) -> BatchResult:
+        result = BatchResult(len(items) if hasattr(items, '__len__') else 0)
+        sink = open_sink(export, self.settings) if export else None
+
+        if render and self.settings['mode'] == 'caldav':
+            rendered = render_ics(items, self.settings)
+        else:
+            rendered = ((item, None) for item in items)
+
+        def dispatched():
+            for j, (item, ics) in enumerate(rendered):
+                if self.cancel_event.is_set():
+                    result.cancelled = True
+                    logger.warning(f"batch cancelled, {j} events dispatched")
+                    # render pool shut down
+                    rendered.close()
+                    return
+                # archive copy is written in background while the event is sent
+                if sink:
+                    sink.write(item)
+                yield j, (item, ics, j)
+
+        def endpoint(entry):
+            return self.agent.endpoint(event_of(entry[0]) if event_of else entry[0])
+
+        # run_adaptive expects (res, msg), for throttling detection: the full outcome of each item is kept aside
+        outcomes = {}
+
+        def submit_entry(entry):
+            item, ics, j = entry
+            try:
+                outcome = (action(item), *submit(item, ics))
+            except CircuitOpenError:
+                raise
+            except Exception as exc:
+                logger.error(f"event {j} not sent: {repr(exc)}")
+                outcome = (action(item), False, f"ERROR: {repr(exc)}", None)
+            outcomes[j] = outcome
+            return outcome[1], outcome[2]
+
+        controller = AdaptiveController(int(self.settings.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)))
+        try:
+            for j, _, _, _ in run_adaptive(dispatched(), submit_entry, endpoint, controller):
+                event_result = EventResult(j, *outcomes.pop(j))
+                result.add(event_result)
+                if sent is not None and event_result.ok:
+                    sent[j] = event_result.event_id
+                if on_result:
+                    on_result(event_result)
+
+        # backend down: the rest of the batch fails fast
+        except CircuitOpenError as exc:
+            result.error = f"{exc}. Events sent: {result.ok}, failed: {result.failed}, not sent: {result.not_sent}"
+            logger.error(result.error)
+
+        finally:
+            if sink and not sink.close():
+                logger.warning(f"Export archive incomplete: {sink.path}, error: {sink.error}")
+            if self.etag_cache:
+                self.etag_cache.save()
+
+        logger.info(f"batch done: {result.ok} ok, {result.failed} failed, {result.not_sent} not sent")
+        return result
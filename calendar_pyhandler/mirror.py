@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# mirror.py
+2025-07-04
+
+Backend to backend mirroring: the events of a calendar are read in pages from one account (CalDAV calendar-query
+REPORTs or Graph calendarView) and written to a calendar of another account, CalDAV or Graph, with the adaptive
+concurrency of the target Client. Pages are planned against the sync index while they are read, so memory is bounded
+by the page size and the index, not by the number of events.
+
+The sync index scope of the target account is 'mirror:<source account>:<source calendar>><target calendar>', keyed by
+the source UID (CalDAV, with the RECURRENCE-ID of expanded occurrences) or ID (Graph): reruns send only new and changed
+events, with delete=True events gone from the source window are deleted from the target.
+Events written by the opposite mirror (target to source) are skipped, so a two-way mirror does not bounce them back.
+Attendees are not copied unless attendees=True: the target backend would send the invitations again.
+
+Usage:
+    from calendar_pyhandler import Client, mirror
+
+    with Client(config="caldav.json") as source, Client(config="graph.json") as target:
+        result = mirror(source, target, date(2025, 7, 1), date(2026, 1, 1), "personal", "personal")
+        print(result.read, result.ok, result.failed, result.unchanged)
+"""
+
+import logging
+from datetime import date
+from calendar_pyhandler.client import Client, BatchResult
+from core.syncIndex import SyncIndex
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+
+
+# BatchResult with the mirror counters
+class MirrorResult(BatchResult):
+
+    def __init__(self, result: BatchResult):
+        super().__init__(result.total)
+        self.ok, self.failed, self.actions, self.failures = result.ok, result.failed, result.actions, result.failures
+        self.error = result.error
+        # events read from the source, unchanged since the last run, skipped because mirrored from the target
+        self.read = 0
+        self.unchanged = 0
+        self.echoes = 0
+
+
+# sync index scope of a mirror, in the target account
+def mirror_scope(source_settings: dict, source_calendar: str, target_calendar: str) -> str:
+    return f"mirror:{source_settings['mode']}:{source_settings['domain']}:{source_settings['username']}:{source_calendar}>{target_calendar}"
+
+
+# mirror source_calendar events from start to end (dates, end excluded) to target_calendar. Returns a MirrorResult,
+# on_result(EventResult) is called for each event sent (event index in send order)
+def mirror(source: Client, target: Client, start: date, end: date, source_calendar: str, target_calendar: str,
+           source_group: bool = False, target_group: bool = False, delete: bool = False, attendees: bool = False,
+           on_result=None) -> MirrorResult:
+    index = SyncIndex(target.sync_index_file, target.settings, mirror_scope(source.settings, source_calendar, target_calendar))
+
+    # IDs in the source account of the events mirrored the other way
+    echoes = SyncIndex(source.sync_index_file, source.settings, mirror_scope(target.settings, target_calendar, source_calendar)).known_ids()
+    counts = {'read': 0, 'unchanged': 0, 'echoes': 0, 'planned': 0}
+    logger.info(f"mirror {source.settings['mode']}:{source_calendar} to {target.settings['mode']}:{target_calendar}, from {start} to {end}")
+
+    def changes():
+        for page in source.events(start, end, source_calendar, source_group):
+            keyed = []
+            for event in page:
+                counts['read'] += 1
+                source_id = event.pop('source_id', None) or event['uid']
+                if source_id.split('|')[0] in echoes:
+                    counts['echoes'] += 1
+                    continue
+                event['calendar'] = target_calendar
+                event['group'] = target_group
+                if not attendees:
+                    event.pop('invite', None)
+                keyed.append((source_id, event))
+
+            page_changes, unchanged = index.plan_page(keyed)
+            counts['unchanged'] += unchanged
+            counts['planned'] += len(page_changes)
+            yield from page_changes
+
+        # the whole window is read: what is left in the index is gone from the source
+        index.removed = index.unseen() if delete else []
+        logger.info(f"mirror plan: {counts['planned']} to send, {counts['unchanged']} unchanged, {len(index.removed)} removed")
+
+    result = MirrorResult(target.send_sync(index, changes(), on_result=on_result))
+    result.total = counts['planned'] + len(index.removed)
+    result.read, result.unchanged, result.echoes = counts['read'], counts['unchanged'], counts['echoes']
+    logger.info(f"mirror done: {result.read} read, {result.ok} ok, {result.failed} failed, {result.unchanged} unchanged, {result.echoes} echoes skipped")
+    return result
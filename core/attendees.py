@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# attendees.py
+2025-06-22
+
+Attendees pipeline: the --invite string is parsed, normalized, validated and deduplicated once per run,
+distribution lists are expanded from a local JSON file, and oversized lists are chunked to backend limits.
+
+Distribution lists file format (user settings 'distribution_lists' key), lists may include other lists:
+       {
+           "trainers" : ["jane.doe@domain.com", "john.doe@domain.com"],
+           "all-staff" : ["trainers", "info@domain.com"]
+       }
+"""
+
+import json
+import logging
+import regex as re
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# max attendees per event, may be overridden by user settings 'max_attendees'
+MAX_ATTENDEES = {
+    'microsoft_graph': 500,
+    'caldav': 100,
+}
+
+# addresses in --invite may be separated by spaces, commas or semicolons
+PATTERN_SEP = re.compile(r'[\s,;]+')
+PATTERN_EMAIL = re.compile(r'^[\w.!#$%&\'*+/=?^`{|}~-]+@[\w-]+(?:\.[\w-]+)*\.\w{2,}$')
+
+
+
+# load distribution lists JSON file, {} if not configured
+def load_distribution_lists(path: str) -> dict:
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        lists = json.load(f)
+    logger.info(f"Distribution lists loaded from {path}: {len(lists)} lists")
+    return {name.casefold(): members for name, members in lists.items()}
+
+
+# parse invite string: returns (valid, invalid) addresses, normalized and deduplicated in given order
+def parse_attendees(invite: str, lists: dict = None) -> tuple[list, list]:
+    lists = lists or {}
+    valid = {}
+    invalid = {}
+
+    def add(token: str, seen_lists: tuple):
+        token = token.strip().strip('<>')
+        if token.casefold().startswith('mailto:'):
+            token = token[7:]
+        if not token:
+            return
+
+        key = token.casefold()
+        # distribution list, expanded once, loops are ignored
+        if key in lists:
+            if key not in seen_lists:
+                for member in lists[key]:
+                    add(member, seen_lists + (key,))
+            return
+
+        if PATTERN_EMAIL.match(token):
+            valid.setdefault(key, token)
+        else:
+            invalid.setdefault(key, token)
+
+    for token in PATTERN_SEP.split(invite or ""):
+        add(token, ())
+
+    logger.info(f"Attendees parsed: {len(valid)} valid, {len(invalid)} invalid")
+    return list(valid.values()), list(invalid.values())
+
+
+# split attendees in chunks of max_size, raises ValueError if max_size is below 1
+def chunk_attendees(attendees: list, max_size: int) -> list:
+    if max_size < 1:
+        raise ValueError(f"Invalid max attendees per event: {max_size}, must be at least 1")
+    if not attendees:
+        return [attendees]
+    return [attendees[i:i + max_size] for i in range(0, len(attendees), max_size)]
+
+
+# max attendees per event for the user backend
+def max_attendees(user_settings: dict) -> int:
+    return int(user_settings.get('max_attendees', MAX_ATTENDEES.get(user_settings.get('mode'), 100)))
+
+
+# attendees list from event 'invite', either a list or a space separated string
+def as_list(invite) -> list:
+    return invite.split() if isinstance(invite, str) else list(invite)
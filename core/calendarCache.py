@@ -0,0 +1,138 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# calendarCache.py
+2025-06-20
+
+Calendar name to ID resolution, backed by an on-disk JSON cache with TTL.
+Calendars are discovered via the agent list_calendars() only when the cache for the account is missing or expired,
+or when a name is unknown; unknown names are remembered too, so IDs given as is cost no lookup on each run.
+
+Cache file format, one entry per account ("mode:domain:username"):
+       {
+           "caldav:cloud.domain.com:jane.doe": {
+               "timestamp": 1718000000.0,
+               "calendars": [{"name": "Training Room", "id": "training-room", "group": false}],
+               "unresolved": ["some-calendar-id"]
+           }
+       }
+"""
+
+import os
+import json
+import time
+import logging
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# default cache time to live, seconds. May be overridden by user settings 'calendar_cache_ttl'
+DEFAULT_TTL = 24 * 3600
+
+
+
+class CalendarCache():
+
+    def __init__(self, cache_file: str, user_settings: dict):
+        self.cache_file = cache_file
+        self.ttl = float(user_settings.get('calendar_cache_ttl', DEFAULT_TTL))
+        self.key = f"{user_settings['mode']}:{user_settings['domain']}:{user_settings['username']}"
+        self.__data = self.__load()
+
+
+    def __load(self) -> dict:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Invalid calendar cache file {self.cache_file}, ignored: {repr(exc)}")
+            return {}
+
+
+    def __save(self) -> None:
+        # write and rename, a crash never leaves a truncated cache
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.__data, f, indent=4)
+        os.replace(tmp_file, self.cache_file)
+
+
+    def __entry(self) -> dict:
+        entry = self.__data.get(self.key)
+        if entry and time.time() - entry.get('timestamp', 0) < self.ttl:
+            return entry
+        return None
+
+
+    # cached calendars for the account, None if missing or expired
+    def calendars(self) -> list:
+        entry = self.__entry()
+        return entry['calendars'] if entry else None
+
+
+    # store discovered calendars, resets unresolved names
+    def update(self, calendars: list) -> None:
+        self.__data[self.key] = {'timestamp': time.time(), 'calendars': calendars, 'unresolved': []}
+        self.__save()
+        logger.info(f"calendar cache updated for {self.key}: {len(calendars)} calendars")
+
+
+    # lookup by ID or name (case insensitive), returns (id, group) or None. 'unresolved' if known as not found
+    def lookup(self, name: str):
+        entry = self.__entry()
+        if not entry:
+            return None
+        for cal in entry['calendars']:
+            if cal['id'] == name:
+                return cal['id'], cal['group']
+        for cal in entry['calendars']:
+            if cal['name'].casefold() == name.casefold():
+                return cal['id'], cal['group']
+        if name in entry.get('unresolved', []):
+            return 'unresolved'
+        return None
+
+
+    def add_unresolved(self, name: str) -> None:
+        entry = self.__entry()
+        if entry:
+            entry.setdefault('unresolved', []).append(name)
+            self.__save()
+
+
+    # resolve a calendar name to (id, group). fetch() returns the calendars list, None skips discovery (offline)
+    def resolve(self, name: str, fetch=None) -> tuple[str, bool]:
+        found = self.lookup(name)
+        if found is None and fetch:
+            logger.info(f"calendar '{name}' not in cache, discovering calendars")
+            self.update(fetch())
+            found = self.lookup(name)
+            if found is None:
+                self.add_unresolved(name)
+
+        if found and found != 'unresolved':
+            logger.info(f"calendar '{name}' resolved to ID: {found[0]}, group: {found[1]}")
+            return found
+
+        # not a known name, used as ID as is
+        logger.info(f"calendar '{name}' not resolved, used as ID")
+        return name, None
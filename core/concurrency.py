@@ -0,0 +1,187 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# concurrency.py
+2025-06-30
+
+Adaptive concurrency for events submission: an AIMD controller per backend endpoint (Graph /me/events,
+/groups/{id}/events, a CalDAV collection...) sets how many requests may be in flight on it.
+  * slow start: in-flight requests doubled each round trip, until the first decrease
+  * additive increase: +1 in-flight request per round trip while latency stays healthy
+  * multiplicative decrease: x0.5 on 429/503 answers, x0.9 when p95 latency rises over TOLERANCE times the
+    best observed p50; at most once per round trip
+Throttled requests are retried after a growing pause, up to MAX_RETRIES times.
+
+Max in-flight requests, per endpoint and overall: user settings 'max_concurrency' (default DEFAULT_MAX_CONCURRENCY,
+1 = sequential).
+
+Usage:
+    controller = AdaptiveController(maximum=16)
+    for index, item, res, msg in run_adaptive(enumerate(items), submit, endpoint, controller):
+        ...
+"""
+
+import time
+import logging
+import threading
+import regex as re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 8
+MAX_RETRIES = 3
+RETRY_PAUSE = 1.0
+
+# p95 over TOLERANCE x best p50 means the backend is queueing
+TOLERANCE = 2.0
+WINDOW = 20
+
+# agents error messages: "ERROR: <status>, ..."
+PATTERN_THROTTLED = re.compile(r'ERROR: (?:429|503)\b')
+
+
+
+class AimdLimiter():
+
+    def __init__(self, name: str, initial: int = 1, maximum: int = DEFAULT_MAX_CONCURRENCY):
+        self.name = name
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.in_flight = 0
+        self.__latencies = deque(maxlen=WINDOW)
+        self.__baseline = None
+        self.__last_decrease = 0.0
+        self.__slow_start = True
+        self.__cond = threading.Condition()
+
+
+    def acquire(self) -> None:
+        with self.__cond:
+            while self.in_flight >= int(self.limit):
+                self.__cond.wait()
+            self.in_flight += 1
+
+
+    # report a completed request: its latency and if it was throttled (429/503)
+    def release(self, latency: float, throttled: bool = False) -> None:
+        with self.__cond:
+            self.in_flight -= 1
+            if throttled:
+                self.__decrease(0.5, latency)
+            else:
+                self.__latencies.append(latency)
+                if len(self.__latencies) >= WINDOW // 2:
+                    ordered = sorted(self.__latencies)
+                    p50 = ordered[len(ordered) // 2]
+                    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                    # best p50 seen, slowly forgotten to follow backend changes
+                    self.__baseline = p50 if self.__baseline is None else min(self.__baseline * 1.001, p50)
+                    if p95 > self.__baseline * TOLERANCE:
+                        self.__decrease(0.9, p95)
+                    else:
+                        self.__increase()
+                else:
+                    self.__increase()
+            self.__cond.notify_all()
+
+
+    def __increase(self) -> None:
+        self.limit = min(self.maximum, self.limit + (1 if self.__slow_start else 1 / self.limit))
+
+
+    def __decrease(self, factor: float, rtt: float) -> None:
+        now = time.monotonic()
+        if now - self.__last_decrease < rtt:
+            return
+        self.__last_decrease = now
+        self.__slow_start = False
+        self.limit = max(1.0, self.limit * factor)
+        self.__latencies.clear()
+        logger.info(f"AIMD {self.name}: limit down to {self.limit:.1f}")
+
+
+
+class AdaptiveController():
+
+    def __init__(self, maximum: int = DEFAULT_MAX_CONCURRENCY):
+        self.maximum = maximum
+        self.__limiters = {}
+        self.__lock = threading.Lock()
+
+
+    def limiter(self, endpoint: str) -> AimdLimiter:
+        with self.__lock:
+            if endpoint not in self.__limiters:
+                self.__limiters[endpoint] = AimdLimiter(endpoint, maximum=self.maximum)
+            return self.__limiters[endpoint]
+
+
+    # current in-flight limit per endpoint
+    def limits(self) -> dict:
+        with self.__lock:
+            return {name: int(limiter.limit) for name, limiter in self.__limiters.items()}
+
+
+
+# submit(item) -> (res, msg) on items [(index, item)], endpoint(item) -> endpoint name
+# yields (index, item, res, msg) as requests complete. Items are consumed lazily
+def run_adaptive(items, submit, endpoint, controller: AdaptiveController):
+    def task(item):
+        limiter = controller.limiter(endpoint(item))
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                res, msg = submit(item)
+            except Exception:
+                limiter.release(time.perf_counter() - start)
+                raise
+            throttled = not res and PATTERN_THROTTLED.search(msg) is not None
+            limiter.release(time.perf_counter() - start, throttled)
+            if not throttled or attempt == MAX_RETRIES:
+                return res, msg
+            time.sleep(RETRY_PAUSE * (attempt + 1))
+
+    # threads for one endpoint at its max, queued items bounded
+    workers = controller.maximum
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="submit") as executor:
+        pending = {}
+        items = iter(items)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(task, item)] = (index, item)
+
+            if pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    res, msg = future.result()
+                    yield index, item, res, msg
+
+    logger.info(f"run_adaptive done, final limits: {controller.limits()}")
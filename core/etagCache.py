@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# etagCache.py
+2025-06-28
+
+Local cache of CalDAV event ETags and content hashes, for conditional writes (see CaldavAgent):
+  * href unknown:                PUT with If-None-Match: *, 412 means the event is already on the server
+  * href known, same content:    no request at all
+  * href known, changed content: PUT with If-Match: <etag>, 412 means it was changed on the server meanwhile
+
+Content hash ignores properties rendered fresh on each run (CREATED, DTSTAMP), so an unchanged event hashes the same.
+
+Cache file format, one entry per account ("mode:domain:username"), href relative to the user calendar home:
+       {
+           "caldav:cloud.domain.com:jane.doe": {
+               "personal/1717000000.0_123456_event-name@cloud.domain.com": ["\"etag\"", "sha1 of content"]
+           }
+       }
+Changes are kept in memory, call save() once done.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import regex as re
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# properties that change on every rendering of the same event
+PATTERN_VOLATILE = re.compile(rb'^(?:CREATED|DTSTAMP|LAST-MODIFIED)[;:].*\r?\n', re.MULTILINE)
+
+
+
+# sha1 of the ICS without volatile properties
+def content_hash(ics: bytes) -> str:
+    return hashlib.sha1(PATTERN_VOLATILE.sub(b'', ics)).hexdigest()
+
+
+
+class EtagCache():
+
+    def __init__(self, cache_file: str, user_settings: dict):
+        self.cache_file = cache_file
+        self.key = f"{user_settings['mode']}:{user_settings['domain']}:{user_settings['username']}"
+        self.__lock = threading.Lock()
+        self.__dirty = False
+        self.__data = self.__load()
+        self.__entries = self.__data.setdefault(self.key, {})
+
+
+    def __load(self) -> dict:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Invalid ETag cache file {self.cache_file}, ignored: {repr(exc)}")
+            return {}
+
+
+    # (etag, hash) for the href, None if unknown. etag may be None if the server did not return it
+    def get(self, href: str):
+        with self.__lock:
+            entry = self.__entries.get(href)
+        return tuple(entry) if entry else None
+
+
+    def set(self, href: str, etag: str, ics_hash: str) -> None:
+        with self.__lock:
+            self.__entries[href] = [etag, ics_hash]
+            self.__dirty = True
+
+
+    def drop(self, href: str) -> None:
+        with self.__lock:
+            if self.__entries.pop(href, None):
+                self.__dirty = True
+
+
+    def save(self) -> None:
+        with self.__lock:
+            if not self.__dirty:
+                return
+            # write and rename, a crash never leaves a truncated cache
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.__data, f)
+            os.replace(tmp_file, self.cache_file)
+            self.__dirty = False
+        logger.info(f"ETag cache saved: {len(self.__entries)} entries for {self.key}")
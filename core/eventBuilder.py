@@ -0,0 +1,248 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# eventBuilder.py
+2025-06-10
+
+Arguments validation and events list building, shared by the CLI client and by offline tools (dry-run, benchmarks).
+No GUI and no network here: errors are returned as strings or raised as ValueError, the caller decides how to show them.
+
+'events_list' item format:
+       {
+           "name" : "event name",
+           "description" : "event description",
+           "calendar" : "personal",
+           "group" : False,
+           "uid" : "1717000000.0_123456_event-name@cloud.domain.com",
+           "start" : datetime or date,
+           "end" : datetime or date,
+           "fullday" : True,
+           "location" : "Main Office",                  # optional
+           "timezone" : "Europe/Rome",                  # optional, overrides user settings 'timezone'
+           "invite" : ["user1@mail.org", "user2@mail.net"],  # optional, see attendees.py
+           "alarm_type" : "DISPLAY",                    # optional, with alarm_format & alarm_time
+           "alarm_format" : "D",
+           "alarm_time" : 1
+       }
+
+See README.me for full details.
+"""
+
+import random
+import logging
+import regex as re
+from datetime import datetime, timedelta
+from core.attendees import chunk_attendees
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# alarm time format for 'H' alarms, HH:MM
+PATTERN_ALARM_HOUR = re.compile(r'^([0-9]|1[0-9]|2[0-3]):([0-9]|[0-5][0-9])$')
+
+
+
+# check string date format
+def check_date(date: str) -> tuple[bool, str]:
+    try:
+        datetime.strptime(date, "%d/%m/%Y")
+    except ValueError as err:
+        return False, err
+    return True, ""
+
+
+# check string time format
+def check_time(time: str) -> tuple[bool, str]:
+    try:
+        datetime.strptime(time, "%H:%M")
+    except ValueError as err:
+        return False, err
+    return True, ""
+
+
+# check if first date is after the second one
+def is_after_date(date_i: str, date_j: str) -> bool:
+    return datetime.strptime(date_i, "%d/%m/%Y") > datetime.strptime(date_j, "%d/%m/%Y")
+
+
+# check if first hour is after the second one
+def is_after_hour(date_i: str, date_j: str) -> bool:
+    return datetime.strptime(date_i, "%H:%M") > datetime.strptime(date_j, "%H:%M")
+
+
+# check arguments and return error strings
+def args_check(start_day: str, end_day: str, start_hr: str, end_hr: str) -> tuple[bool, str]:
+    logger.info(f"Running args check")
+
+    # start and end day are mandatory
+    if not start_day or not end_day:
+        return False, "Missing event start date or end date!"
+
+    # check START date format
+    start_day_list = start_day.split()
+    for start_d in start_day_list:
+        date_ok, date_err = check_date(start_d)
+        if not date_ok:
+            return False, date_err
+
+    # check END date format
+    end_day_list = end_day.split()
+    for end_d in end_day_list:
+        date_ok, date_err = check_date(end_d)
+        if not date_ok:
+            return False, date_err
+
+    # check list lenght, must be equal for start and end days
+    if len(start_day_list) != len(end_day_list):
+        return False, "Start & end days count cannot differ!"
+
+    # check START date is not after END date
+    for i, day in enumerate(start_day_list):
+        if is_after_date(start_day_list[i], end_day_list[i]):
+            err = f"Event start date cannot be after end date: {start_day_list[i]}, {end_day_list[i]}"
+            return False, err
+
+    # check time format, if any is given
+    if start_hr and end_hr:
+
+        start_hr_list = start_hr.split()
+        for start_hour in start_hr_list:
+            time_ok, time_err = check_time(start_hour)
+            if not time_ok:
+                return False, time_err
+
+        end_hr_list = end_hr.split()
+        for end_hour in end_hr_list:
+            time_ok, time_err = check_time(end_hour)
+            if not time_ok:
+                return False, time_err
+
+        # check list lenght, must be equal for start and end hours as well as for days count
+        if (len(start_hr_list) != len(end_hr_list)) or (len(start_hr_list) != len(start_day_list)):
+            return False, "Start and end hours count cannot differ!"
+
+        # check START hour is not after END hour
+        for i, hour in enumerate(start_hr_list):
+            if is_after_hour(start_hr_list[i], end_hr_list[i]):
+                err = f"Event start hour cannot be after end hour: {start_hr_list[i]}, {end_hr_list[i]}"
+                return False, err
+
+    return True, ""
+
+
+# yield (start, end, fullday) for each event, from already checked space-separated args
+def iter_slots(start_day: str, end_day: str, start_hr: str = "", end_hr: str = ""):
+    start_day_list = start_day.split()
+    end_day_list = end_day.split()
+    start_hr_list = start_hr.split() if start_hr and end_hr else None
+    end_hr_list = end_hr.split() if start_hr and end_hr else None
+
+    for i, day in enumerate(start_day_list):
+        # event with fixed hours, hours set to 00:00 equals full day event
+        if start_hr_list and not (start_hr_list[i] == "00:00" and end_hr_list[i] == "00:00"):
+            yield (datetime.strptime(f"{start_day_list[i]} {start_hr_list[i]}", "%d/%m/%Y %H:%M"),
+                   datetime.strptime(f"{end_day_list[i]} {end_hr_list[i]}", "%d/%m/%Y %H:%M"),
+                   False)
+        # full day event
+        else:
+            yield (datetime.strptime(start_day_list[i], "%d/%m/%Y").date(),
+                   datetime.strptime(end_day_list[i], "%d/%m/%Y").date() + timedelta(days=1),
+                   True)
+
+
+# validate alarm parameters: all 3 must be given otherwise none is set. Returns None or normalized tuple
+def check_alarm(alarm_type: str, alarm_format: str, alarm_time: str) -> tuple:
+    if not (alarm_type and alarm_format and alarm_time):
+        return None
+
+    alarm_type = alarm_type.upper()
+    alarm_format = alarm_format.upper()
+    if not (alarm_type in ('DISPLAY', 'EMAIL') and alarm_format in ('H', 'D')):
+        raise ValueError(f"Invalid alarm parameters:\n\n'alarm_type': 'DISPLAY' or 'EMAIL'\n'alarm_format': 'D' or 'H'")
+
+    # check HH:MM format
+    if alarm_format == 'H':
+        if not PATTERN_ALARM_HOUR.match(str(alarm_time)):
+            raise ValueError(f"Invalid time for alarm_format 'H': 'HH:MM'")
+
+    # check positive integer for days format
+    elif alarm_format == 'D':
+        try:
+            alarm_time = int(alarm_time)
+        except ValueError:
+            raise ValueError(f"Invalid time for alarm_format 'D': Integer > 0")
+        if alarm_time <= 0:
+            raise ValueError(f"Invalid time for alarm_format 'D': Integer > 0")
+
+    return alarm_type, alarm_format, alarm_time
+
+
+# unique event ID: timestamp + random + name @ domain
+def make_uid(name: str, domain: str) -> str:
+    return (f"{str(datetime.now().timestamp())}_{random.randint(100000, 999999)}_{name}@{domain}").replace(" ", "-")
+
+
+# build events list, one event for each (start, end, fullday) slot
+# invite is the parsed attendees list: if longer than max_attendees, each slot is split in one event per chunk
+def build_events(slots, name: str, descr: str, cal: str, group: bool, domain: str,
+                 loc: str = "", invite: list = None, alarm: tuple = None, tz: str = "", max_attendees: int = 0) -> list:
+    invite_chunks = chunk_attendees(invite, max_attendees) if invite and max_attendees else [invite]
+    if len(invite_chunks) > 1:
+        logger.warning(f"{len(invite)} attendees split in {len(invite_chunks)} events per slot, max {max_attendees}: "
+                       f"each slot is sent {len(invite_chunks)} times, with different UIDs")
+
+    events_list = []
+    for start, end, fullday in slots:
+        for invite_chunk in invite_chunks:
+
+            # build event details
+            event_details = {
+                'name' : name,
+                'description' : descr,
+                'calendar' : cal,
+                'group' : group,
+                'uid' : make_uid(name, domain),
+                'start' : start,
+                'end' : end,
+                'fullday' : fullday
+            }
+            logger.info(f"Building event details with UID: {event_details['uid']}, fullday: {fullday}")
+
+            # add location if any
+            if loc:
+                event_details['location'] = loc
+
+            # add timezone if any, otherwise the backend one is used
+            if tz:
+                event_details['timezone'] = tz
+
+            # add invitees, list shared by all events of the same chunk
+            if invite_chunk:
+                event_details['invite'] = invite_chunk
+
+            # set alarm
+            if alarm:
+                event_details['alarm_type'], event_details['alarm_format'], event_details['alarm_time'] = alarm
+
+            # append event to list
+            events_list.append(event_details)
+
+    logger.info(f"Built {len(events_list)} events, invites: {len(invite) if invite else 'None'}, alarm: {alarm}")
+    return events_list
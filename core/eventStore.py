@@ -0,0 +1,237 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# eventStore.py
+2025-06-24
+
+Compact on-disk event store for very large schedules (millions of slots).
+Events are fixed-width records, strings are interned in a table, and the file is memory-mapped on read:
+iteration yields lightweight read-only views that agents use like 'events_list' dicts, nothing is materialized.
+
+File layout (little endian):
+  * header, 64 bytes: magic, records count, records/strings/meta offsets
+  * records, 26 bytes each: start, end (epoch minutes, wall time), flags (bit 0 fullday, bit 1 group),
+    string table indexes of name, description, location, calendar, timezone, and invite chunk index.
+    Index 0 means not set: strings and invite chunks are numbered from 1
+  * strings table: count, then length-prefixed UTF-8 strings
+  * meta JSON: domain, UID prefix, invite chunks, alarm
+
+Usage:
+    count = write_store("slots.evs", slots, name, descr, cal, group, domain, loc=loc, invite=attendees, alarm=alarm)
+    for event in EventStore("slots.evs"):
+        agent.create_event(event)
+"""
+
+import os
+import json
+import mmap
+import random
+import struct
+import logging
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, timedelta
+from core.attendees import chunk_attendees
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CPHEVS01"
+HEADER = struct.Struct('<8sQQQQ24x')
+RECORD = struct.Struct('<iiBxIIHHHH')
+LENGTH = struct.Struct('<I')
+
+FLAG_FULLDAY = 1
+FLAG_GROUP = 2
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+ONE_MINUTE = timedelta(minutes=1)
+
+
+
+# epoch minutes of wall time, no timezone conversion
+def to_epoch(value) -> int:
+    if isinstance(value, datetime):
+        return (value.toordinal() - EPOCH_ORDINAL) * 1440 + value.hour * 60 + value.minute
+    return (value.toordinal() - EPOCH_ORDINAL) * 1440
+
+
+def from_epoch(minutes: int, fullday: bool):
+    if fullday:
+        return date.fromordinal(EPOCH_ORDINAL + minutes // 1440)
+    return EPOCH + minutes * ONE_MINUTE
+
+
+
+# stream slots to a store file, returns records count
+def write_store(path: str, slots, name: str, descr: str, cal: str, group: bool, domain: str,
+                loc: str = "", invite: list = None, alarm: tuple = None, tz: str = "", max_attendees: int = 0) -> int:
+    logger.info(f"write_store: {path}")
+    strings = {}
+
+    def intern(value: str) -> int:
+        if not value:
+            return 0
+        return strings.setdefault(value, len(strings) + 1)
+
+    invite_chunks = chunk_attendees(invite, max_attendees) if invite and max_attendees else ([invite] if invite else [])
+    flags_base = FLAG_GROUP if group else 0
+    fields = (intern(name), intern(descr), intern(loc), intern(cal), intern(tz))
+
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+
+        # records, written while slots are expanded
+        buffer = bytearray()
+        for start, end, fullday in slots:
+            flags = flags_base | (FLAG_FULLDAY if fullday else 0)
+            for chunk_idx in (range(1, len(invite_chunks) + 1) if invite_chunks else (0,)):
+                buffer += RECORD.pack(to_epoch(start), to_epoch(end), flags, *fields, chunk_idx)
+                count += 1
+            if len(buffer) >= 1024 * 1024:
+                f.write(buffer)
+                buffer.clear()
+        f.write(buffer)
+
+        # strings table
+        strings_offset = f.tell()
+        f.write(LENGTH.pack(len(strings)))
+        for value in strings:
+            data = value.encode('utf-8')
+            f.write(LENGTH.pack(len(data)) + data)
+
+        # shared metadata
+        meta_offset = f.tell()
+        meta = {
+            'domain': domain,
+            'uid_prefix': f"{str(datetime.now().timestamp())}_{random.randint(100000, 999999)}",
+            'invite_chunks': invite_chunks,
+            'alarm': list(alarm) if alarm else None,
+        }
+        f.write(json.dumps(meta).encode('utf-8'))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, count, HEADER.size, strings_offset, meta_offset))
+
+    logger.info(f"write_store: {count} events, {len(strings)} strings, {os.path.getsize(path)} bytes")
+    return count
+
+
+
+class EventStore(Sequence):
+
+    def __init__(self, path: str):
+        logger.info(f"init EventStore: {path}")
+        self.path = path
+        self.__file = open(path, 'rb')
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, self.records_offset, strings_offset, meta_offset = HEADER.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Invalid event store file: {path}")
+
+        # strings table is small, loaded once
+        n_strings, = LENGTH.unpack_from(self.__mmap, strings_offset)
+        pos = strings_offset + LENGTH.size
+        self.strings = [None]
+        for i in range(n_strings):
+            length, = LENGTH.unpack_from(self.__mmap, pos)
+            self.strings.append(self.__mmap[pos + LENGTH.size:pos + LENGTH.size + length].decode('utf-8'))
+            pos += LENGTH.size + length
+
+        self.meta = json.loads(self.__mmap[meta_offset:].decode('utf-8'))
+        self.invite_chunks = [None] + self.meta['invite_chunks']
+        self.alarm = dict(zip(('alarm_type', 'alarm_format', 'alarm_time'), self.meta['alarm'])) if self.meta['alarm'] else {}
+        logger.info(f"EventStore: {self.count} events")
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return EventView(self, i, RECORD.unpack_from(self.__mmap, self.records_offset + i * RECORD.size))
+
+
+    def __iter__(self):
+        for i, record in enumerate(RECORD.iter_unpack(memoryview(self.__mmap)[self.records_offset:self.records_offset + self.count * RECORD.size])):
+            yield EventView(self, i, record)
+
+
+    def close(self) -> None:
+        self.__mmap.close()
+        self.__file.close()
+
+
+
+class EventView(Mapping):
+    __slots__ = ('_store', '_index', '_record')
+
+
+    def __init__(self, store: EventStore, index: int, record: tuple):
+        self._store = store
+        self._index = index
+        self._record = record
+
+
+    def __getitem__(self, key: str):
+        getter = GETTERS.get(key)
+        if getter is None:
+            raise KeyError(key)
+        value = getter(self._store, self._index, self._record)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+    def __iter__(self):
+        for key in GETTERS:
+            if key in self:
+                yield key
+
+
+    def __len__(self) -> int:
+        return sum(1 for key in self)
+
+
+
+# record fields: (start, end, flags, name, description, location, calendar, timezone, invite chunk)
+# getters return None for unset optional keys
+GETTERS = {
+    'name': lambda store, i, r: store.strings[r[3]] or "",
+    'description': lambda store, i, r: store.strings[r[4]] or "",
+    'calendar': lambda store, i, r: store.strings[r[6]] or 'personal',
+    'group': lambda store, i, r: bool(r[2] & FLAG_GROUP),
+    'uid': lambda store, i, r: f"{store.meta['uid_prefix']}_{i}_{store.strings[r[3]] or ''}@{store.meta['domain']}".replace(" ", "-"),
+    'start': lambda store, i, r: from_epoch(r[0], r[2] & FLAG_FULLDAY),
+    'end': lambda store, i, r: from_epoch(r[1], r[2] & FLAG_FULLDAY),
+    'fullday': lambda store, i, r: bool(r[2] & FLAG_FULLDAY),
+    'location': lambda store, i, r: store.strings[r[5]],
+    'timezone': lambda store, i, r: store.strings[r[7]],
+    'invite': lambda store, i, r: store.invite_chunks[r[8]],
+    'alarm_type': lambda store, i, r: store.alarm.get('alarm_type'),
+    'alarm_format': lambda store, i, r: store.alarm.get('alarm_format'),
+    'alarm_time': lambda store, i, r: store.alarm.get('alarm_time'),
+}
@@ -0,0 +1,208 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# exportSink.py
+2025-06-18
+
+Archive sinks: an audit copy of each event is written while events are submitted.
+Events are queued and rendered/written by a background writer thread with buffered output,
+so archiving adds no latency to the submission loop.
+
+Formats, chosen by file extension:
+  * .ics:   single combined calendar, one VEVENT per event (rendered as CaldavAgent does)
+  * .zip:   one {uid}.ics file per event
+  * .jsonl: one JSON line per event details
+
+Usage:
+    with open_sink("archive.ics", user_settings) as sink:
+        for event in events_list:
+            sink.write(event)
+            agent.create_event(event)
+"""
+
+import os
+import json
+import queue
+import logging
+import zipfile
+import threading
+import regex as re
+from abc import ABC, abstractmethod
+from agents.caldavAgent import CaldavAgent, PROD_NAME, VERSION_NUM, PROD_URL
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# output buffer size and max queued events, bounds memory on big runs
+BUFFER_SIZE = 1024 * 1024
+QUEUE_SIZE = 10000
+
+PATTERN_VTIMEZONE = re.compile(rb'BEGIN:VTIMEZONE\r\n.*?END:VTIMEZONE\r\n', re.DOTALL)
+PATTERN_VEVENT = re.compile(rb'BEGIN:VEVENT\r\n.*END:VEVENT\r\n', re.DOTALL)
+PATTERN_TZID = re.compile(rb'TZID:([^\r\n]+)')
+
+
+
+class EventSink(ABC):
+
+    def __init__(self, path: str, user_settings: dict):
+        logger.info(f"init {type(self).__name__}: {path}")
+        self.path = path
+        self.count = 0
+        self.error = None
+        self._user_settings = user_settings
+
+        self.__queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.__writer = threading.Thread(target=self.__run, name=f"{type(self).__name__}-writer", daemon=True)
+        self._open()
+        self.__writer.start()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    # queue an event for archiving, returns immediately unless the queue is full
+    def write(self, event_details: dict) -> None:
+        self.__queue.put(event_details)
+
+
+    # flush queued events and close the archive. Returns False if the writer failed
+    def close(self) -> bool:
+        self.__queue.put(None)
+        self.__writer.join()
+        if self.error:
+            logger.error(f"{type(self).__name__}: archive {self.path} incomplete, {self.count} events written, error: {self.error}")
+        else:
+            logger.info(f"{type(self).__name__}: {self.count} events archived to {self.path}")
+        return self.error is None
+
+
+    def __run(self) -> None:
+        try:
+            while True:
+                event_details = self.__queue.get()
+                if event_details is None:
+                    break
+                self._write(event_details)
+                self.count += 1
+        except Exception as exc:
+            self.error = repr(exc)
+            # drain, writers must never block on a dead thread
+            while self.__queue.get() is not None:
+                pass
+        finally:
+            self._close()
+
+
+    # format specific: open output, write one event, close output
+    @abstractmethod
+    def _open(self) -> None:
+        pass
+
+
+    @abstractmethod
+    def _write(self, event_details: dict) -> None:
+        pass
+
+
+    @abstractmethod
+    def _close(self) -> None:
+        pass
+
+
+
+class IcsSink(EventSink):
+
+    def _open(self) -> None:
+        self.__renderer = CaldavAgent(self._user_settings, offline=True)
+        self.__timezones = set()
+        self.__file = open(self.path, 'wb', buffering=BUFFER_SIZE)
+        self.__file.write(f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//{PROD_NAME}//{VERSION_NUM}//{self._user_settings['domain']}//{PROD_URL}//\r\n".encode('utf-8'))
+
+
+    def _write(self, event_details: dict) -> None:
+        ics = self.__renderer.render_event(event_details)
+
+        # each timezone is defined once in the combined calendar
+        for vtimezone in PATTERN_VTIMEZONE.findall(ics):
+            tzid = PATTERN_TZID.search(vtimezone).group(1)
+            if tzid not in self.__timezones:
+                self.__timezones.add(tzid)
+                self.__file.write(vtimezone)
+
+        self.__file.write(PATTERN_VEVENT.search(ics).group(0))
+
+
+    def _close(self) -> None:
+        self.__file.write(b"END:VCALENDAR\r\n")
+        self.__file.close()
+
+
+
+class ZipSink(EventSink):
+
+    def _open(self) -> None:
+        self.__renderer = CaldavAgent(self._user_settings, offline=True)
+        self.__zip = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+
+    def _write(self, event_details: dict) -> None:
+        file_name = re.sub(r'[^\w.@-]', '_', event_details['uid'])
+        self.__zip.writestr(f"{file_name}.ics", self.__renderer.render_event(event_details))
+
+
+    def _close(self) -> None:
+        self.__zip.close()
+
+
+
+class JsonlSink(EventSink):
+
+    def _open(self) -> None:
+        self.__file = open(self.path, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+
+    def _write(self, event_details: dict) -> None:
+        self.__file.write(json.dumps(dict(event_details), default=str) + "\n")
+
+
+    def _close(self) -> None:
+        self.__file.close()
+
+
+
+SINKS = {
+    '.ics': IcsSink,
+    '.zip': ZipSink,
+    '.jsonl': JsonlSink,
+}
+
+
+# sink for given archive path, format by file extension
+def open_sink(path: str, user_settings: dict) -> EventSink:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Invalid export file: {path}, supported formats: {', '.join(SINKS)}")
+    return SINKS[ext](path, user_settings)
@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# freeSlots.py
+2025-07-06
+
+Common free slots of many attendees, for a duration inside working hours:
+  * busy intervals are fetched by the agents in bulk (Graph getSchedule, CalDAV free-busy requests to the scheduling
+    outbox), many attendees and weeks per request, requests sent concurrently
+  * intervals are cached per attendee and UTC day in freebusy_cache.json, for 'freebusy_cache_ttl' seconds (default
+    FREEBUSY_CACHE_TTL): searching again, or over overlapping periods, fetches only the days missing
+  * working days skip the holidays of the 'holidays' user setting file (see workingDays.py)
+  * intervals of all attendees are merged with a sweep line (sorted once, O(n log n)), free gaps inside the working
+    hours windows are cut in slots of the given duration, aligned to step from the start of the working hours
+
+Times are aware datetimes in UTC, working hours are local times of the given zone.
+
+Cache file format, per account ("mode:domain:username"), busy intervals as UTC epoch seconds:
+       {
+           "caldav:cloud.domain.com:jane.doe": {
+               "john@domain.com": {
+                   "2025-07-01": [1751360000.0, [[1751360400, 1751364000]]]
+               }
+           }
+       }
+
+Usage:
+    busy, unknown = BusyCache("freebusy_cache.json", user_settings).busy(agent, addresses, start_day, end_day)
+    windows = working_windows(start_day, end_day, (time(9), time(18)), get_zone("Europe/Rome"))
+    slots = find_slots(merge_intervals(busy), windows, timedelta(hours=2), count=5)
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from core.concurrency import DEFAULT_MAX_CONCURRENCY
+from core.workingDays import working_calendar
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# seconds a fetched day of an attendee is reused
+FREEBUSY_CACHE_TTL = 900
+# Monday to Friday
+WORKING_WEEKDAYS = (0, 1, 2, 3, 4)
+
+
+
+# sort and merge overlapping or touching intervals: [(start, end)] sorted and disjoint
+def merge_intervals(intervals) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# working hours of each working day from start_day to end_day (end excluded), as UTC intervals
+# hours: (start time, end time) local to zone. Windows ending before not_before are skipped, the current one is cut
+# calendar: WorkingCalendar, holidays are skipped too. Default weekends only
+def working_windows(start_day: date, end_day: date, hours: tuple, zone, weekdays=WORKING_WEEKDAYS, not_before: datetime = None,
+                    calendar=None):
+    calendar = calendar or working_calendar()
+    for day in calendar.days(start_day, end_day - timedelta(days=1), weekdays):
+        start = datetime.combine(day, hours[0], zone).astimezone(timezone.utc)
+        end = datetime.combine(day, hours[1], zone).astimezone(timezone.utc)
+        if not_before and start < not_before:
+            start = min(not_before, end)
+        if start < end:
+            yield start, end
+
+
+# earliest count slots of duration free of busy intervals (merged), inside the windows (sorted)
+# slots start at the window start or at the end of a busy interval, rounded up to step from the window start
+def find_slots(busy: list, windows, duration: timedelta, count: int, step: timedelta = timedelta(minutes=30)) -> list:
+    slots = []
+    i = 0
+    for window_start, window_end in windows:
+        # busy intervals ending before the window are past for all the next windows too
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+
+        cursor = window_start
+        j = i
+        while cursor + duration <= window_end:
+            if j < len(busy) and busy[j][0] < cursor + duration:
+                if busy[j][1] > cursor:
+                    steps = -((window_start - busy[j][1]) // step)
+                    cursor = window_start + steps * step
+                j += 1
+                continue
+            slots.append((cursor, cursor + duration))
+            if len(slots) == count:
+                return slots
+            cursor += duration
+    return slots
+
+
+# split (start, end) UTC intervals by UTC day: {day: [(start, end)]}
+def _by_day(intervals) -> dict:
+    days = {}
+    for start, end in intervals:
+        while start < end:
+            day_end = datetime.combine(start.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+            days.setdefault(start.date().isoformat(), []).append((start, min(end, day_end)))
+            start = day_end
+    return days
+
+
+
+class BusyCache():
+
+    def __init__(self, cache_file: str, user_settings: dict):
+        self.cache_file = cache_file
+        self.key = f"{user_settings['mode']}:{user_settings['domain']}:{user_settings['username']}"
+        self.ttl = float(user_settings.get('freebusy_cache_ttl', FREEBUSY_CACHE_TTL))
+        self.workers = int(user_settings.get('max_concurrency', DEFAULT_MAX_CONCURRENCY))
+        self.__lock = threading.Lock()
+        self.__data = self.__load()
+        self.__entries = self.__data.setdefault(self.key, {})
+
+
+    def __load(self) -> dict:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Invalid free/busy cache file {self.cache_file}, ignored: {repr(exc)}")
+            return {}
+
+
+    # busy intervals of the addresses from start_day to end_day (end excluded): ([(start, end)] of all of them, unknown
+    # addresses). Days not cached are fetched with agent.free_busy, in requests of agent.free_busy_limits
+    # (addresses, days) sent concurrently
+    def busy(self, agent, addresses: list, start_day: date, end_day: date) -> tuple[list, list]:
+        days = [(start_day + timedelta(days=n)).isoformat() for n in range((end_day - start_day).days)]
+        now = time.time()
+        missing = {}
+        for address in addresses:
+            cached = self.__entries.get(address.lower(), {})
+            stale = [d for d in days if d not in cached or now - cached[d][0] > self.ttl]
+            if stale:
+                missing[address] = stale
+
+        unknown = []
+        if missing:
+            unknown = self.__fetch(agent, missing, now)
+        logger.info(f"busy: {len(addresses)} addresses, {len(addresses) - len(missing)} cached, {len(missing)} fetched, {len(unknown)} unknown")
+
+        busy = []
+        for address in addresses:
+            cached = self.__entries.get(address.lower(), {})
+            for d in days:
+                if d in cached:
+                    busy.extend((datetime.fromtimestamp(s, timezone.utc), datetime.fromtimestamp(e, timezone.utc)) for s, e in cached[d][1])
+        self.save()
+        return busy, unknown
+
+
+    # fetch the missing days, from the first to the last one missing of all the addresses. Returns unknown addresses
+    def __fetch(self, agent, missing: dict, now: float) -> list:
+        max_addresses, max_days = agent.free_busy_limits
+        first = date.fromisoformat(min(d[0] for d in missing.values()))
+        last = date.fromisoformat(max(d[-1] for d in missing.values())) + timedelta(days=1)
+        addresses = list(missing)
+
+        requests = []
+        for i in range(0, len(addresses), max_addresses):
+            start = first
+            while start < last:
+                end = min(start + timedelta(days=max_days), last)
+                requests.append((addresses[i:i + max_addresses], start, end))
+                start = end
+        logger.info(f"free/busy: {len(addresses)} addresses from {first} to {last}, {len(requests)} requests")
+
+        def fetch(request):
+            chunk, start, end = request
+            return request, agent.free_busy(chunk, datetime.combine(start, datetime.min.time(), timezone.utc),
+                                            datetime.combine(end, datetime.min.time(), timezone.utc))
+
+        unknown = set()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(requests))), thread_name_prefix="freebusy") as executor:
+            for (chunk, start, end), found in executor.map(fetch, requests):
+                for address in chunk:
+                    intervals = found.get(address.lower())
+                    if intervals is None:
+                        unknown.add(address)
+                        continue
+                    by_day = _by_day(intervals)
+                    with self.__lock:
+                        entry = self.__entries.setdefault(address.lower(), {})
+                        for n in range((end - start).days):
+                            d = (start + timedelta(days=n)).isoformat()
+                            entry[d] = [now, [[s.timestamp(), e.timestamp()] for s, e in by_day.get(d, [])]]
+        return sorted(unknown)
+
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        with self.__lock:
+            # expired days are dropped
+            now = time.time()
+            for address in list(self.__entries):
+                days = {d: v for d, v in self.__entries[address].items() if now - v[0] <= self.ttl}
+                if days:
+                    self.__entries[address] = days
+                else:
+                    del self.__entries[address]
+            # write and rename, a crash never leaves a truncated cache
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.__data, f)
+            os.replace(tmp_file, self.cache_file)
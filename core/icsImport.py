@@ -0,0 +1,302 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# icsImport.py
+2025-07-03
+
+Streaming import of .ics exports, without loading them in an icalendar tree: the file is memory-mapped and scanned
+once for the VEVENT blocks offsets (STATUS:CANCELLED ones are skipped), each block is parsed only when its event
+is read. Memory stays flat on any file size: 16 bytes per event for the offsets.
+
+Events are mapped to the 'events_list' item format of eventBuilder.py:
+  * SUMMARY, DESCRIPTION, LOCATION, UID (kept if usable as a CalDAV resource name, otherwise hashed: re-imports
+    of the same file update the same events)
+  * DTSTART / DTEND (or DURATION): VALUE=DATE is a full day event, TZID if a known IANA zone, UTC times are
+    kept as aware datetimes; unknown TZIDs (e.g. Windows names) are floating times in the user settings timezone
+  * ATTENDEE mailto addresses as 'invite'
+  * first VALARM with DISPLAY or EMAIL action and a trigger before the start as alarm, in days ('D') or hours ('H')
+Recurring events (RRULE) are imported as their first occurrence only, with a warning; occurrences already expanded
+(RECURRENCE-ID) get a UID of their own. The source UID (and RECURRENCE-ID) is kept as 'source_id'.
+
+Usage:
+    events = IcsFile("export.ics", "personal", False, user_settings['domain'])
+    for event in events:
+        agent.create_event(event)
+"""
+
+import mmap
+import hashlib
+import logging
+import regex as re
+from array import array
+from functools import lru_cache
+from collections.abc import Sequence
+from datetime import date, datetime, timedelta, timezone
+from core.timezones import get_zone
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+BEGIN = b"BEGIN:VEVENT"
+END = b"END:VEVENT"
+CANCELLED = b"\nSTATUS:CANCELLED"
+
+# folded content lines: CRLF (or LF) followed by one space or tab
+PATTERN_FOLD = re.compile(r'\r?\n[ \t]')
+
+# RFC 5545 duration, e.g. -P1D, -PT15M, P1DT2H
+PATTERN_DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+# UIDs usable as they are in CalDAV resource names
+PATTERN_SAFE_UID = re.compile(r'^[\w.@+-]{1,200}$')
+
+# TEXT values escapes
+UNESCAPE = {'n': "\n", 'N': "\n", ',': ",", ';': ";", '\\': "\\"}
+PATTERN_ESCAPE = re.compile(r'\\(.)')
+
+
+
+# split a content line in (NAME, {PARAM: value}, value), quoted parameter values may contain ':' and ';'
+def parse_line(line: str) -> tuple[str, dict, str]:
+    # no quoted parameters, the common case
+    head, sep, value = line.partition(':')
+    if '"' not in head:
+        if ';' not in head:
+            return head.upper(), {}, value
+        name, *params = head.split(';')
+        return name.upper(), {k.upper(): v for k, _, v in (p.partition('=') for p in params)}, value
+
+    quoted = False
+    for i, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return line.upper(), {}, ""
+
+    name, *params = head.split(';')
+    return name.upper(), {k.upper(): v.strip('"') for k, _, v in (p.partition('=') for p in params)}, value
+
+
+def unescape(value: str) -> str:
+    return PATTERN_ESCAPE.sub(lambda m: UNESCAPE.get(m.group(1), m.group(1)), value)
+
+
+# RFC 5545 duration to timedelta, None if invalid
+def parse_duration(value: str) -> timedelta:
+    match = PATTERN_DURATION.match(value.strip())
+    if not match or not any(match.groups()[1:]):
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    delta = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -delta if sign == '-' else delta
+
+
+# DATE or DATE-TIME value to (date or datetime, fullday, IANA zone name or None)
+def parse_time(params: dict, value: str) -> tuple:
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").date(), True, None
+
+    if value.endswith('Z'):
+        return datetime.strptime(value[:15], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc), False, None
+
+    start = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    return start, False, known_zone(params['TZID']) if 'TZID' in params else None
+
+
+# TZID if a known IANA zone, otherwise None. Warned once per TZID
+@lru_cache(maxsize=None)
+def known_zone(tzid: str) -> str:
+    try:
+        get_zone(tzid)
+    except ValueError:
+        logger.warning(f"Unknown TZID '{tzid}', floating time used")
+        return None
+    return tzid
+
+
+# VEVENT block to {NAME: [(params, value), ...]}, first VALARM properties under 'VALARM'
+def parse_vevent(block: bytes) -> dict:
+    props = {}
+    alarm = None
+    nested = 0
+    for line in PATTERN_FOLD.sub('', block.decode('utf-8', errors='replace')).splitlines():
+        if not line:
+            continue
+        name, params, value = parse_line(line)
+        if name == 'BEGIN' and value.upper() != 'VEVENT':
+            nested += 1
+            if value.upper() == 'VALARM' and nested == 1 and 'VALARM' not in props:
+                alarm = {}
+            continue
+        if name == 'END' and nested:
+            nested -= 1
+            if alarm is not None and nested == 0:
+                props['VALARM'] = alarm
+                alarm = None
+            continue
+        target = alarm if nested and alarm is not None else (props if not nested else None)
+        if target is not None:
+            target.setdefault(name, []).append((params, value))
+    return props
+
+
+# alarm tuple (type, format, time) of eventBuilder.check_alarm, None if not representable
+def map_alarm(alarm: dict) -> tuple:
+    action = alarm.get('ACTION', [({}, "")])[0][1].strip().upper()
+    params, trigger = alarm.get('TRIGGER', [({}, "")])[0]
+    delta = parse_duration(trigger) if params.get('VALUE', 'DURATION') == 'DURATION' and params.get('RELATED', 'START') == 'START' else None
+    if action not in ('DISPLAY', 'EMAIL', 'AUDIO') or delta is None or delta >= timedelta(0):
+        return None
+
+    before = -delta
+    if before.seconds == 0:
+        return 'EMAIL' if action == 'EMAIL' else 'DISPLAY', 'D', before.days
+    if before < timedelta(days=1):
+        minutes = before.seconds // 60
+        return 'EMAIL' if action == 'EMAIL' else 'DISPLAY', 'H', f"{minutes // 60}:{minutes % 60:02d}"
+    return None
+
+
+# yield (start, end) offsets of the VEVENT blocks in data, BEGIN and END lines excluded
+def iter_blocks(data, source: str = "ICS data"):
+    pos = data.find(BEGIN)
+    while pos >= 0:
+        end = data.find(END, pos)
+        if end < 0:
+            raise ValueError(f"Invalid ICS: {source}, VEVENT not closed at byte {pos}")
+        # only BEGIN lines, not text containing it
+        if pos == 0 or data[pos - 1:pos] == b"\n":
+            yield pos + len(BEGIN), end
+        pos = data.find(BEGIN, end)
+
+
+# events of an ICS payload (e.g. CalDAV calendar-data), cancelled ones skipped
+def read_events(data: bytes, calendar: str, group: bool, domain: str):
+    for start, end in iter_blocks(data):
+        if data.find(CANCELLED, start, end) < 0:
+            yield map_event(parse_vevent(data[start:end]), calendar, group, domain)
+
+
+# VEVENT properties to an 'events_list' item
+def map_event(props: dict, calendar: str, group: bool, domain: str, loc: str = "") -> dict:
+    def text(name: str, default: str = "") -> str:
+        return unescape(props[name][0][1]) if name in props else default
+
+    if 'DTSTART' not in props:
+        raise ValueError(f"VEVENT without DTSTART: {text('UID') or text('SUMMARY')}")
+    start, fullday, tzid = parse_time(*props['DTSTART'][0])
+    if 'DTEND' in props:
+        end, _, _ = parse_time(*props['DTEND'][0])
+    elif 'DURATION' in props and parse_duration(props['DURATION'][0][1]) is not None:
+        end = start + parse_duration(props['DURATION'][0][1])
+    else:
+        end = start + timedelta(days=1) if fullday else start
+
+    name = text('SUMMARY')
+    uid = text('UID')
+    # occurrences of an expanded recurring event share the UID
+    recurrence_id = props['RECURRENCE-ID'][0][1] if 'RECURRENCE-ID' in props else ""
+    source_id = f"{uid}|{recurrence_id}" if recurrence_id else uid
+    if 'RRULE' in props:
+        logger.warning(f"Recurring event '{name}' ({uid}): only the first occurrence is imported")
+
+    event_details = {
+        'name' : name,
+        'description' : text('DESCRIPTION'),
+        'calendar' : calendar,
+        'group' : group,
+        'uid' : uid if PATTERN_SAFE_UID.match(uid) and not recurrence_id else f"{hashlib.sha1((source_id or name + props['DTSTART'][0][1]).encode('utf-8')).hexdigest()}@{domain}",
+        'start' : start,
+        'end' : end,
+        'fullday' : fullday
+    }
+
+    if source_id:
+        event_details['source_id'] = source_id
+
+    location = text('LOCATION', loc)
+    if location:
+        event_details['location'] = location
+    if tzid:
+        event_details['timezone'] = tzid
+
+    invite = [value[7:] for _, value in props.get('ATTENDEE', []) if value[:7].lower() == 'mailto:']
+    if invite:
+        event_details['invite'] = invite
+
+    alarm = map_alarm(props['VALARM']) if 'VALARM' in props else None
+    if alarm:
+        event_details['alarm_type'], event_details['alarm_format'], event_details['alarm_time'] = alarm
+
+    return event_details
+
+
+
+class IcsFile(Sequence):
+
+    def __init__(self, path: str, calendar: str, group: bool, domain: str, loc: str = ""):
+        logger.info(f"init IcsFile: {path}")
+        self.path = path
+        self.calendar = calendar
+        self.group = group
+        self.domain = domain
+        self.loc = loc
+        self.__file = open(path, 'rb')
+        self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if self.__file.seek(0, 2) else b""
+
+        # VEVENT blocks offsets, BEGIN and END lines excluded
+        self.__starts = array('q')
+        self.__ends = array('q')
+        cancelled = 0
+        for start, end in iter_blocks(self.__mmap, path):
+            if self.__mmap.find(CANCELLED, start, end) < 0:
+                self.__starts.append(start)
+                self.__ends.append(end)
+            else:
+                cancelled += 1
+        logger.info(f"IcsFile: {len(self.__starts)} events, {cancelled} cancelled skipped")
+
+
+    def __len__(self) -> int:
+        return len(self.__starts)
+
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += len(self.__starts)
+        if not 0 <= i < len(self.__starts):
+            raise IndexError(i)
+        props = parse_vevent(self.__mmap[self.__starts[i]:self.__ends[i]])
+        return map_event(props, self.calendar, self.group, self.domain, self.loc)
+
+
+    def __iter__(self):
+        for i in range(len(self.__starts)):
+            yield self[i]
+
+
+    def close(self) -> None:
+        if isinstance(self.__mmap, mmap.mmap):
+            self.__mmap.close()
+        self.__file.close()
@@ -0,0 +1,241 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# outbox.py
+2025-07-05
+
+Durable local outbox: events are appended to a SQLite database (WAL journal, synchronous FULL) and sent later by a
+flusher, so the caller (e.g. the Excel macros) returns without waiting on the network. Delivery is at least once:
+  * put:   events appended in one transaction, durable once it returns
+  * claim: a batch of due events is leased for LEASE_SECONDS, a crashed flusher's lease expires and the events are
+           claimed again. Flushers renew the lease of the events still to send as they go
+  * ack:   sent events are deleted. Events sent and not acknowledged (crash in between) are sent again: CalDAV writes
+           the same UID, Graph may create a duplicate
+  * retry: failed events are tried again with exponential backoff, after MAX_ATTEMPTS they are kept as failed
+One outbox holds events of several accounts ("mode:domain:username"), a flusher drains only its own account.
+A flusher heartbeat tells enqueuing runs whether a new flusher must be started: the check and the heartbeat taken on
+behalf of the new flusher are one transaction, so two runs never both start one. The flusher clears it on exit in the
+same transaction that checks no event was queued meanwhile: an enqueuing run either sees it gone, or its events are
+sent by the same flusher.
+
+Usage:
+    outbox = Outbox("outbox.db")
+    outbox.put(events, account)
+    for outbox_id, event in outbox.claim(account, 500):
+        ...
+    outbox.ack(sent_ids)
+    outbox.retry([(outbox_id, error_message)])
+"""
+
+import json
+import time
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# a claimed batch not acknowledged in time is claimed again
+LEASE_SECONDS = 300
+# failed events: next try after RETRY_BASE * 2^attempts seconds, kept as failed after MAX_ATTEMPTS
+RETRY_BASE = 30
+MAX_ATTEMPTS = 6
+# flusher considered gone without a heartbeat for this long
+HEARTBEAT_STALE = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    event TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0,
+    lease REAL NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (account, failed, next_try);
+CREATE TABLE IF NOT EXISTS flusher (
+    account TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+
+# outbox key of the account of user settings
+def account_key(user_settings: dict) -> str:
+    return f"{user_settings['mode']}:{user_settings['domain']}:{user_settings['username']}"
+
+
+# event to JSON: dates and datetimes (aware or floating) as ISO strings, told apart by 'fullday' when decoded
+def encode_event(event) -> str:
+    return json.dumps({k: v.isoformat() if isinstance(v, date) else v for k, v in dict(event).items()})
+
+
+def decode_event(data: str) -> dict:
+    event = json.loads(data)
+    parse = date.fromisoformat if event.get('fullday') else datetime.fromisoformat
+    for k in ('start', 'end'):
+        event[k] = parse(event[k])
+    return event
+
+
+
+class Outbox():
+
+    def __init__(self, path: str):
+        self.path = path
+        # autocommit, transactions are explicit
+        self.__db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=FULL")
+        self.__db.executescript(SCHEMA)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        self.__db.close()
+
+
+    # append events in one transaction, returns the count
+    def put(self, events, account: str) -> int:
+        with self.__transaction():
+            before = self.__db.total_changes
+            self.__db.executemany("INSERT INTO outbox (account, event) VALUES (?, ?)", ((account, encode_event(e)) for e in events))
+            count = self.__db.total_changes - before
+        logger.info(f"outbox: {count} events queued for {account}")
+        return count
+
+
+    # lease up to limit due events of the account, oldest first: [(outbox id, event)]
+    def claim(self, account: str, limit: int) -> list:
+        now = time.time()
+        with self.__transaction():
+            rows = self.__db.execute("SELECT id, event FROM outbox WHERE account = ? AND failed = 0 AND next_try <= ? AND lease <= ? "
+                                     "ORDER BY id LIMIT ?", (account, now, now, limit)).fetchall()
+            self.__db.executemany("UPDATE outbox SET lease = ? WHERE id = ?", ((now + LEASE_SECONDS, row[0]) for row in rows))
+        if rows:
+            logger.info(f"outbox: {len(rows)} events claimed for {account}")
+        return [(row[0], decode_event(row[1])) for row in rows]
+
+
+    # lease of claimed events extended by LEASE_SECONDS from now
+    def renew(self, ids: list) -> None:
+        with self.__transaction():
+            self.__db.executemany("UPDATE outbox SET lease = ? WHERE id = ?", ((time.time() + LEASE_SECONDS, i) for i in ids))
+
+
+    # sent events are removed
+    def ack(self, ids: list) -> None:
+        with self.__transaction():
+            self.__db.executemany("DELETE FROM outbox WHERE id = ?", ((i,) for i in ids))
+
+
+    # failed events: [(outbox id, error)], tried again later with backoff, or kept as failed after MAX_ATTEMPTS
+    def retry(self, failures: list) -> None:
+        now = time.time()
+        with self.__transaction():
+            for outbox_id, error in failures:
+                self.__db.execute("UPDATE outbox SET attempts = attempts + 1, lease = 0, error = ?, failed = (attempts + 1 >= ?), "
+                                  "next_try = ? + ? * (1 << attempts) WHERE id = ?", (error, MAX_ATTEMPTS, now, RETRY_BASE, outbox_id))
+        if failures:
+            logger.warning(f"outbox: {len(failures)} events failed, tried again later")
+
+
+    # events not sent (backend down): released and due again after delay seconds, no attempt counted
+    def defer(self, ids: list, delay: float) -> None:
+        with self.__transaction():
+            self.__db.executemany("UPDATE outbox SET lease = 0, next_try = ? WHERE id = ?", ((time.time() + delay, i) for i in ids))
+
+
+    # time of the next pending event of the account (epoch), None if nothing is pending
+    def next_due(self, account: str) -> float:
+        row = self.__db.execute("SELECT MIN(MAX(next_try, lease)) FROM outbox WHERE account = ? AND failed = 0", (account,)).fetchone()
+        return row[0]
+
+
+    # (pending, failed) events of the account
+    def counts(self, account: str) -> tuple[int, int]:
+        row = self.__db.execute("SELECT COUNT(*) - COALESCE(SUM(failed), 0), COALESCE(SUM(failed), 0) FROM outbox WHERE account = ?",
+                                (account,)).fetchone()
+        return row[0], row[1]
+
+
+    # failed events of the account: [(event, attempts, error)]
+    def failures(self, account: str) -> list:
+        rows = self.__db.execute("SELECT event, attempts, error FROM outbox WHERE account = ? AND failed = 1 ORDER BY id", (account,))
+        return [(decode_event(row[0]), row[1], row[2]) for row in rows]
+
+
+    # flusher heartbeat: alive=False when the flusher exits
+    def heartbeat(self, account: str, alive: bool = True) -> None:
+        with self.__transaction():
+            self.__db.execute("INSERT OR REPLACE INTO flusher (account, heartbeat) VALUES (?, ?)", (account, time.time() if alive else 0))
+
+
+    # flusher exit: heartbeat cleared only if no event of the account is due before until (epoch), in one transaction
+    # with the check. Returns False, heartbeat kept, if events were queued meanwhile: the flusher must go on
+    def retire(self, account: str, until: float) -> bool:
+        with self.__transaction():
+            row = self.__db.execute("SELECT MIN(MAX(next_try, lease)) FROM outbox WHERE account = ? AND failed = 0", (account,)).fetchone()
+            if row[0] is not None and row[0] <= until:
+                return False
+            self.__db.execute("INSERT OR REPLACE INTO flusher (account, heartbeat) VALUES (?, 0)", (account,))
+        return True
+
+
+    # a flusher of the account is running
+    def flusher_alive(self, account: str) -> bool:
+        row = self.__db.execute("SELECT heartbeat FROM flusher WHERE account = ?", (account,)).fetchone()
+        return bool(row) and time.time() - row[0] < HEARTBEAT_STALE
+
+
+    # no flusher of the account running: heartbeat taken on behalf of a new one, in one transaction with the check.
+    # Returns True if the caller must start the flusher
+    def claim_flusher(self, account: str) -> bool:
+        with self.__transaction():
+            row = self.__db.execute("SELECT heartbeat FROM flusher WHERE account = ?", (account,)).fetchone()
+            if row and time.time() - row[0] < HEARTBEAT_STALE:
+                return False
+            self.__db.execute("INSERT OR REPLACE INTO flusher (account, heartbeat) VALUES (?, ?)", (account, time.time()))
+        return True
+
+
+    # write transaction, taken at once so concurrent flushers never claim the same events
+    @contextmanager
+    def __transaction(self):
+        self.__db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.__db.execute("ROLLBACK")
+            raise
+        self.__db.execute("COMMIT")
@@ -0,0 +1,249 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# profiler.py
+2025-07-02
+
+Opt-in profiling of a run, to tell where the time goes (MSAL login, ICS building, args checks, network):
+- 'cprofile': deterministic profile of the main thread and of the sending threads, merged in a .pstats file
+  (pstats, snakeviz, flameprof, gprof2dot) plus a text summary by cumulative time. Up to Python 3.11 each thread
+  gets a profiler of its own; from 3.12 cProfile runs on sys.monitoring, one active profiler that sees all threads
+- 'sample': a background thread samples the stacks of all threads every SAMPLE_INTERVAL, low overhead on long
+  runs; stacks are written in folded format (flamegraph.pl, speedscope, inferno) plus a text summary
+- trace_alloc: tracemalloc snapshot at the end of the run, top allocation sites and peak memory
+
+Render pool workers are separate processes and are not profiled: set 'render_workers' to 0 to profile rendering.
+
+Usage:
+    with Profiler('sample', trace_alloc=True, out_dir=profile_dir(user_settings)) as profiler:
+        ...
+    print(profiler.files)
+"""
+
+import os
+import sys
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+# seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# one cProfile per thread, from Python 3.12 only one may be active and it profiles all threads
+THREAD_PROFILES = sys.version_info < (3, 12)
+
+# rows of the text summaries, frames kept per allocation traceback
+TOP_ROWS = 30
+ALLOC_FRAMES = 10
+
+
+
+# profiles directory: 'report' path of user settings, if any, otherwise the current one
+def profile_dir(user_settings: dict) -> str:
+    return user_settings.get('report') or os.getcwd()
+
+
+
+class Profiler():
+
+    def __init__(self, mode: str = "", trace_alloc: bool = False, out_dir: str = "", prefix: str = "calendar-pyCLIent"):
+        if mode and mode not in MODES:
+            raise ValueError(f"Invalid profile mode: {mode}, use one of: {', '.join(MODES)}")
+        self.mode = mode
+        self.trace_alloc = trace_alloc
+        self.base = os.path.join(out_dir or os.getcwd(), f"{prefix}_profile_{str(datetime.now().timestamp())}")
+        self.files = []
+        self.__profiles = []
+        self.__lock = threading.Lock()
+        self.__samples = Counter()
+        self.__sampler = None
+        self.__stop = threading.Event()
+        self.__running = False
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+    def start(self) -> None:
+        if self.__running:
+            return
+        self.__running = True
+
+        if self.trace_alloc:
+            tracemalloc.start(ALLOC_FRAMES)
+
+        if self.mode == 'cprofile':
+            # threads started from now on get their own profile, merged at the end
+            if THREAD_PROFILES:
+                threading.setprofile(self.__thread_profile)
+            profile = cProfile.Profile()
+            self.__profiles.append(profile)
+            profile.enable()
+
+        elif self.mode == 'sample':
+            self.__sampler = threading.Thread(target=self.__sample, name="profiler-sampler", daemon=True)
+            self.__sampler.start()
+
+        logger.info(f"Profiling started, mode: {self.mode or 'None'}, trace_alloc: {self.trace_alloc}, output: {self.base}.*")
+
+
+    # stop and write the profiles, safe to call more than once (e.g. atexit after an early return)
+    def stop(self) -> list:
+        if not self.__running:
+            return self.files
+        self.__running = False
+
+        try:
+            # snapshot first, profiles writing allocates too
+            if self.trace_alloc:
+                self.__write_alloc()
+
+            if self.mode == 'cprofile':
+                if THREAD_PROFILES:
+                    threading.setprofile(None)
+                self.__profiles[0].disable()
+                self.__write_cprofile()
+
+            elif self.mode == 'sample':
+                self.__stop.set()
+                self.__sampler.join()
+                self.__write_samples()
+
+        except OSError as err:
+            logger.error(f"Cannot write profiles to {self.base}.*: {err}")
+            print(f"Cannot write profiles to {self.base}.*: {err}")
+
+        for path in self.files:
+            logger.info(f"Profile written: {path}")
+        return self.files
+
+
+    # first profile event of a new thread: a profiler of its own replaces this hook
+    def __thread_profile(self, frame, event, arg) -> None:
+        profile = cProfile.Profile()
+        with self.__lock:
+            self.__profiles.append(profile)
+        profile.enable()
+
+
+    def __write_cprofile(self) -> None:
+        with self.__lock:
+            profiles = list(self.__profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            # profiles of threads never run (or still disabled) have no stats
+            try:
+                stats.add(profile)
+            except TypeError:
+                pass
+        stats.dump_stats(f"{self.base}.pstats")
+        self.files.append(f"{self.base}.pstats")
+
+        with open(f"{self.base}.txt", 'w', encoding='utf-8') as f:
+            f.write(f"cProfile, {f'{len(profiles)} thread(s)' if THREAD_PROFILES else 'all threads'}\n\n")
+            stats.stream = f
+            stats.sort_stats('cumulative').print_stats(TOP_ROWS)
+            stats.sort_stats('tottime').print_stats(TOP_ROWS)
+        self.files.append(f"{self.base}.txt")
+
+
+    def __sample(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self.__stop.wait(SAMPLE_INTERVAL):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.__samples[";".join(reversed(stack))] += 1
+
+
+    def __write_samples(self) -> None:
+        # folded stacks: "thread;outer;...;inner count"
+        with open(f"{self.base}.folded", 'w', encoding='utf-8') as f:
+            for stack, count in self.__samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.files.append(f"{self.base}.folded")
+
+        total = sum(self.__samples.values())
+        self_time = Counter()
+        inclusive = Counter()
+        for stack, count in self.__samples.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_time[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        with open(f"{self.base}.txt", 'w', encoding='utf-8') as f:
+            f.write(f"sampling every {SAMPLE_INTERVAL * 1000:.0f} ms, {total} samples\n")
+            for title, counter in (("self", self_time), ("inclusive", inclusive)):
+                f.write(f"\ntop {title}:\n")
+                for frame, count in counter.most_common(TOP_ROWS):
+                    f.write(f"{count / total * 100 if total else 0:6.1f}%  {count:8d}  {frame}\n")
+        self.files.append(f"{self.base}.txt")
+
+
+    def __write_alloc(self) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+        with open(f"{self.base}.alloc.txt", 'w', encoding='utf-8') as f:
+            f.write(f"traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n")
+            f.write(f"\ntop {TOP_ROWS} allocation sites:\n")
+            for stat in snapshot.statistics('lineno')[:TOP_ROWS]:
+                f.write(f"{stat}\n")
+            f.write(f"\ntop 5 allocation tracebacks:\n")
+            for stat in snapshot.statistics('traceback')[:5]:
+                f.write(f"\n{stat.count} blocks, {stat.size / 1024:.1f} KiB\n")
+                for line in stat.traceback.format():
+                    f.write(f"{line}\n")
+        self.files.append(f"{self.base}.alloc.txt")
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# renderPool.py
+2025-06-25
+
+Process pool rendering of ICS payloads: icalendar objects building and serialization are pure-Python and CPU-bound,
+so on bulk imports events are sharded across worker processes and the serialized bytes are streamed back in order
+to the network stage. A bounded window of batches is in flight, memory stays flat on any number of events.
+
+Workers count: user settings 'render_workers' (0 or 1 = render in-process, default).
+
+Usage:
+    for event, ics in render_ics(events_list, user_settings):
+        agent.create_event(event, ics=ics)
+"""
+
+import os
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from agents.caldavAgent import CaldavAgent
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# events per batch sent to a worker, and batches in flight per worker
+BATCH_SIZE = 64
+BATCHES_PER_WORKER = 4
+
+# per-process renderer, set by worker initializer
+_renderer = None
+
+
+
+def _init_worker(user_settings: dict) -> None:
+    global _renderer
+    _renderer = CaldavAgent(user_settings, offline=True)
+
+
+def _render_batch(batch: list) -> list:
+    return [_renderer.render_event(event) for event in batch]
+
+
+# workers to use for given settings, 0 = no pool
+def render_workers(user_settings: dict) -> int:
+    workers = int(user_settings.get('render_workers', 0))
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    return workers if workers > 1 else 0
+
+
+# yield (event, ics) in events order. Without workers, ics is None: agents render in-process
+def render_ics(events, user_settings: dict, workers: int = None):
+    workers = render_workers(user_settings) if workers is None else workers
+    if not workers:
+        for event in events:
+            yield event, None
+        return
+
+    logger.info(f"render_ics: {workers} worker processes, batch size {BATCH_SIZE}")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(user_settings,)) as executor:
+        pending = deque()
+        batch = []
+
+        def flush():
+            # events are sent as plain dicts, store views are not picklable
+            pending.append((batch, executor.submit(_render_batch, [dict(event) for event in batch])))
+
+        for event in events:
+            batch.append(event)
+            if len(batch) == BATCH_SIZE:
+                flush()
+                batch = []
+
+                # bounded window: wait for the oldest batch before submitting more
+                while len(pending) >= workers * BATCHES_PER_WORKER:
+                    done_batch, future = pending.popleft()
+                    yield from zip(done_batch, future.result())
+
+        if batch:
+            flush()
+        while pending:
+            done_batch, future = pending.popleft()
+            yield from zip(done_batch, future.result())
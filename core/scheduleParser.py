@@ -0,0 +1,159 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# scheduleParser.py
+2025-06-14
+
+Parser for the compact schedule syntax used in the Excel sheets (see plugins/VBA macros script/Calendar.bas).
+Expands lazily into (start, end, fullday) slots, same format as eventBuilder.iter_slots.
+
+Schedule format:
+  * single date                         "dd/mm/YYYY"
+  * range of dates, one event           "dd/mm/YYYY - dd/mm/YYYY"
+  * date or range with fixed hours      "dd/mm/YYYY, hh:mm _ hh:mm"   (range: first day start hour, last day end hour)
+  * list of the above                   "dd/mm/YYYY; dd/mm/YYYY - dd/mm/YYYY, hh:mm _ hh:mm"
+  * trailing comment, ignored           "dd/mm/YYYY - dd/mm/YYYY (any comment)"
+  * one event per working day           "every working day from dd/mm/YYYY to dd/mm/YYYY[, hh:mm _ hh:mm]"
+  * one event per weekday, not holidays "Mon/Wed from dd/mm/YYYY for 12 weeks[, hh:mm _ hh:mm]"
+Hours "00:00 _ 00:00", or no hours, mean a full day event.
+Working days and holidays come from a WorkingCalendar (see workingDays.py), weekends only if none is given.
+"""
+
+import logging
+import regex as re
+from datetime import date, datetime, time, timedelta
+from core.workingDays import working_calendar
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# list separator, "; " in the Excel cells. Whitespaces are tolerated
+PATTERN_LIST_SEP = re.compile(r';\s*')
+
+# one schedule item: date [- date] [, hh:mm _ hh:mm] [(comment)]
+PATTERN_ITEM = re.compile(
+    r'^\s*(\d{1,2})/(\d{1,2})/(\d{4})'
+    r'(?:\s+-\s+(\d{1,2})/(\d{1,2})/(\d{4}))?'
+    r'(?:\s*,\s*(\d{1,2}):(\d{2})\s+_\s+(\d{1,2}):(\d{2}))?'
+    r'\s*(?:\(.*\))?\s*$'
+)
+
+# weekday name, abbreviated or full: "Mon", "Tues", "Thursday"
+WEEKDAY_NAME = r'(?:mon(?:day)?|tue(?:sday|s)?|wed(?:nesday)?|thu(?:rsday|rs|r)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)'
+
+# recurring item: every working day | weekdays, from date to date | for N weeks [, hh:mm _ hh:mm] [(comment)]
+PATTERN_RECURRING = re.compile(
+    rf'^\s*(?:every\s+working\s+day|({WEEKDAY_NAME}(?:\s*/\s*{WEEKDAY_NAME})*))'
+    r'\s+from\s+(\d{1,2})/(\d{1,2})/(\d{4})'
+    r'\s+(?:to\s+(\d{1,2})/(\d{1,2})/(\d{4})|for\s+(\d{1,4})\s+weeks?)'
+    r'(?:\s*,\s*(\d{1,2}):(\d{2})\s+_\s+(\d{1,2}):(\d{2}))?'
+    r'\s*(?:\(.*\))?\s*$',
+    re.IGNORECASE
+)
+
+
+
+# (start, end) times of a schedule item, None for a full day event (no hours or all-0 hours)
+def _hours(item: str, h1: str, min1: str, h2: str, min2: str) -> tuple:
+    if not h1 or (int(h1) == int(min1) == int(h2) == int(min2) == 0):
+        return None
+    try:
+        return time(int(h1), int(min1)), time(int(h2), int(min2))
+    except ValueError as exc:
+        raise ValueError(f"Invalid hour in schedule item: '{item}', {exc}")
+
+
+# date of the matched day, month, year
+def _date(item: str, d: str, m: str, y: str) -> date:
+    try:
+        return date(int(y), int(m), int(d))
+    except ValueError as exc:
+        raise ValueError(f"Invalid date in schedule item: '{item}', {exc}")
+
+
+# parse a schedule string, yield (start, end, fullday) for each event. Raises ValueError on invalid items
+# calendar: WorkingCalendar for the recurring items, default weekends only
+def parse_schedule(schedule: str, calendar=None):
+    if not schedule or not schedule.strip():
+        raise ValueError("Empty schedule!")
+
+    for item in PATTERN_LIST_SEP.split(schedule.strip().rstrip(';')):
+        match = PATTERN_ITEM.match(item)
+        if match:
+            yield from _dates_item(item, *match.groups())
+            continue
+
+        match = PATTERN_RECURRING.match(item)
+        if match:
+            yield from _recurring_item(item, *match.groups(), calendar=calendar or working_calendar())
+            continue
+
+        raise ValueError(f"Invalid schedule item: '{item}', expected 'dd/mm/YYYY[ - dd/mm/YYYY][, hh:mm _ hh:mm]' "
+                         f"or 'every working day|Mon/Wed from dd/mm/YYYY to dd/mm/YYYY|for N weeks[, hh:mm _ hh:mm]'")
+
+
+# date or range of dates, one event
+def _dates_item(item: str, d1, m1, y1, d2, m2, y2, h1, min1, h2, min2):
+    start_day = _date(item, d1, m1, y1)
+    end_day = _date(item, d2, m2, y2) if d2 else start_day
+
+    if start_day > end_day:
+        raise ValueError(f"Event start date cannot be after end date: '{item}'")
+
+    hours = _hours(item, h1, min1, h2, min2)
+    # full day event
+    if not hours:
+        yield start_day, end_day + timedelta(days=1), True
+        return
+
+    # fixed hours event
+    start = datetime.combine(start_day, hours[0])
+    end = datetime.combine(end_day, hours[1])
+    if start > end:
+        raise ValueError(f"Event start hour cannot be after end hour: '{item}'")
+
+    yield start, end, False
+
+
+# one event per working day, or per given weekday not holiday, expanded from the calendar bitmaps
+def _recurring_item(item: str, weekdays, d1, m1, y1, d2, m2, y2, weeks, h1, min1, h2, min2, calendar):
+    start_day = _date(item, d1, m1, y1)
+    # N weeks: last day before the same weekday N weeks later
+    end_day = _date(item, d2, m2, y2) if d2 else date.fromordinal(start_day.toordinal() + 7 * int(weeks) - 1)
+
+    if start_day > end_day:
+        raise ValueError(f"Event start date cannot be after end date: '{item}'")
+
+    hours = _hours(item, h1, min1, h2, min2)
+    if hours and hours[0] > hours[1]:
+        raise ValueError(f"Event start hour cannot be after end hour: '{item}'")
+
+    ordinals = calendar.ordinals(start_day, end_day, weekdays.split('/') if weekdays else None)
+    # full day events
+    if not hours:
+        for ordinal in ordinals:
+            yield date.fromordinal(ordinal), date.fromordinal(ordinal + 1), True
+        return
+
+    # fixed hours events
+    start_hr, end_hr = hours
+    for ordinal in ordinals:
+        day = date.fromordinal(ordinal)
+        yield datetime.combine(day, start_hr), datetime.combine(day, end_hr), False
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# settings.py
+2025-06-27
+
+User settings loading and validation, shared by the CLI client, the agents and the tools.
+Settings files are parsed once per file version: the parsed copy is cached in memory keyed by path, mtime and size,
+so repeated loads (many agents, many configs in the same process) cost no file read. Env-var overrides and secrets
+are applied, and the result validated, on each load: changed env vars or rotated secrets are never served stale.
+
+On top of the JSON file:
+  * env-var overrides: CALENDAR_PYCLIENT_<KEY>, e.g. CALENDAR_PYCLIENT_PASSWORD, CALENDAR_PYCLIENT_HTTP2=true
+  * secrets (SECRET_KEYS) may be references instead of clear text:
+        "password" : "file:~/.config/calendar-pyclient/password"    first line of the file
+        "password" : "keyring:calendar-pyclient"                     keyring service, for settings 'username'
+                                                                      (optional dependency: pip install keyring)
+
+Errors are raised as SettingsError (a ValueError) listing all problems found, never as assert.
+"""
+
+import os
+import json
+import logging
+from core.timezones import get_zone
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+ENV_PREFIX = "CALENDAR_PYCLIENT_"
+SECRET_KEYS = ('password',)
+MODES = ('caldav', 'microsoft_graph')
+
+# key: (accepted types, allowed values or None). Keys not listed are kept as they are
+FIELDS = {
+    'mode':                 (str, MODES),
+    'domain':               (str, None),
+    'username':             (str, None),
+    'server':               (str, None),
+    'password':             (str, None),
+    'azure_client_id':      (str, None),
+    'azure_tenant_id':      (str, None),
+    'calendar':             (str, None),
+    'group':                (bool, None),
+    'organizer_name':       (str, None),
+    'organizer_role':       (str, None),
+    'organizer_email':      (str, None),
+    'location':             (str, None),
+    'timezone':             (str, None),
+    'report':               (str, None),
+    'calendar_cache_ttl':   ((int, float), None),
+    'freebusy_cache_ttl':   ((int, float), None),
+    'max_attendees':        (int, None),
+    'holidays':             (str, None),
+    'holiday_region':       (str, None),
+    'render_workers':       (int, None),
+    'http_pool_size':       (int, None),
+    'max_concurrency':      (int, None),
+    'connect_timeout':      ((int, float), None),
+    'read_timeout':         ((int, float), None),
+    'http2':                ((bool, str), (False, True, 'prior_knowledge')),
+    'gzip_requests':        (bool, None),
+    'payload_profile':      (str, ('full', 'lean')),
+    'verify_events':        (bool, None),
+}
+
+# minimum value of numeric keys
+MINIMUM = {
+    'max_attendees':        1,
+    'max_concurrency':      1,
+    'http_pool_size':       1,
+    'render_workers':       0,
+}
+
+# numeric keys that must be greater than 0
+POSITIVE = ('connect_timeout', 'read_timeout')
+
+# mandatory keys, for all modes and per mode
+REQUIRED = ('mode', 'domain', 'username')
+REQUIRED_MODE = {
+    'caldav': ('server', 'password', 'organizer_name', 'organizer_role', 'organizer_email'),
+    'microsoft_graph': ('azure_client_id', 'azure_tenant_id'),
+}
+
+# (path, mtime_ns, size) -> parsed settings file
+_cache = {}
+
+
+
+class SettingsError(ValueError):
+    pass
+
+
+
+# raise SettingsError if any of the keys is missing, used by agents on settings not loaded from file
+def require(user_settings: dict, keys: tuple, what: str = "user settings") -> None:
+    missing = [k for k in keys if k not in user_settings]
+    if missing:
+        raise SettingsError(f"incomplete {what}, missing keys: {', '.join(missing)}")
+
+
+# load (parsed file cached), override, resolve secrets and validate settings file. Returns a new dict on each call
+def load_settings(path: str) -> dict:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _cache:
+        logger.info(f"Loading user settings JSON from file: {path}")
+        with open(path, 'r') as f:
+            try:
+                settings = json.load(f)
+            except json.JSONDecodeError as err:
+                raise SettingsError(f"invalid user settings JSON {path}: {err}")
+        if not isinstance(settings, dict):
+            raise SettingsError(f"invalid user settings {path}: a JSON object is expected")
+        _cache[key] = settings
+    else:
+        logger.info(f"User settings from cache: {path}")
+
+    return validate_settings(resolve_secrets(apply_env(_cache[key])))
+
+
+# env vars CALENDAR_PYCLIENT_<KEY> override file values, converted to the field type
+def apply_env(settings: dict, environ: dict = None) -> dict:
+    environ = os.environ if environ is None else environ
+    settings = dict(settings)
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        key = name[len(ENV_PREFIX):].lower()
+        types = FIELDS.get(key, (str, None))[0]
+        types = types if isinstance(types, tuple) else (types,)
+        if bool in types and value.lower() in ('1', 'true', 'yes', '0', 'false', 'no'):
+            value = value.lower() in ('1', 'true', 'yes')
+        elif int in types:
+            try:
+                value = int(value)
+            except ValueError:
+                if float in types:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        pass
+        logger.info(f"user settings '{key}' overridden by env {name}")
+        settings[key] = value
+    return settings
+
+
+# replace file: and keyring: references of secret keys with their value
+def resolve_secrets(settings: dict) -> dict:
+    for key in SECRET_KEYS:
+        value = settings.get(key)
+        if not isinstance(value, str):
+            continue
+
+        if value.startswith('file:'):
+            secret_file = os.path.expanduser(value[len('file:'):])
+            try:
+                with open(secret_file, 'r') as f:
+                    settings[key] = f.readline().rstrip('\r\n')
+            except OSError as err:
+                raise SettingsError(f"cannot read '{key}' from file {secret_file}: {err}")
+            logger.info(f"user settings '{key}' read from file")
+
+        elif value.startswith('keyring:'):
+            if keyring is None:
+                raise SettingsError(f"'{key}' is stored in keyring, but keyring is not installed: pip install keyring")
+            secret = keyring.get_password(value[len('keyring:'):], settings.get('username', ''))
+            if secret is None:
+                raise SettingsError(f"'{key}' not found in keyring service '{value[len('keyring:'):]}' for user '{settings.get('username', '')}'")
+            settings[key] = secret
+            logger.info(f"user settings '{key}' read from keyring")
+
+    return settings
+
+
+# check mandatory keys, types and values. Returns settings, raises SettingsError with all problems found
+def validate_settings(settings: dict) -> dict:
+    errors = [f"'{k}' key missing" for k in REQUIRED if k not in settings]
+    errors += [f"'{k}' key missing for mode {settings['mode']}" for k in REQUIRED_MODE.get(settings.get('mode'), ()) if k not in settings]
+
+    for key, (types, allowed) in FIELDS.items():
+        if key not in settings:
+            continue
+        value = settings[key]
+        # bool is an int subclass, not accepted for numbers
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in (types if isinstance(types, tuple) else (types,))):
+            errors.append(f"'{key}' has invalid type {type(value).__name__}")
+        elif allowed and value not in allowed:
+            errors.append(f"'{key}' must be one of: {', '.join(str(a) for a in allowed)}")
+        elif key in MINIMUM and value < MINIMUM[key]:
+            errors.append(f"'{key}' must be at least {MINIMUM[key]}")
+        elif key in POSITIVE and value <= 0:
+            errors.append(f"'{key}' must be greater than 0")
+
+    if isinstance(settings.get('timezone'), str):
+        try:
+            get_zone(settings['timezone'])
+        except ValueError as err:
+            errors.append(str(err))
+
+    if errors:
+        raise SettingsError("invalid user settings: " + "; ".join(errors))
+    return settings
@@ -0,0 +1,229 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# syncIndex.py
+2025-06-29
+
+Sync index: re-running the same schedule sends only what changed since the previous run.
+Each logical event is identified by calendar, name, start and occurrence (invite chunks share the same slot); imported
+events by calendar and source UID. It has a content fingerprint (name, description, dates, location, timezone,
+attendees, alarm). The index maps logical events to the server-side UID (CalDAV) or ID (Graph) and to the last
+fingerprint sent, per account and per sync scope:
+  * key not in index:                 moved, when an entry with the same calendar and name is left over in the
+                                      index (nearest start), updated in place. Otherwise create
+  * key in index, fingerprint differs: update, same server UID/ID
+  * key in index, same fingerprint:    skip
+  * key in index, not in this run:     removed, deleted on request
+A session inserted or removed does not touch the others, a session moved to another day or hour keeps its server event.
+
+Index file format:
+       {
+           "caldav:cloud.domain.com:jane.doe": {
+               "training-2025": {
+                   "personal|Event name|2025-07-01T09:00:00|0": ["uid", "server id", "fingerprint", "personal", false]
+               }
+           }
+       }
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# event keys that make its content
+FINGERPRINT_KEYS = ('name', 'description', 'calendar', 'group', 'start', 'end', 'fullday', 'location', 'timezone',
+                    'invite', 'alarm_type', 'alarm_format', 'alarm_time')
+
+
+
+def _plain(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return sorted(str(v).lower() for v in value)
+    return value
+
+
+# sha1 of the event content
+def fingerprint(event) -> str:
+    content = {k: _plain(event[k]) for k in FINGERPRINT_KEYS if k in event}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+# yield (key, event), events with the same calendar, name and start are told apart by their occurrence
+# imported events (icsImport.py) are keyed on their source UID instead: renamed or moved ones are updated in place
+def logical_keys(events):
+    seen = {}
+    for event in events:
+        base = f"{event['calendar']}|source:{event['source_id']}" if event.get('source_id') else f"{event['calendar']}|{event['name']}|{_plain(event['start'])}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        yield f"{base}|{n}", event
+
+
+# naive UTC datetime of a start, for distances
+def _instant(value) -> datetime:
+    if not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+# "calendar|name|start|occurrence" to ("calendar|name", start, occurrence). Keys without a start
+# ("calendar|name|occurrence", older index files) give a None start
+def _split_key(key: str) -> tuple:
+    head, _, n = key.rpartition('|')
+    base, _, start = head.rpartition('|')
+    n = int(n) if n.isdigit() else 0
+    try:
+        return base, _instant(datetime.fromisoformat(start)), n
+    except ValueError:
+        return head, None, n
+
+
+
+class SyncIndex():
+
+    def __init__(self, index_file: str, user_settings: dict, scope: str):
+        self.index_file = index_file
+        self.scope = scope
+        self.key = f"{user_settings['mode']}:{user_settings['domain']}:{user_settings['username']}"
+        self.__lock = threading.Lock()
+        self.__data = self.__load()
+        scopes = self.__data.setdefault(self.key, {})
+        self.__entries = scopes.setdefault(scope, {})
+
+        # planned run: event uid -> (key, server id or None, fingerprint, index key it replaces)
+        self.__pending = {}
+        self.__seen = set()
+        self.removed = []
+
+
+    def __load(self) -> dict:
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Invalid sync index file {self.index_file}, ignored: {repr(exc)}")
+            return {}
+
+
+    # compare events with the index, returns the events to send (created and updated) and the unchanged count
+    # updated events keep the UID of the first run. Logical events missing from this run are listed in self.removed
+    def plan(self, events) -> tuple[list, int]:
+        self.__seen = set()
+        keyed = list(logical_keys(events))
+        changes, unchanged = self.plan_page(keyed, self.__moved(keyed))
+        self.removed = self.unseen()
+        logger.info(f"sync plan, scope '{self.scope}': {len(changes)} to send, {unchanged} unchanged, {len(self.removed)} removed")
+        return changes, unchanged
+
+
+    # keys of this run missing from the index -> index keys left over by this run with the same calendar and name,
+    # matched nearest start first (keys without a start last, in occurrence order)
+    def __moved(self, keyed) -> dict:
+        keys = {key for key, _ in keyed}
+        missing = {}
+        for i, (key, event) in enumerate(keyed):
+            if key not in self.__entries and not event.get('source_id'):
+                missing.setdefault(f"{event['calendar']}|{event['name']}", []).append((i, key, _instant(event['start'])))
+        left = {}
+        for key in self.__entries:
+            if key not in keys and '|source:' not in key:
+                base, start, n = _split_key(key)
+                if base in missing:
+                    left.setdefault(base, []).append((n, key, start))
+
+        moved = {}
+        for base, entries in left.items():
+            pairs = sorted((abs(start - old_start) if old_start else timedelta.max, n, i, key, old_key)
+                           for i, key, start in missing[base] for n, old_key, old_start in entries)
+            taken = set()
+            for _, _, _, key, old_key in pairs:
+                if key not in moved and old_key not in taken:
+                    moved[key] = old_key
+                    taken.add(old_key)
+        return moved
+
+
+    # plan one page of (key, event), for runs read in pages (e.g. mirror.py). Keys are collected for unseen()
+    # moved: key -> index key of the same event moved since the last run
+    def plan_page(self, keyed, moved: dict = None) -> tuple[list, int]:
+        moved = moved or {}
+        changes = []
+        unchanged = 0
+        for key, event in keyed:
+            old_key = key if key in self.__entries else moved.get(key, key)
+            self.__seen.add(old_key)
+            fp = fingerprint(event)
+            entry = self.__entries.get(old_key)
+            if entry and entry[2] == fp:
+                unchanged += 1
+                continue
+            if entry:
+                event = dict(event) | {'uid': entry[0]}
+            self.__pending[event['uid']] = (key, entry[1] if entry else None, fp, old_key)
+            changes.append(event)
+        return changes, unchanged
+
+
+    # index entries not planned in this run: [(key, entry)]
+    def unseen(self) -> list:
+        return [(key, entry) for key, entry in self.__entries.items() if key not in self.__seen]
+
+
+    # server IDs of the events in the index
+    def known_ids(self) -> set:
+        return {entry[1] for entry in self.__entries.values() if entry[1]}
+
+
+    # server ID of a planned update, None for a new event
+    def server_id(self, event) -> str:
+        return self.__pending[event['uid']][1]
+
+
+    # record a sent event with its server ID
+    def record(self, event, server_id: str) -> None:
+        key, _, fp, old_key = self.__pending[event['uid']]
+        with self.__lock:
+            self.__entries.pop(old_key, None)
+            self.__entries[key] = [event['uid'], server_id, fp, event['calendar'], bool(event['group'])]
+
+
+    def forget(self, key: str) -> None:
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+
+    def save(self) -> None:
+        with self.__lock:
+            # write and rename, a crash never leaves a truncated index
+            tmp_file = f"{self.index_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.__data, f)
+            os.replace(tmp_file, self.index_file)
+        logger.info(f"sync index saved: {len(self.__entries)} events in scope '{self.scope}'")
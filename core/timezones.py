@@ -0,0 +1,61 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# timezones.py
+2025-06-16
+
+Timezone resolution for events, with per-process caches: each IANA zone name is resolved once,
+and each VTIMEZONE block is generated and serialized once per zone and year.
+
+Event timezone is taken from, in order: event 'timezone' key, user settings 'timezone' key, backend default.
+"""
+
+import logging
+from datetime import date
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from icalendar import Timezone
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+
+
+# IANA zone name to tzinfo, raises ValueError on unknown zones
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    try:
+        zone = ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as exc:
+        raise ValueError(f"Invalid timezone: '{name}'") from exc
+    logger.info(f"timezone resolved: {name}")
+    return zone
+
+
+# serialized VTIMEZONE block for given zone, valid for events starting in given year
+@lru_cache(maxsize=None)
+def vtimezone_ical(name: str, year: int) -> bytes:
+    logger.info(f"VTIMEZONE generated: {name}, {year}")
+    return Timezone.from_tzinfo(get_zone(name), tzid=name, first_date=date(year - 1, 1, 1), last_date=date(year + 2, 1, 1)).to_ical()
+
+
+# timezone name for the event, None if not set anywhere and no default
+def event_timezone(event_details: dict, user_settings: dict, default: str = None) -> str:
+    return event_details.get('timezone') or user_settings.get('timezone') or default
@@ -0,0 +1,235 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# workingDays.py
+2025-07-07
+
+Working days and holidays, for the schedule expansion ("every working day from ... to ...", "Mon/Wed from ... for 12
+weeks", see scheduleParser.py) and for the free slots search:
+  * one bitmap per year and region, bit i set if day i of the year (0 = 1st January) is a working day, built once
+    with integer operations: the week pattern is repeated over the year by a single multiplication, holidays are
+    cleared bit by bit. Bitmaps are cached per year and per weekdays pattern
+  * a range of days is expanded by scanning the set bits of the year bitmaps, no per-day date arithmetic: only the
+    selected days are converted to dates
+  * holidays are loaded from the JSON file set by the 'holidays' user setting, region from 'holiday_region'. The
+    calendar is cached per file version, without a file only weekends are non-working days
+
+Holidays file format, regions may include other regions, "easter" are offsets in days from Easter Sunday:
+       {
+           "IT": {
+               "fixed": ["01/01", "06/01", "25/04", "01/05", "02/06", "15/08", "01/11", "08/12", "25/12", "26/12"],
+               "easter": [0, 1]
+           },
+           "IT-TO": {"include": "IT", "fixed": ["24/06"], "dates": ["02/01/2026"], "weekend": ["Sat", "Sun"]}
+       }
+
+Usage:
+    calendar = working_calendar(user_settings.get('holidays'), user_settings.get('holiday_region'))
+    days = calendar.days(date(2025, 9, 1), date(2026, 6, 30))                  # working days, end included
+    days = calendar.days(date(2025, 9, 1), date(2025, 11, 23), ('mon', 'wed'))  # Mondays and Wednesdays, not holidays
+"""
+
+import os
+import json
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# weekday names, first 3 letters, and numbers as date.weekday()
+WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+WEEKEND = ('sat', 'sun')
+# one bit per weekday, bit 0 = Monday
+ALL_WEEKDAYS = 0x7F
+
+
+
+# Easter Sunday of the year, Gregorian calendar (anonymous Gregorian algorithm)
+def easter(year: int) -> date:
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    day = (h + l - 7 * m + 33 * month + 19) % 32
+    return date(year, month, day)
+
+
+
+# weekday bits (bit 0 = Monday) of weekday names ("Mon", "monday") or numbers as date.weekday()
+def weekday_bits(weekdays) -> int:
+    bits = 0
+    for weekday in weekdays:
+        number = weekday if isinstance(weekday, int) else WEEKDAYS.get(weekday.strip().lower()[:3])
+        if number is None or not 0 <= number <= 6:
+            raise ValueError(f"Invalid weekday: '{weekday}'")
+        bits |= 1 << number
+    return bits
+
+
+# weekday bits repeated over days, bit i = day first + i (ordinals). A week is 7 bits, repeated by one multiplication
+def repeat_week(bits: int, first: int, days: int) -> int:
+    # weekday of the first day, ordinal 1 is a Monday: rotate the pattern so bit 0 is that weekday
+    shift = (first - 1) % 7
+    rotated = ((bits >> shift) | (bits << (7 - shift))) & ALL_WEEKDAYS
+    weeks = days // 7 + 1
+    return rotated * (((1 << 7 * weeks) - 1) // ALL_WEEKDAYS) & ((1 << days) - 1)
+
+
+# "dd/mm" to (day, month)
+def _day_month(text: str) -> tuple:
+    day, month = text.strip().split('/')
+    # validated on a leap year, 29/02 is a valid fixed holiday
+    date(2000, int(month), int(day))
+    return int(day), int(month)
+
+
+# region rules of the holidays file, included regions first: (fixed, easter, dates, weekend)
+def _region_rules(regions: dict, region: str, seen: tuple = ()) -> tuple:
+    if region not in regions:
+        raise ValueError(f"Unknown holiday region: '{region}', regions in file: {', '.join(regions)}")
+    if region in seen:
+        raise ValueError(f"Holiday region includes itself: {' > '.join(seen + (region,))}")
+
+    rules = regions[region]
+    fixed, easter_offsets, dates, weekend = [], [], [], None
+    includes = rules.get('include', [])
+    for included in [includes] if isinstance(includes, str) else includes:
+        inc_fixed, inc_easter, inc_dates, inc_weekend = _region_rules(regions, included, seen + (region,))
+        fixed += inc_fixed
+        easter_offsets += inc_easter
+        dates += inc_dates
+        weekend = inc_weekend if inc_weekend is not None else weekend
+
+    fixed += [_day_month(text) for text in rules.get('fixed', [])]
+    easter_offsets += [int(offset) for offset in rules.get('easter', [])]
+    dates += [datetime.strptime(text.strip(), "%d/%m/%Y").date() for text in rules.get('dates', [])]
+    weekend = rules.get('weekend', weekend)
+    return fixed, easter_offsets, dates, weekend
+
+
+# working days calendar of the holidays file and region, cached per file version. Weekends only without a file
+# Raises OSError or ValueError on unreadable files and unknown regions
+def working_calendar(path: str = "", region: str = ""):
+    if not path:
+        return _load_calendar("", 0, "")
+    return _load_calendar(os.path.abspath(path), os.stat(path).st_mtime_ns, region or "")
+
+
+@lru_cache(maxsize=None)
+def _load_calendar(path: str, mtime_ns: int, region: str):
+    if not path:
+        return WorkingCalendar()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        regions = json.load(f)
+    if not isinstance(regions, dict) or not regions:
+        raise ValueError(f"Invalid holidays file {path}: a JSON object of regions is expected")
+    # a single region needs no 'holiday_region' setting
+    if not region and len(regions) == 1:
+        region = next(iter(regions))
+    if not region:
+        raise ValueError(f"Holiday region not set ('holiday_region' user setting), regions in file: {', '.join(regions)}")
+
+    fixed, easter_offsets, dates, weekend = _region_rules(regions, region)
+    logger.info(f"Holidays loaded from {path}, region {region}: {len(fixed)} fixed, {len(easter_offsets)} from Easter, {len(dates)} dates")
+    return WorkingCalendar(fixed, easter_offsets, dates, WEEKEND if weekend is None else weekend, region)
+
+
+
+class WorkingCalendar():
+
+    def __init__(self, fixed: list = (), easter_offsets: list = (), dates: list = (), weekend=WEEKEND, region: str = ""):
+        self.region = region
+        self.weekend = weekday_bits(weekend)
+        self.__fixed = list(fixed)
+        self.__easter = list(easter_offsets)
+        self.__dates = {}
+        for day in dates:
+            self.__dates.setdefault(day.year, []).append(day)
+
+        # year -> holidays bitmap, (year, weekday bits) -> working days bitmap
+        self.__holidays = {}
+        self.__bitmaps = {}
+
+
+    # holidays bitmap of the year, bit i = day i of the year
+    def holidays(self, year: int) -> int:
+        bits = self.__holidays.get(year)
+        if bits is None:
+            first = date(year, 1, 1).toordinal()
+            days = date(year + 1, 1, 1).toordinal() - first
+            bits = 0
+            for day, month in self.__fixed:
+                # 29/02 only on leap years
+                if month != 2 or day != 29 or days == 366:
+                    bits |= 1 << (date(year, month, day).toordinal() - first)
+            if self.__easter:
+                sunday = easter(year).toordinal() - first
+                for offset in self.__easter:
+                    if 0 <= sunday + offset < days:
+                        bits |= 1 << (sunday + offset)
+            for day in self.__dates.get(year, ()):
+                bits |= 1 << (day.toordinal() - first)
+            self.__holidays[year] = bits
+        return bits
+
+
+    # bitmap of the year, bit i = day i of the year is one of weekdays (bits) and not a holiday
+    def bitmap(self, year: int, weekdays: int) -> int:
+        key = (year, weekdays)
+        bits = self.__bitmaps.get(key)
+        if bits is None:
+            first = date(year, 1, 1).toordinal()
+            bits = repeat_week(weekdays, first, date(year + 1, 1, 1).toordinal() - first) & ~self.holidays(year)
+            self.__bitmaps[key] = bits
+        return bits
+
+
+    # ordinals of the days from start to end (included): working days, or the given weekdays that are not holidays
+    def ordinals(self, start: date, end: date, weekdays=None):
+        weekdays = ALL_WEEKDAYS & ~self.weekend if weekdays is None else weekday_bits(weekdays)
+        first, last = start.toordinal(), end.toordinal()
+        if first > last:
+            return
+        for year in range(start.year, end.year + 1):
+            year_first = date(year, 1, 1).toordinal()
+            low, high = max(first, year_first), min(last, date(year, 12, 31).toordinal())
+            mask = self.bitmap(year, weekdays) >> (low - year_first) & ((1 << (high - low + 1)) - 1)
+            # set bits from the lowest: lowest bit isolated by mask & -mask
+            while mask:
+                bit = mask & -mask
+                yield low + bit.bit_length() - 1
+                mask ^= bit
+
+
+    # dates of the days from start to end (included), see ordinals()
+    def days(self, start: date, end: date, weekdays=None):
+        return map(date.fromordinal, self.ordinals(start, end, weekdays))
+
+
+    def is_working(self, day: date) -> bool:
+        return bool(self.bitmap(day.year, ALL_WEEKDAYS & ~self.weekend) >> (day.toordinal() - date(day.year, 1, 1).toordinal()) & 1)
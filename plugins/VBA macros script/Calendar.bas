@@ -48,99 +48,8 @@ Sub calAdd_training()
     ' ", " between day and hour
     ' " _ " between start and end hours
 
-    ' set current selected cell as event date, then analyze it
-    EventDate = ActiveCell.Value
-    ' check if list of dates
-    date_array = Split(EventDate, "; ", -1)
-    If UBound(date_array) > 0 Then
-    
-        ' cylce over list and check if single or range dates
-        Dim j As Long
-        For j = 0 To UBound(date_array)
-
-            ' search last string, when j=(len of array), for comment between "()", if found consider only date
-            If j = UBound(date_array) Then
-                date_comment = Split(date_array(j), " (", -1)
-                If UBound(date_comment) > 0 Then
-                    date_j = date_comment(0)
-                Else
-                    date_j = date_array(j)
-                End If
-            Else
-                date_j = date_array(j)
-            End If
-
-            date_hours = Split(date_j, ", ", 2)
-            ' date with fixed hours
-            If UBound(date_hours) > 0 Then
-                ' search correct format
-                hours = Split(date_hours(1), " _ ", 2)
-                If UBound(hours) > 0 Then
-                    ' set start and end hours
-                    start_hr = start_hr & " " & hours(0)
-                    end_hr = end_hr & " " & hours(1)
-                    ' re-set data to remaining string without hours
-                    date_j = date_hours(0)
-                End If
-            Else
-                ' set empty start and end hours
-                start_hr = start_hr & " " & "00:00"
-                end_hr = end_hr & " " & "00:00"
-            End If
-        
-            date_range = Split(date_j, " - ", 2)
-            ' date range
-            If UBound(date_range) > 0 Then
-                start_day = start_day & " " & date_range(0)
-                end_day = end_day & " " & date_range(1)
-            Else
-            ' single date
-                start_day = start_day & " " & date_range(0)
-                end_day = end_day & " " & date_range(0)
-            End If
-        Next j
-
-    Else
-    ' else data range or single date
-
-        ' check if hours were provided
-        date_hours = Split(EventDate, ", ", 2)
-        ' date with fixed hours
-        If UBound(date_hours) > 0 Then
-            ' search correct format
-            hours = Split(date_hours(1), " _ ", 2)
-            If UBound(hours) > 0 Then
-                ' set start and end hours
-                start_hr = hours(0)
-                end_hr = hours(1)
-                ' re-set data to remaining string without hours
-                EventDate = date_hours(0)
-            End If
-        End If
-
-        ' else check if date range
-        date_array = Split(EventDate, " - ", 2)
-        If UBound(date_array) > 0 Then
-            start_day = date_array(0)
-            ' search string for comment between "()", if found consider only date
-            date_comment = Split(date_array(1), " (", -1)
-            If UBound(date_comment) > 0 Then
-                end_day = date_comment(0)
-            Else
-                end_day = date_array(1)
-            End If
-        Else
-        ' single date
-            date_array = Split(EventDate, " (", -1)
-            If UBound(date_array) > 0 Then
-                start_day = date_array(0)
-                end_day = date_array(0)
-            Else
-                start_day = EventDate
-                end_day = EventDate
-            End If
-        End If
-    End If
+    ' set current selected cell as event schedule, parsed and expanded by the python script (--schedule)
+    EventSchedule = ActiveCell.Value
     
     ' search for same event date, and add all corresponding values to string variable
     Dim N As Long, i As Long
@@ -208,8 +117,9 @@ Sub calAdd_training()
     PythonScript = scriptFolder & "calendar-pyCLIent.py"
     
     ' add commands
-    shellCommand = " --config " & scriptFolder & "user_settings.json" & " --name " & """" & EventName & """" & " --descr " & """" & EventDescr & """" & " --start_day " & """" & start_day & """" & " --end_day " & """" & end_day & """" & " --start_hr " & """" & start_hr & """" & " --end_hr " & """" & end_hr & """" & " --cal " & """" & "personal" & """" & " --alarm_type DISPLAY" & " --alarm_format D" & " --alarm_time 60" & """"
+    shellCommand = " --config " & scriptFolder & "user_settings.json" & " --name " & """" & EventName & """" & " --descr " & """" & EventDescr & """" & " --schedule " & """" & EventSchedule & """" & " --cal " & """" & "personal" & """" & " --alarm_type DISPLAY" & " --alarm_format D" & " --alarm_time 60" & """"
    
+    ' append " --enqueue" to return at once: events are queued and sent in background, without confirmation window
     ' run it hidden (0) and wait result (True)
     ' https://www.vbsedit.com/html/6f28899c-d653-4555-8a59-49640b0e32ea.asp
     exitCode = objShell.Run(PythonExe & PythonScript & shellCommand, 0, True)
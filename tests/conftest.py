@@ -0,0 +1,77 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Shared fixtures: repository root on sys.path, stand-in CalDAV and Graph servers (utils/mock_servers.py) and library
+clients connected to them. Run the tests from the repository root with: python -m pytest -q
+"""
+
+import os
+import sys
+import pytest
+
+# repo root on path, to import internal libs
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import calendar_pyhandler.client
+from calendar_pyhandler import Client
+from utils.benchmark import base_settings
+from agents.mgraphAgent import MGraphAgent
+from utils.mock_servers import MockBackend, start_server
+
+
+
+# start_server(backend=None) -> (backend, url), servers are shut down at the end of the test
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(backend: MockBackend = None) -> tuple:
+        server, url = start_server(backend=backend)
+        servers.append(server)
+        return server.backend, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+# client(mode, url, **settings) -> Client on the stand-in server, caches and sync index in the test directory
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    clients = []
+    # Graph: no login, token and URL of the stand-in server are set below
+    monkeypatch.setattr(calendar_pyhandler.client, 'MGraphAgent',
+                        lambda user_settings, user_agent=None: MGraphAgent(user_settings, user_agent, offline=True))
+
+    def make(mode: str, url: str, etag_cache: bool = False, **settings) -> Client:
+        if mode == 'caldav':
+            user_settings = base_settings | {'mode': 'caldav', 'server': f"{url}/caldav"} | settings
+        else:
+            user_settings = base_settings | {'mode': 'microsoft_graph'} | settings
+        new_client = Client(user_settings=user_settings, sync_index_file=str(tmp_path / "sync_index.json"),
+                            etag_cache_file=str(tmp_path / "etag_cache.json") if etag_cache else None,
+                            freebusy_cache_file=str(tmp_path / "freebusy_cache.json"))
+        if mode != 'caldav':
+            new_client.agent.graph_url = f"{url}/v1.0"
+            new_client.agent.access_token = "test-token"
+        clients.append(new_client)
+        return new_client
+
+    yield make
+    for made in clients:
+        made.close()
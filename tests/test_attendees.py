@@ -0,0 +1,69 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Attendees parsing, distribution lists and large invite lists (core/attendees.py)
+"""
+
+import json
+import pytest
+
+from core.attendees import chunk_attendees, load_distribution_lists, max_attendees, parse_attendees
+from core.eventBuilder import build_events, iter_slots
+
+
+
+def test_addresses_normalized_and_deduplicated():
+    valid, invalid = parse_attendees("a@domain.com, <B@Domain.com>; mailto:c@domain.com A@DOMAIN.COM b@domain.com not-an-address")
+
+    assert valid == ["a@domain.com", "B@Domain.com", "c@domain.com"]
+    assert invalid == ["not-an-address"]
+
+
+def test_distribution_lists_expanded_once(tmp_path):
+    path = tmp_path / "lists.json"
+    path.write_text(json.dumps({"Trainers": ["a@domain.com", "staff"], "staff": ["b@domain.com", "trainers", "a@domain.com"]}))
+    lists = load_distribution_lists(str(path))
+
+    valid, invalid = parse_attendees("TRAINERS c@domain.com", lists)
+
+    assert (valid, invalid) == (["a@domain.com", "b@domain.com", "c@domain.com"], [])
+    assert load_distribution_lists("") == {}
+
+
+def test_chunks():
+    attendees = [f"user{i}@domain.com" for i in range(5)]
+
+    assert chunk_attendees(attendees, 2) == [attendees[:2], attendees[2:4], attendees[4:]]
+    assert chunk_attendees([], 2) == [[]]
+    with pytest.raises(ValueError, match="at least 1"):
+        chunk_attendees(attendees, 0)
+
+
+def test_limit_per_backend():
+    assert max_attendees({'mode': 'microsoft_graph'}) == 500
+    assert max_attendees({'mode': 'caldav'}) == 100
+    assert max_attendees({'mode': 'caldav', 'max_attendees': 20}) == 20
+
+
+def test_large_invite_split_in_copies(caplog):
+    attendees = [f"user{i}@domain.com" for i in range(5)]
+    slots = iter_slots("01/07/2025 02/07/2025", "01/07/2025 02/07/2025", "09:00 09:00", "10:00 10:00")
+
+    events = build_events(slots, "Course", "", "personal", False, "domain.com", invite=attendees, max_attendees=2)
+
+    assert [event['invite'] for event in events] == [attendees[:2], attendees[2:4], attendees[4:]] * 2
+    assert len({event['uid'] for event in events}) == 6
+    assert "split in 3 events per slot" in caplog.text
@@ -0,0 +1,68 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Batch results of the library Client: counters, bounded failures, results streamed to on_result
+"""
+
+import calendar_pyhandler.client
+from utils.benchmark import make_events
+from utils.mock_servers import MockBackend
+
+
+
+def test_failures_are_bounded_and_results_streamed(mock_server, client, monkeypatch):
+    monkeypatch.setattr(calendar_pyhandler.client, 'MAX_FAILURES', 5)
+    _, url = mock_server()
+    events = make_events(40)
+    for event in events[::2]:
+        event['alarm_type'] = 'SMS'
+    reported = []
+
+    result = client('microsoft_graph', url).create(events, on_result=reported.append)
+
+    assert (result.ok, result.failed, result.not_sent, result.done) == (20, 20, 0, 40)
+    assert result.actions == {'create': 20}
+    assert len(result.failures) == 5 and all(not r.ok and r.index % 2 == 0 for r in result.failures)
+    assert sorted(r.index for r in reported) == list(range(40))
+
+
+def test_sync_deletions_are_reported(mock_server, client):
+    backend, url = mock_server()
+    caldav = client('caldav', url)
+    events = make_events(3)
+    caldav.sync(events, 'course')
+    reported = []
+
+    result = caldav.sync(events[:2], 'course', delete=True, on_result=reported.append)
+
+    assert (result.ok, result.total, result.actions) == (1, 1, {'delete': 1})
+    assert [(r.action, r.ok) for r in reported] == [('delete', True)]
+    assert len(backend.caldav) == 2
+
+
+def test_verify_sends_lost_events_again(mock_server, client):
+    backend, url = mock_server(MockBackend(loss_rate=0.3))
+    events = make_events(30)
+    reported = {}
+
+    result = client('caldav', url).create(events, on_result=lambda r: reported.update({r.index: r}), verify=True)
+
+    assert backend.stats['lost'] > 0
+    assert result.requeued > 0
+    assert result.ok + result.failed == 30
+    # final result of each event: OK ones are on the server
+    assert sorted(reported) == list(range(30))
+    assert sum(1 for r in reported.values() if r.ok) == result.ok == result.verified == len(backend.caldav)
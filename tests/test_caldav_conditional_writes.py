@@ -0,0 +1,85 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+CalDAV conditional writes with the ETag cache (agents/caldavAgent.py, core/etagCache.py)
+"""
+
+import os
+from core.eventBuilder import build_events, iter_slots
+
+
+
+def make_event(description: str) -> dict:
+    event = build_events(iter_slots("01/07/2025", "01/07/2025", "09:00", "10:00"), "Course", description, "personal", False, "bench.local")[0]
+    event['uid'] = "course-1@bench.local"
+    return event
+
+
+def stored(backend) -> bytes:
+    return backend.caldav["/caldav/bench.user/personal/course-1@bench.local"][1]
+
+
+def test_unchanged_event_costs_no_request(mock_server, client):
+    backend, url = mock_server()
+    caldav = client('caldav', url, etag_cache=True)
+    assert caldav.create([make_event("first")]).ok == 1
+    requests = backend.stats['requests']
+
+    assert caldav.create([make_event("first")]).ok == 1
+    assert backend.stats['requests'] == requests
+
+
+def test_existing_event_without_cache_entry_is_overwritten(mock_server, client, tmp_path):
+    backend, url = mock_server()
+    first = client('caldav', url, etag_cache=True)
+    assert first.create([make_event("first version")]).ok == 1
+    first.close()
+    # cache lost, e.g. another machine or a deleted file: If-None-Match fails on the existing event
+    os.remove(tmp_path / "etag_cache.json")
+
+    second = client('caldav', url, etag_cache=True)
+    result = second.create([make_event("second version")])
+
+    assert result.ok == 1
+    assert b"second version" in stored(backend)
+
+
+def test_existing_event_with_same_content_is_cached(mock_server, client, tmp_path):
+    backend, url = mock_server()
+    first = client('caldav', url, etag_cache=True)
+    first.create([make_event("same")])
+    first.close()
+    os.remove(tmp_path / "etag_cache.json")
+
+    second = client('caldav', url, etag_cache=True)
+    assert second.create([make_event("same")]).ok == 1
+    requests = backend.stats['requests']
+    assert second.create([make_event("same")]).ok == 1
+    assert backend.stats['requests'] == requests
+
+
+def test_event_changed_on_server_is_not_overwritten(mock_server, client):
+    backend, url = mock_server()
+    caldav = client('caldav', url, etag_cache=True)
+    caldav.create([make_event("ours")])
+    path = "/caldav/bench.user/personal/course-1@bench.local"
+    backend.caldav[path] = ('"changed-elsewhere"', backend.caldav[path][1].replace(b"ours", b"theirs"))
+
+    result = caldav.create([make_event("ours, updated")])
+
+    assert result.failed == 1
+    assert "changed on the server" in result.failures[0].message
+    assert b"theirs" in stored(backend)
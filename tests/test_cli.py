@@ -0,0 +1,81 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Command line runs without confirmation (calendar-pyCLIent.py --noprompt)
+"""
+
+import os
+import json
+import importlib.util
+from click.testing import CliRunner
+
+from utils.benchmark import base_settings
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_cli(tmp_path, monkeypatch):
+    spec = importlib.util.spec_from_file_location("calendar_pyCLIent", f"{ROOT_DIR}/calendar-pyCLIent.py")
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+    for name in ('calendar_cache_file', 'etag_cache_file', 'sync_index_file', 'outbox_file'):
+        monkeypatch.setattr(cli, name, str(tmp_path / name))
+    return cli
+
+
+def test_noprompt_is_headless(mock_server, tmp_path, monkeypatch):
+    backend, url = mock_server()
+    config = tmp_path / "user_settings.json"
+    config.write_text(json.dumps(base_settings | {'mode': 'caldav', 'server': f"{url}/caldav"}))
+    cli = load_cli(tmp_path, monkeypatch)
+
+    def no_window():
+        raise AssertionError("window opened")
+    monkeypatch.setattr(cli.tk, 'Tk', no_window)
+
+    result = CliRunner().invoke(cli.main, ['--config', str(config), '--name', "Course", '--descr', "Room B",
+                                           '--schedule', "01/07/2025 - 01/07/2025, 09:00 _ 10:00; 02/07/2025, 09:00 _ 10:00",
+                                           '--noprompt', '--noreport', '--noupdate'])
+
+    assert result.exit_code == 0, result.output
+    assert "2 eventi creati, 0 falliti" in result.output
+    assert len(backend.caldav) == 2
+
+
+def test_enqueue_makes_no_network_call(mock_server, tmp_path, monkeypatch):
+    backend, url = mock_server()
+    config = tmp_path / "user_settings.json"
+    config.write_text(json.dumps(base_settings | {'mode': 'caldav', 'server': f"{url}/caldav"}))
+    cli = load_cli(tmp_path, monkeypatch)
+    started = []
+    monkeypatch.setattr(cli, 'start_flusher', started.append)
+    monkeypatch.setattr(cli, 'OUTBOX_IDLE', 0)
+    args = ['--config', str(config), '--name', "Course", '--descr', "Room B", '--cal', "Training Room",
+            '--schedule', "01/07/2025, 09:00 _ 10:00; 02/07/2025, 09:00 _ 10:00", '--noreport']
+
+    for _ in range(2):
+        result = CliRunner().invoke(cli.main, args + ['--enqueue'])
+        assert result.exit_code == 0, result.output
+    # one flusher for both runs, calendar discovery left to it
+    assert started == [str(config)]
+    assert backend.stats['requests'] == 0
+
+    result = CliRunner().invoke(cli.main, ['--config', str(config), '--flush', '--noreport'])
+
+    assert result.exit_code == 0, result.output
+    assert len(backend.caldav) == 4
+    assert all(path.startswith("/caldav/bench.user/training-room/") for path in backend.caldav)
@@ -0,0 +1,65 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Cancelling a library Client batch (calendar_pyhandler/client.py)
+"""
+
+import threading
+from datetime import datetime
+
+from calendar_pyhandler import Client
+
+
+SETTINGS = {
+    'mode': 'caldav',
+    'domain': 'domain.com',
+    'username': 'jane',
+    'server': 'https://localhost:1',
+    'password': 'secret',
+    'organizer_name': 'Jane',
+    'organizer_role': 'Trainer',
+    'organizer_email': 'jane@domain.com',
+    'calendar': 'personal',
+    'max_concurrency': 2,
+}
+
+
+def test_cancel_stops_batch_and_saves_sync_index(tmp_path):
+    events = [{'uid': f"event-{i}@domain.com", 'name': f"event {i}", 'description': "", 'calendar': 'personal', 'group': False,
+               'start': datetime(2025, 7, 1 + i % 28, 9), 'end': datetime(2025, 7, 1 + i % 28, 10), 'fullday': False}
+              for i in range(100)]
+    cancel = threading.Event()
+    client = Client(user_settings=SETTINGS, sync_index_file=str(tmp_path / "sync_index.json"), cancel=cancel)
+
+    sent = []
+
+    def sync_event(event, server_id, **kwargs):
+        sent.append(event['uid'])
+        if len(sent) == 10:
+            cancel.set()
+        return True, "OK", event['uid']
+
+    client.agent.sync_event = sync_event
+    index, changes, _ = client.plan_sync(events, 'scope')
+    result = client.send_sync(index, changes)
+
+    assert result.cancelled
+    assert 10 <= len(sent) < 100
+    assert result.ok == len(sent)
+    # events created before the abort are in the saved index: the next run doesn't create them again
+    _, changes, unchanged = client.plan_sync(events, 'scope')
+    assert unchanged == len(sent)
+    assert len(changes) == 100 - len(sent)
@@ -0,0 +1,74 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Library Client batches: throttling, per-event failures, connections (calendar_pyhandler/client.py)
+"""
+
+import logging
+
+import core.concurrency
+from utils.benchmark import make_events
+from utils.mock_servers import MockBackend
+
+
+def test_throttled_events_are_retried_and_lower_the_limit(mock_server, client, monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger='core.concurrency')
+    monkeypatch.setattr(core.concurrency, 'RETRY_PAUSE', 0.5)
+    backend, url = mock_server(MockBackend(throttle_rps=10))
+    events = make_events(20)
+
+    result = client('caldav', url, max_concurrency=8).create(events)
+
+    assert (result.ok, result.failed, result.error) == (20, 0, None)
+    assert backend.stats['throttled'] > 0
+    assert len(backend.caldav) == 20
+    assert "limit down" in caplog.text
+
+
+def test_throttled_event_gives_up_after_max_retries(mock_server, client, monkeypatch):
+    monkeypatch.setattr(core.concurrency, 'RETRY_PAUSE', 0)
+    backend, url = mock_server(MockBackend(throttle_rps=0.001))
+
+    result = client('caldav', url).create(make_events(1))
+
+    assert result.failed == 1
+    assert backend.stats['requests'] == core.concurrency.MAX_RETRIES + 1
+    assert "ERROR: 429" in result.failures[0].message
+
+
+def test_event_raising_fails_alone(mock_server, client):
+    backend, url = mock_server()
+    events = make_events(3)
+    events[1] |= {'alarm_type': 'SMS', 'alarm_format': 'H', 'alarm_time': '00:30'}
+
+    result = client('microsoft_graph', url).create(events)
+
+    assert (result.ok, result.failed, result.error) == (2, 1, None)
+    failed = result.failures
+    assert (failed[0].index, failed[0].action) == (1, 'create')
+    assert "Invalid alarm_type" in failed[0].message
+    assert len(backend.graph) == 2
+
+
+def test_close_closes_the_connections(mock_server, client, monkeypatch):
+    _, url = mock_server()
+    caldav = client('caldav', url)
+    closed = []
+    monkeypatch.setattr(caldav.agent, 'close', lambda: closed.append(True))
+
+    caldav.close()
+
+    assert closed == [True]
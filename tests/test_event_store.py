@@ -0,0 +1,55 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Compact on-disk event store (core/eventStore.py)
+"""
+
+from datetime import date, datetime
+
+from core.eventStore import EventStore, write_store
+from core.eventBuilder import iter_slots
+
+
+
+def test_events_read_back(tmp_path):
+    path = str(tmp_path / "slots.evs")
+    slots = iter_slots("01/07/2025 02/07/2025", "01/07/2025 02/07/2025", "09:00 00:00", "10:00 00:00")
+    assert write_store(path, slots, "Course", "Room B", "personal", True, "domain.com", invite=["a@domain.com"], tz="Europe/Rome") == 2
+
+    store = EventStore(path)
+    try:
+        first, second = store
+        assert (first['name'], first['description'], first['calendar'], first['group']) == ("Course", "Room B", "personal", True)
+        assert (first['start'], first['end'], first['fullday']) == (datetime(2025, 7, 1, 9), datetime(2025, 7, 1, 10), False)
+        assert (second['start'], second['end'], second['fullday']) == (date(2025, 7, 2), date(2025, 7, 3), True)
+        assert (first['timezone'], first['invite']) == ("Europe/Rome", ["a@domain.com"])
+        assert 'location' not in first
+        assert first['uid'] != second['uid'] and first['uid'].endswith("_Course@domain.com")
+    finally:
+        store.close()
+
+
+def test_uid_without_name(tmp_path):
+    path = str(tmp_path / "slots.evs")
+    write_store(path, iter_slots("01/07/2025", "01/07/2025", "09:00", "10:00"), "", "", "", False, "domain.com")
+
+    store = EventStore(path)
+    try:
+        event = store[0]
+        assert event['name'] == "" and event['calendar'] == "personal"
+        assert "None" not in event['uid'] and event['uid'].endswith("_0_@domain.com")
+    finally:
+        store.close()
@@ -0,0 +1,90 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Common free slots of many attendees (core/freeSlots.py, Client.free_slots)
+"""
+
+import pytest
+from datetime import date, datetime, time, timedelta, timezone
+
+from core.freeSlots import find_slots, merge_intervals, working_windows
+from core.timezones import get_zone
+from core.workingDays import WorkingCalendar
+
+
+ADDRESSES = ["a@domain.com", "b@domain.com", "c@domain.com"]
+
+
+def utc(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2025, 7, day, hour, minute, tzinfo=timezone.utc)
+
+
+def test_merge_intervals():
+    intervals = [(utc(1, 10), utc(1, 11)), (utc(1, 9), utc(1, 10)), (utc(1, 10, 30), utc(1, 10, 45)), (utc(1, 14), utc(1, 15))]
+
+    assert merge_intervals(intervals) == [(utc(1, 9), utc(1, 11)), (utc(1, 14), utc(1, 15))]
+    assert merge_intervals([]) == []
+
+
+def test_find_slots_aligned_to_step():
+    busy = [(utc(1, 9), utc(1, 10, 10)), (utc(1, 12), utc(1, 13))]
+    windows = [(utc(1, 9), utc(1, 14)), (utc(2, 9), utc(2, 14))]
+
+    slots = find_slots(busy, windows, timedelta(hours=1), count=4)
+
+    assert slots == [(utc(1, 10, 30), utc(1, 11, 30)), (utc(1, 13), utc(1, 14)), (utc(2, 9), utc(2, 10)), (utc(2, 10), utc(2, 11))]
+
+
+def test_working_windows_skip_weekends_and_holidays():
+    zone = get_zone("Europe/Rome")
+    # 04/07/2025 is a Friday, holiday here
+    windows = list(working_windows(date(2025, 7, 3), date(2025, 7, 8), (time(9), time(18)), zone, calendar=WorkingCalendar(fixed=[(4, 7)])))
+
+    assert windows == [(utc(3, 7), utc(3, 16)), (utc(7, 7), utc(7, 16))]
+
+
+def test_working_windows_cut_at_not_before():
+    zone = get_zone("UTC")
+    windows = list(working_windows(date(2025, 7, 1), date(2025, 7, 3), (time(9), time(18)), zone, not_before=utc(1, 12)))
+
+    assert windows == [(utc(1, 12), utc(1, 18)), (utc(2, 9), utc(2, 18))]
+
+
+# busy intervals of the stand-in server are the same on every call: slots are checked against them
+@pytest.mark.parametrize("mode, zone", [('caldav', "Europe/Rome"), ('microsoft_graph', "Europe/Rome"), ('caldav', "Pacific/Auckland")])
+def test_free_slots_of_many_attendees(mock_server, client, mode, zone):
+    backend, url = mock_server()
+    found = client(mode, url)
+    # next Monday, whole weeks in the future
+    start_day = date.today() + timedelta(days=7 - date.today().weekday())
+    end_day = start_day + timedelta(days=14)
+
+    slots, unknown = found.free_slots(ADDRESSES + ["nobody@domain.invalid"], start_day, end_day, timedelta(hours=1),
+                                      (time(9), time(18)), count=10, zone=zone)
+
+    assert unknown == ["nobody@domain.invalid"]
+    assert len(slots) == 10
+    local = get_zone(zone)
+    for start, end in slots:
+        assert start.tzinfo == local and end - start == timedelta(hours=1)
+        assert start.weekday() < 5 and time(9) <= start.time() and end.time() <= time(18)
+        for address in ADDRESSES:
+            assert not backend.busy_of(address, start.astimezone(timezone.utc), end.astimezone(timezone.utc))
+
+    # cached: searching again sends no request
+    requests = backend.stats['requests']
+    assert found.free_slots(ADDRESSES, start_day, end_day, timedelta(hours=1), (time(9), time(18)), count=10, zone=zone)[0] == slots
+    assert backend.stats['requests'] == requests
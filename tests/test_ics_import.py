@@ -0,0 +1,133 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Streaming .ics import (core/icsImport.py) and imported alarms on Graph
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+from core.icsImport import IcsFile, map_alarm, map_event, parse_vevent
+from agents.mgraphAgent import MGraphAgent
+from utils.benchmark import base_settings
+
+
+EXPORT = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:course-1@source.org\r\n"
+    "SUMMARY:Course with a long name\r\n"
+    " , folded\r\n"
+    "DESCRIPTION:First line\\nsecond\\, escaped\r\n"
+    "DTSTART;TZID=Europe/Rome:20250701T090000\r\n"
+    "DTEND;TZID=Europe/Rome:20250701T100000\r\n"
+    "ATTENDEE;CN=\"Doe, Jane\":mailto:jane@domain.com\r\n"
+    "BEGIN:VALARM\r\n"
+    "ACTION:EMAIL\r\n"
+    "TRIGGER:-PT1H30M\r\n"
+    "END:VALARM\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:dropped@source.org\r\n"
+    "SUMMARY:Dropped\r\n"
+    "DTSTART:20250702T090000Z\r\n"
+    "STATUS:CANCELLED\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:weekly@source.org\r\n"
+    "RECURRENCE-ID:20250703T080000Z\r\n"
+    "SUMMARY:Weekly\r\n"
+    "DTSTART:20250703T080000Z\r\n"
+    "DURATION:PT45M\r\n"
+    "END:VEVENT\r\n"
+    "BEGIN:VEVENT\r\n"
+    "UID:holiday@source.org\r\n"
+    "SUMMARY:Holiday\r\n"
+    "DTSTART;VALUE=DATE:20250704\r\n"
+    "END:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+def read_export(tmp_path) -> list:
+    path = tmp_path / "export.ics"
+    path.write_bytes(EXPORT.encode('utf-8'))
+    events = IcsFile(str(path), "personal", False, "domain.com")
+    try:
+        return list(events)
+    finally:
+        events.close()
+
+
+def test_cancelled_events_are_skipped(tmp_path):
+    assert [event['name'] for event in read_export(tmp_path)] == ["Course with a long name, folded", "Weekly", "Holiday"]
+
+
+def test_folded_lines_tzid_and_alarm(tmp_path):
+    event = read_export(tmp_path)[0]
+
+    assert event['description'] == "First line\nsecond, escaped"
+    assert (event['start'], event['end'], event['fullday']) == (datetime(2025, 7, 1, 9), datetime(2025, 7, 1, 10), False)
+    assert event['timezone'] == "Europe/Rome"
+    assert event['invite'] == ["jane@domain.com"]
+    assert (event['alarm_type'], event['alarm_format'], event['alarm_time']) == ('EMAIL', 'H', "1:30")
+    assert (event['uid'], event['source_id']) == ("course-1@source.org", "course-1@source.org")
+
+
+def test_recurrence_id_and_duration(tmp_path):
+    event = read_export(tmp_path)[1]
+
+    assert event['start'] == datetime(2025, 7, 3, 8, tzinfo=timezone.utc)
+    assert event['end'] - event['start'] == timedelta(minutes=45)
+    # occurrences of a recurring event share the source UID: each one gets its own
+    assert event['source_id'] == "weekly@source.org|20250703T080000Z"
+    assert event['uid'] != "weekly@source.org" and event['uid'].endswith("@domain.com")
+
+
+def test_full_day_without_end():
+    props = parse_vevent(b"\r\nUID:holiday@source.org\r\nSUMMARY:Holiday\r\nDTSTART;VALUE=DATE:20250704\r\n")
+    event = map_event(props, "personal", False, "domain.com")
+
+    assert (event['start'], event['end'], event['fullday']) == (date(2025, 7, 4), date(2025, 7, 5), True)
+
+
+def test_unknown_tzid_is_floating():
+    props = parse_vevent(b"\r\nUID:x@source.org\r\nDTSTART;TZID=W. Europe Standard Time:20250701T090000\r\n")
+    event = map_event(props, "personal", False, "domain.com")
+
+    assert event['start'] == datetime(2025, 7, 1, 9)
+    assert 'timezone' not in event
+
+
+def test_map_alarm():
+    def alarm(action, trigger, **params):
+        return {'ACTION': [({}, action)], 'TRIGGER': [(params, trigger)]}
+
+    assert map_alarm(alarm("DISPLAY", "-P2D")) == ('DISPLAY', 'D', 2)
+    assert map_alarm(alarm("AUDIO", "-PT15M")) == ('DISPLAY', 'H', "0:15")
+    assert map_alarm(alarm("EMAIL", "-P1W")) == ('EMAIL', 'D', 7)
+    # after the start, relative to the end, absolute or more than a day with hours: not representable
+    assert map_alarm(alarm("DISPLAY", "PT15M")) is None
+    assert map_alarm(alarm("DISPLAY", "-PT15M", RELATED="END")) is None
+    assert map_alarm(alarm("DISPLAY", "20250701T080000Z", VALUE="DATE-TIME")) is None
+    assert map_alarm(alarm("DISPLAY", "-P1DT2H")) is None
+
+
+def test_imported_email_alarm_is_a_graph_reminder(tmp_path):
+    agent = MGraphAgent(base_settings | {'mode': 'microsoft_graph'}, offline=True)
+    payload = agent.render_event(read_export(tmp_path)[0])
+
+    assert (payload['isReminderOn'], payload['reminderMinutesBeforeStart']) == (True, 90)
@@ -0,0 +1,93 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Durable local outbox (core/outbox.py)
+"""
+
+import time
+import threading
+from datetime import datetime
+
+import core.outbox
+from core.outbox import Outbox
+
+
+ACCOUNT = "caldav:domain.com:jane"
+
+
+def events(n: int) -> list:
+    return [{'uid': f"event-{i}@domain.com", 'name': "Course", 'calendar': 'personal', 'group': False,
+             'start': datetime(2025, 7, 1, 9), 'end': datetime(2025, 7, 1, 10), 'fullday': False} for i in range(n)]
+
+
+def test_one_flusher_claimed_by_concurrent_runs(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    Outbox(path).close()
+    barrier = threading.Barrier(8)
+    claimed = []
+
+    def enqueue():
+        with Outbox(path) as outbox:
+            outbox.put(events(1), ACCOUNT)
+            barrier.wait()
+            claimed.append(outbox.claim_flusher(ACCOUNT))
+
+    threads = [threading.Thread(target=enqueue) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == [False] * 7 + [True]
+
+
+def test_flusher_claimed_again_once_gone(tmp_path, monkeypatch):
+    with Outbox(str(tmp_path / "outbox.db")) as outbox:
+        assert outbox.claim_flusher(ACCOUNT)
+        assert not outbox.claim_flusher(ACCOUNT)
+        assert outbox.retire(ACCOUNT, time.time())
+        assert outbox.claim_flusher(ACCOUNT)
+        # stale heartbeat: the flusher died
+        monkeypatch.setattr(core.outbox, 'HEARTBEAT_STALE', 0)
+        assert outbox.claim_flusher(ACCOUNT)
+
+
+def test_retire_refused_with_events_queued(tmp_path):
+    with Outbox(str(tmp_path / "outbox.db")) as outbox:
+        outbox.heartbeat(ACCOUNT)
+        outbox.put(events(1), ACCOUNT)
+
+        assert not outbox.retire(ACCOUNT, time.time())
+        assert outbox.flusher_alive(ACCOUNT)
+
+
+def test_lease_renewed_and_events_acknowledged(tmp_path, monkeypatch):
+    with Outbox(str(tmp_path / "outbox.db")) as outbox:
+        outbox.put(events(3), ACCOUNT)
+        batch = outbox.claim(ACCOUNT, 10)
+        assert [event['uid'] for _, event in batch] == ["event-0@domain.com", "event-1@domain.com", "event-2@domain.com"]
+        assert batch[0][1]['start'] == datetime(2025, 7, 1, 9)
+
+        # leases expire at once, renewed ones are not claimed again
+        monkeypatch.setattr(core.outbox, 'LEASE_SECONDS', 0)
+        outbox.renew([batch[0][0]])
+        monkeypatch.setattr(core.outbox, 'LEASE_SECONDS', 300)
+        outbox.renew([batch[1][0], batch[2][0]])
+        outbox.ack([batch[1][0]])
+        outbox.retry([(batch[2][0], "ERROR: 500")])
+
+        assert [outbox_id for outbox_id, _ in outbox.claim(ACCOUNT, 10)] == [batch[0][0]]
+        assert outbox.counts(ACCOUNT) == (2, 0)
@@ -0,0 +1,97 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Compact schedule syntax (core/scheduleParser.py)
+"""
+
+import pytest
+from datetime import date, datetime
+
+from core.scheduleParser import parse_schedule
+from core.workingDays import WorkingCalendar
+
+
+
+def days(schedule: str, calendar=None) -> list:
+    return [start.day for start, _, _ in parse_schedule(schedule, calendar)]
+
+
+@pytest.mark.parametrize("weekdays", ["Mon/Wed", "mon / wed", "Monday/Wednesday", "MON/Wednesday"])
+def test_weekday_names(weekdays):
+    # 30/06/2025 is a Monday
+    assert days(f"{weekdays} from 30/06/2025 for 2 weeks") == [30, 2, 7, 9]
+
+
+@pytest.mark.parametrize("weekday", ["Tue", "Tues", "Tuesday", "Thu", "Thur", "Thurs", "Thursday"])
+def test_abbreviations(weekday):
+    assert len(days(f"{weekday} from 30/06/2025 for 3 weeks")) == 3
+
+
+@pytest.mark.parametrize("item", ["Monkey from 30/06/2025 for 2 weeks", "Sunshine from 30/06/2025 for 2 weeks",
+                                  "Mon/Wedding from 30/06/2025 for 2 weeks", "Frid from 30/06/2025 to 11/07/2025",
+                                  "Monday/ from 30/06/2025 for 2 weeks"])
+def test_invalid_weekday_names(item):
+    with pytest.raises(ValueError, match="Invalid schedule item"):
+        list(parse_schedule(item))
+
+
+def test_every_working_day_skips_weekends_and_holidays():
+    calendar = WorkingCalendar(fixed=[(2, 7)])
+    slots = list(parse_schedule("every working day from 30/06/2025 to 06/07/2025, 09:00 _ 13:00", calendar))
+
+    assert [start.day for start, _, _ in slots] == [30, 1, 3, 4]
+    assert slots[0] == (datetime(2025, 6, 30, 9), datetime(2025, 6, 30, 13), False)
+
+
+def test_full_day_recurring_and_dates_list():
+    slots = list(parse_schedule("Fri from 30/06/2025 for 1 week; 10/07/2025 - 11/07/2025 (exam)"))
+
+    assert slots == [(date(2025, 7, 4), date(2025, 7, 5), True), (date(2025, 7, 10), date(2025, 7, 12), True)]
+
+
+def test_dates_ranges_and_hours():
+    slots = list(parse_schedule("01/07/2025; 02/07/2025 - 04/07/2025, 09:00 _ 17:30;07/07/2025, 00:00 _ 00:00 (no hours)"))
+
+    assert slots == [
+        (date(2025, 7, 1), date(2025, 7, 2), True),
+        (datetime(2025, 7, 2, 9), datetime(2025, 7, 4, 17, 30), False),
+        (date(2025, 7, 7), date(2025, 7, 8), True),
+    ]
+
+
+def test_trailing_separator_and_spaces():
+    assert len(list(parse_schedule("  1/7/2025 ;  2/7/2025 , 9:00 _ 10:00 ; "))) == 2
+
+
+@pytest.mark.parametrize("schedule, error", [
+    ("", "Empty schedule"),
+    ("01/07/2025 09:00", "Invalid schedule item"),
+    ("32/07/2025", "Invalid date in schedule item"),
+    ("01/07/2025, 25:00 _ 26:00", "Invalid hour in schedule item"),
+    ("03/07/2025 - 01/07/2025", "start date cannot be after end date"),
+    ("01/07/2025, 10:00 _ 09:00", "start hour cannot be after end hour"),
+    ("every working day from 01/07/2025, 10:00 _ 09:00", "Invalid schedule item"),
+])
+def test_invalid_schedules(schedule, error):
+    with pytest.raises(ValueError, match=error):
+        list(parse_schedule(schedule))
+
+
+def test_expanded_lazily():
+    slots = parse_schedule("01/07/2025; 31/02/2025")
+    assert next(slots) == (date(2025, 7, 1), date(2025, 7, 2), True)
+    with pytest.raises(ValueError):
+        next(slots)
@@ -0,0 +1,101 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+User settings loading and validation (core/settings.py)
+"""
+
+import json
+import pytest
+
+import core.settings
+from core.settings import SettingsError, load_settings, validate_settings
+
+
+SETTINGS = {
+    'mode': 'caldav',
+    'domain': 'domain.com',
+    'username': 'jane',
+    'server': 'https://cloud.domain.com/remote.php/dav/calendars',
+    'password': 'secret',
+    'organizer_name': 'Jane',
+    'organizer_role': 'Trainer',
+    'organizer_email': 'jane@domain.com',
+}
+
+
+@pytest.fixture
+def settings_file(tmp_path):
+    path = tmp_path / "user_settings.json"
+    path.write_text(json.dumps(SETTINGS))
+    return str(path)
+
+
+def test_env_overrides_apply_on_each_load(settings_file, monkeypatch):
+    assert load_settings(settings_file)['password'] == "secret"
+
+    monkeypatch.setenv("CALENDAR_PYCLIENT_PASSWORD", "rotated")
+    monkeypatch.setenv("CALENDAR_PYCLIENT_MAX_CONCURRENCY", "4")
+    settings = load_settings(settings_file)
+
+    assert (settings['password'], settings['max_concurrency']) == ("rotated", 4)
+    # the file is parsed once
+    assert len([key for key in core.settings._cache if key[0] == settings_file]) == 1
+
+
+def test_secret_file_read_on_each_load(settings_file, tmp_path):
+    secret = tmp_path / "password"
+    secret.write_text("first\n")
+    with open(settings_file, 'w') as f:
+        json.dump(SETTINGS | {'password': f"file:{secret}"}, f)
+
+    assert load_settings(settings_file)['password'] == "first"
+    secret.write_text("second\n")
+    assert load_settings(settings_file)['password'] == "second"
+
+
+def test_env_may_complete_the_file(tmp_path, monkeypatch):
+    path = tmp_path / "user_settings.json"
+    path.write_text(json.dumps({k: v for k, v in SETTINGS.items() if k != 'password'}))
+
+    with pytest.raises(SettingsError, match="'password' key missing"):
+        load_settings(str(path))
+    monkeypatch.setenv("CALENDAR_PYCLIENT_PASSWORD", "from-env")
+    assert load_settings(str(path))['password'] == "from-env"
+
+
+def test_loaded_settings_are_copies(settings_file):
+    load_settings(settings_file)['domain'] = "changed.com"
+    assert load_settings(settings_file)['domain'] == "domain.com"
+
+
+@pytest.mark.parametrize("key, value, error", [
+    ('max_concurrency', 0, "'max_concurrency' must be at least 1"),
+    ('max_attendees', 0, "'max_attendees' must be at least 1"),
+    ('http_pool_size', 0, "'http_pool_size' must be at least 1"),
+    ('render_workers', -1, "'render_workers' must be at least 0"),
+    ('connect_timeout', 0, "'connect_timeout' must be greater than 0"),
+    ('read_timeout', -2.5, "'read_timeout' must be greater than 0"),
+    ('max_concurrency', True, "'max_concurrency' has invalid type bool"),
+    ('payload_profile', 'small', "'payload_profile' must be one of: full, lean"),
+])
+def test_invalid_values(key, value, error):
+    with pytest.raises(SettingsError, match=error):
+        validate_settings(SETTINGS | {key: value})
+
+
+def test_valid_limits():
+    settings = SETTINGS | {'render_workers': 0, 'http_pool_size': 1, 'connect_timeout': 0.5, 'read_timeout': 30}
+    assert validate_settings(dict(settings)) == settings
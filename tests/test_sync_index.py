@@ -0,0 +1,102 @@
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+Sync index planning (core/syncIndex.py)
+"""
+
+import json
+from datetime import datetime
+
+from core.syncIndex import SyncIndex
+
+
+SETTINGS = {'mode': 'caldav', 'domain': 'domain.com', 'username': 'jane'}
+
+
+def session(name: str, day: int, hour: int) -> dict:
+    return {'uid': f"{name}-{day}-{hour}@domain.com", 'name': name, 'calendar': 'personal', 'group': False,
+            'start': datetime(2025, 7, day, hour), 'end': datetime(2025, 7, day, hour + 1), 'fullday': False}
+
+
+# first run of the sessions, recorded and saved
+def first_run(index_file: str, sessions: list) -> None:
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    changes, _ = index.plan(sessions)
+    for event in changes:
+        index.record(event, f"id-{event['uid']}")
+    index.save()
+
+
+def test_moved_session_is_updated_in_place(tmp_path):
+    index_file = str(tmp_path / "sync_index.json")
+    first_run(index_file, [session('Course', 1, 9), session('Course', 2, 9)])
+
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    changes, unchanged = index.plan([session('Course', 1, 9), session('Course', 3, 14)])
+
+    assert unchanged == 1
+    assert index.removed == []
+    assert [(event['uid'], index.server_id(event)) for event in changes] == [("Course-2-9@domain.com", "id-Course-2-9@domain.com")]
+
+
+def test_inserted_session_is_the_only_change(tmp_path):
+    index_file = str(tmp_path / "sync_index.json")
+    first_run(index_file, [session('Course', day, 9) for day in (1, 3, 4, 7)])
+
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    changes, unchanged = index.plan([session('Course', day, 9) for day in (1, 2, 3, 4, 7)])
+
+    assert unchanged == 4
+    assert index.removed == []
+    assert [(event['uid'], index.server_id(event)) for event in changes] == [("Course-2-9@domain.com", None)]
+
+
+def test_removed_session_is_the_only_change(tmp_path):
+    index_file = str(tmp_path / "sync_index.json")
+    first_run(index_file, [session('Course', day, 9) for day in (1, 2, 3, 4)])
+
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    changes, unchanged = index.plan([session('Course', day, 9) for day in (1, 3, 4)])
+
+    assert (changes, unchanged) == ([], 3)
+    assert [entry[1] for _, entry in index.removed] == ["id-Course-2-9@domain.com"]
+
+
+def test_moved_sessions_match_the_nearest_start(tmp_path):
+    index_file = tmp_path / "sync_index.json"
+    index_file.write_text(json.dumps({"caldav:domain.com:jane": {"course": {
+        "personal|Course|2025-07-02T09:00:00|0": ["uid-2", "id-2", "fp", "personal", False],
+        "personal|Course|2025-07-01T09:00:00|0": ["uid-1", "id-1", "fp", "personal", False],
+    }}}))
+
+    index = SyncIndex(str(index_file), SETTINGS, 'course')
+    changes, _ = index.plan([session('Course', 1, 10), session('Course', 2, 10)])
+
+    assert index.removed == []
+    assert [index.server_id(event) for event in changes] == ["id-1", "id-2"]
+
+
+def test_moved_session_is_rekeyed(tmp_path):
+    index_file = str(tmp_path / "sync_index.json")
+    first_run(index_file, [session('Course', 1, 9)])
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    changes, _ = index.plan([session('Course', 2, 9)])
+    index.record(changes[0], index.server_id(changes[0]))
+    index.save()
+
+    index = SyncIndex(index_file, SETTINGS, 'course')
+    assert index.plan([session('Course', 2, 9)]) == ([], 1)
+    assert index.removed == []
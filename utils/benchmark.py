@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# benchmark.py
+2025-06-10
+
+Throughput benchmark of the events pipeline, no real server needed:
+  * parse:     args_check + start/end slots parsing, and compact --schedule parsing
+  * build:     events list building
+  * serialize: ICS (CalDAV) and JSON (Graph) payloads rendering
+  * pool:      ICS rendering in-process vs process pool (see core/renderPool.py), --workers processes
+  * submit:    end-to-end create_event against local stand-in CalDAV and Graph servers (see mock_servers.py)
+  * import:    ICS file import (see core/icsImport.py): VEVENT offsets indexing, events parsing, and concurrent
+               submission of the parsed events to the stand-in CalDAV server through the library Client
+
+Usage:
+    python utils/benchmark.py [--sizes 1,100,10000,100000] [--stages parse,build,serialize,pool,submit,import] [--workers 4]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import contextlib
+import click
+from datetime import date, timedelta
+
+# repo root on path, to import internal libs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.caldavAgent import CaldavAgent
+from agents.mgraphAgent import MGraphAgent
+from core.eventBuilder import args_check, iter_slots, build_events
+from core.scheduleParser import parse_schedule
+from core.renderPool import render_ics
+from core.icsImport import IcsFile
+from calendar_pyhandler import Client
+from utils.mock_servers import start_server
+
+
+
+# logger, per-event INFO logs would dominate the measure
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+DOMAIN = "bench.local"
+STAGES = ('parse', 'build', 'serialize', 'pool', 'submit', 'import')
+
+base_settings = {
+    "domain" : DOMAIN,
+    "username": "bench.user",
+    "password": "bench-password",
+    "calendar" : "personal",
+    "organizer_name" : "Bench User",
+    "organizer_role" : "IT",
+    "organizer_email" : "bench.user@bench.local",
+    "timezone" : "Europe/Rome",
+    "azure_client_id" : "bench-client-id",
+    "azure_tenant_id" : "bench-tenant-id",
+}
+
+
+
+# space-separated args, like the ones given by command line, for n events
+def make_args(n: int) -> tuple[str, str, str, str]:
+    first = date(2025, 1, 1)
+    days = " ".join((first + timedelta(days=i)).strftime("%d/%m/%Y") for i in range(n))
+    return days, days, " ".join(["09:00"] * n), " ".join(["17:30"] * n)
+
+
+def make_events(n: int) -> list:
+    start_day, end_day, start_hr, end_hr = make_args(n)
+    return build_events(iter_slots(start_day, end_day, start_hr, end_hr), "Bench event", "Benchmark event description",
+                        "personal", False, DOMAIN, loc="Main Office", invite=["a@bench.local", "b@bench.local"],
+                        alarm=('DISPLAY', 'D', 1))
+
+
+# run func, return elapsed seconds
+def timed(func, *args) -> float:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+
+def bench_parse(n: int) -> dict:
+    args = make_args(n)
+    schedule = "; ".join(f"{day}, 09:00 _ 17:30" for day in args[0].split())
+    return {
+        'parse': timed(lambda: (args_check(*args), list(iter_slots(*args)))),
+        'parse schedule': timed(lambda: list(parse_schedule(schedule))),
+    }
+
+
+def bench_build(n: int) -> dict:
+    slots = list(iter_slots(*make_args(n)))
+    return {'build': timed(build_events, slots, "Bench event", "descr", "personal", False, DOMAIN, "Main Office",
+                           ["a@bench.local", "b@bench.local"], ('DISPLAY', 'D', 1))}
+
+
+def bench_serialize(n: int) -> dict:
+    events = make_events(n)
+    caldav = CaldavAgent(base_settings | {"mode" : "caldav", "server" : "http://127.0.0.1/caldav"})
+    graph = MGraphAgent(base_settings | {"mode" : "microsoft_graph"}, offline=True)
+    return {
+        'serialize ics': timed(lambda: [caldav.render_event(e) for e in events]),
+        'serialize json': timed(lambda: [json.dumps(graph.render_event(e), default=str) for e in events]),
+    }
+
+
+def bench_pool(n: int, workers: int) -> dict:
+    events = make_events(n)
+    settings = base_settings | {"mode" : "caldav", "server" : "http://127.0.0.1/caldav"}
+    caldav = CaldavAgent(settings, offline=True)
+    return {
+        'render serial': timed(lambda: [caldav.render_event(e) for e in events]),
+        f'render pool x{workers}': timed(lambda: [ics for e, ics in render_ics(events, settings, workers=workers)]),
+    }
+
+
+def bench_submit(n: int, url: str) -> dict:
+    events = make_events(n)
+    caldav = CaldavAgent(base_settings | {"mode" : "caldav", "server" : f"{url}/caldav"})
+    graph = MGraphAgent(base_settings | {"mode" : "microsoft_graph"}, offline=True)
+    graph.graph_url = f"{url}/v1.0"
+    graph.access_token = "bench-token"
+    return {
+        'submit caldav': timed(lambda: [caldav.create_event(e) for e in events]),
+        'submit graph': timed(lambda: [graph.create_event(e) for e in events]),
+    }
+
+
+
+# ICS export of n events, like the ones of other calendar apps
+def make_ics(n: int, path: str) -> None:
+    first = date(2025, 1, 1)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Bench//EN\r\n")
+        for i in range(n):
+            day = (first + timedelta(days=i % 3650)).strftime("%Y%m%d")
+            f.write(f"BEGIN:VEVENT\r\nUID:bench-{i}@{DOMAIN}\r\nSUMMARY:Bench event {i}\r\n"
+                    f"DESCRIPTION:Benchmark event description\\nsecond line of a description long enough to be fo\r\n lded\r\n"
+                    f"DTSTART;TZID=Europe/Rome:{day}T090000\r\nDTEND;TZID=Europe/Rome:{day}T173000\r\nLOCATION:Main Office\r\n"
+                    f"ATTENDEE;CN=A;RSVP=TRUE:mailto:a@{DOMAIN}\r\nBEGIN:VALARM\r\nACTION:DISPLAY\r\nTRIGGER:-P1D\r\nEND:VALARM\r\n"
+                    f"END:VEVENT\r\n")
+        f.write("END:VCALENDAR\r\n")
+
+
+def bench_import(n: int, url: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.ics")
+        make_ics(n, path)
+        results = {'ics index': timed(lambda: IcsFile(path, "personal", False, DOMAIN).close())}
+        events = IcsFile(path, "personal", False, DOMAIN)
+        results['ics parse'] = timed(lambda: [e for e in events])
+        client = Client(base_settings | {"mode" : "caldav", "server" : f"{url}/caldav"})
+        results['ics submit'] = timed(client.create, events)
+        events.close()
+        return results
+
+
+@click.command()
+@click.option(
+    "--sizes",
+    type=str,
+    default="1,100,10000,100000",
+    help='comma separated events counts. Default: "1,100,10000,100000"'
+)
+@click.option(
+    "--stages",
+    type=str,
+    default=",".join(STAGES),
+    help=f'comma separated stages to run. Default: "{",".join(STAGES)}"'
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=os.cpu_count() or 1,
+    help='render pool processes for the "pool" stage. Default: CPU count'
+)
+def main(sizes, stages, workers):
+    sizes = [int(n) for n in sizes.split(',')]
+    stages = [s.strip() for s in stages.split(',')]
+    server, url = start_server() if 'submit' in stages or 'import' in stages else (None, None)
+
+    print(f"{'stage':<16}{'events':>10}{'seconds':>12}{'events/s':>14}")
+    for n in sizes:
+        for stage in stages:
+            if stage not in STAGES:
+                raise click.BadParameter(f"unknown stage: {stage}")
+            if stage == 'submit':
+                results = bench_submit(n, url)
+            elif stage == 'import':
+                results = bench_import(n, url)
+            elif stage == 'pool':
+                results = bench_pool(n, workers)
+            else:
+                results = globals()[f"bench_{stage}"](n)
+            for name, elapsed in results.items():
+                print(f"{name:<16}{n:>10}{elapsed:>12.4f}{n / elapsed if elapsed else 0:>14.0f}")
+
+    if server:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
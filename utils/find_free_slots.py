@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# find_free_slots.py
+2025-07-06
+
+Finds the earliest common free slots of the invitees, for a duration inside working hours of working days (Monday to
+Friday), see core/freeSlots.py. Invitees are given like --invite of calendar-pyCLIent.py (addresses or distribution
+lists). Each slot is printed with the calendar-pyCLIent.py options to book it. Dates are dd/mm/YYYY, end included.
+
+Usage:
+    python utils/find_free_slots.py --invite "trainers jane@domain.com" --start 01/09/2025 --end 30/11/2025 --duration 04:00
+                                    [--config user_settings.json] [--hours 09:00-18:00] [--count 5] [--step 30] [--tz Europe/Rome]
+"""
+
+import os
+import sys
+import click
+from datetime import datetime, timedelta
+
+# repo root on path, to import internal libs
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from calendar_pyhandler import Client
+from core.attendees import parse_attendees, load_distribution_lists
+from core.eventBuilder import check_date, check_time, is_after_date, is_after_hour
+
+
+
+@click.command()
+@click.option("--config", type=str, default="user_settings.json", help='"path\\to\\config_file.json". Default: "user_settings.json"')
+@click.option("--invite", type=str, required=True, help='"user1@mail.org user2@mail.net list-name", invitees that must be free')
+@click.option("--start", type=str, required=True, help='"dd/mm/YYYY", first day to search')
+@click.option("--end", type=str, required=True, help='"dd/mm/YYYY", last day to search')
+@click.option("--duration", type=str, required=True, help='"HH:MM", slot duration')
+@click.option("--hours", type=str, default="09:00-18:00", help='"HH:MM-HH:MM", working hours. Default: "09:00-18:00"')
+@click.option("--count", type=int, default=5, help="slots to find. Default: 5")
+@click.option("--step", type=int, default=30, help="slot start alignment in minutes, from the working hours start. Default: 30")
+@click.option("--tz", type=str, default="", help='IANA timezone of the working hours. Default: user settings "timezone"')
+def main(config, invite, start, end, duration, hours, count, step, tz):
+    for day in (start, end):
+        date_ok, date_err = check_date(day)
+        if not date_ok:
+            raise click.BadParameter(str(date_err))
+    if is_after_date(start, end):
+        raise click.BadParameter(f"Start date cannot be after end date: {start}, {end}")
+    work_start, _, work_end = hours.partition('-')
+    for hour in (duration, work_start, work_end):
+        time_ok, time_err = check_time(hour)
+        if not time_ok:
+            raise click.BadParameter(str(time_err))
+    if not is_after_hour(work_end, work_start):
+        raise click.BadParameter(f"Working hours end must be after start: {hours}")
+
+    with Client(config=config, freebusy_cache_file=os.path.join(ROOT_DIR, "freebusy_cache.json")) as client:
+        addresses, invalid = parse_attendees(invite, load_distribution_lists(client.settings.get('distribution_lists')))
+        if invalid:
+            raise click.BadParameter(f"Invalid invite email address(es): {', '.join(invalid)}")
+
+        length = datetime.strptime(duration, "%H:%M") - datetime.strptime("00:00", "%H:%M")
+        slots, unknown = client.free_slots(addresses, datetime.strptime(start, "%d/%m/%Y").date(),
+                                           datetime.strptime(end, "%d/%m/%Y").date() + timedelta(days=1), length,
+                                           (datetime.strptime(work_start, "%H:%M").time(), datetime.strptime(work_end, "%H:%M").time()),
+                                           count=count, step=timedelta(minutes=step), zone=tz)
+
+    if unknown:
+        print(f"Free/busy not available, not considered: {', '.join(unknown)}")
+    print(f"{len(slots)} free slots of {duration} for {len(addresses)} invitees:")
+    for slot_start, slot_end in slots:
+        print(f"  {slot_start:%a %d/%m/%Y %H:%M} - {slot_end:%H:%M}    "
+              f"--start_day {slot_start:%d/%m/%Y} --end_day {slot_end:%d/%m/%Y} --start_hr {slot_start:%H:%M} --end_hr {slot_end:%H:%M}")
+
+
+if __name__ == '__main__':
+    main()
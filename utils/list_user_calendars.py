@@ -1,80 +1,68 @@
-import os
-import json
-import requests
-import msal
-
-
-
-# Azure client/app ID
-azure_client_id = "client-id"
-# Azure Tenant ID
-azure_tenant_id = "tenant-id"
-# Azure user's ID
-user_id = "user-id"
-
-ms_authority = f"https://login.microsoftonline.com/{azure_tenant_id}"
-ms_scopes = [
-        "https://graph.microsoft.com/Calendars.ReadWrite", 
-        "https://graph.microsoft.com/Calendars.ReadWrite.Shared", 
-        "https://graph.microsoft.com/Group.ReadWrite.All", 
-        "https://graph.microsoft.com/offline_access"
-    ]
-
-cache_file = "token_cache.json"
-
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# list_user_calendars.py
+2025-06-20
+
+Lists calendars (and Microsoft 365 groups) available to the user of the given settings, with their IDs,
+and refreshes the calendars cache used by calendar-pyCLIent.py to resolve --cal names.
+
+Usage:
+    python utils/list_user_calendars.py [--config user_settings.json]
+"""
 
+import os
+import sys
+import click
 
-def get_access_token() -> str:
-    """ Retrieves access token from cache or authenticates user if needed """
-    
-    # Load token cache if exists
-    cache = msal.SerializableTokenCache()
-    if os.path.exists(cache_file):
-        with open(cache_file, "r") as fp:
-            cache.deserialize(fp.read())
-
-    graph_app = msal.PublicClientApplication(azure_client_id, authority=ms_authority, token_cache=cache)
+# repo root on path, to import internal libs
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
 
-    # Try to get token silently (without asking user)
-    accounts = graph_app.get_accounts()
-    if accounts:
-        result = graph_app.acquire_token_silent(ms_scopes, account=accounts[0])
+from agents.caldavAgent import CaldavAgent
+from agents.mgraphAgent import MGraphAgent
+from core.calendarCache import CalendarCache
+from core.settings import load_settings
 
-    else:
-        # If no valid token, ask the user to log in interactively
-        result = graph_app.acquire_token_interactive(ms_scopes)
 
-    if "access_token" in result:
-        # Save updated token cache
-        with open(cache_file, "w") as fp:
-            fp.write(cache.serialize())
 
-        return result["access_token"]
+@click.command()
+@click.option(
+    "--config",
+    type=str,
+    default="user_settings.json",
+    help='"path\\to\\config_file.json". Default: "user_settings.json"'
+)
+def main(config):
+    user_settings = load_settings(config)
 
+    if user_settings['mode'] == 'caldav':
+        agent = CaldavAgent(user_settings)
     else:
-        err = "Failed to authenticate: " + json.dumps(result, indent=4)
-        raise Exception(err)
-
-
-access_token = get_access_token()
-
-# Microsoft Graph API endpoint
-url = f"https://graph.microsoft.com/v1.0/users/{user_id}/calendars"
+        agent = MGraphAgent(user_settings)
 
-# Headers
-headers = {
-    "Authorization": f"Bearer {access_token}",
-    "Content-Type": "application/json"
-}
+    calendars = agent.list_calendars()
+    for cal in calendars:
+        print(f"Calendar Name: {cal['name']}, ID: {cal['id']}{', group' if cal['group'] else ''}")
 
-# Make the request
-response = requests.get(url, headers=headers)
+    # same cache file used by the CLI client
+    CalendarCache(os.path.join(ROOT_DIR, "calendar_cache.json"), user_settings).update(calendars)
 
-# Print the calendar list
-if response.status_code == 200:
-    calendars = response.json()
-    for calendar in calendars.get("value", []):
-        print(f"Calendar Name: {calendar['name']}, ID: {calendar['id']}")
-else:
-    print(f"Error: {response.status_code}, {response.text}")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# load_generator.py
+2025-06-12
+
+Load generator: drives CaldavAgent and MGraphAgent with concurrent create_event calls against the local
+stand-in servers (see mock_servers.py), or against a given CalDAV/Graph base URL, and reports
+throughput, errors and latency percentiles.
+Workers may be fixed counts or 'adaptive': AIMD controller of core/concurrency.py, up to --max_concurrency in flight.
+Transports: pooled HTTP/1.1, and HTTP/2 with prior knowledge (needs httpx[http2], see agents/httpTransport.py).
+
+Usage:
+    python utils/load_generator.py [--mode caldav|microsoft_graph|both] [--events 1000] [--workers 1,4,16,adaptive]
+                                   [--transport http1|http2|both] [--payload full|lean] [--gzip]
+                                   [--latency 0.05] [--jitter 0.02] [--error_rate 0.01] [--throttle_rps 200] [--capacity 8]
+"""
+
+import os
+import sys
+import time
+import logging
+import contextlib
+import click
+from concurrent.futures import ThreadPoolExecutor
+
+# repo root on path, to import internal libs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.caldavAgent import CaldavAgent
+from agents.mgraphAgent import MGraphAgent
+from utils.benchmark import base_settings, make_events
+from core.concurrency import AdaptiveController, run_adaptive
+from utils.mock_servers import MockBackend, start_server
+
+
+
+# logger, per-event logs would dominate the measure and the report
+logging.basicConfig(level=logging.CRITICAL, force=True)
+logger = logging.getLogger(__name__)
+
+
+
+def make_agent(mode: str, url: str, transport: str = 'http1', pool_size: int = 10, payload: str = 'full', gzip: bool = False):
+    settings = base_settings | {"http_pool_size" : pool_size, "payload_profile" : payload, "gzip_requests" : gzip}
+    if transport == 'http2':
+        settings['http2'] = "prior_knowledge"
+
+    if mode == 'caldav':
+        return CaldavAgent(settings | {"mode" : "caldav", "server" : f"{url}/caldav"})
+
+    agent = MGraphAgent(settings | {"mode" : "microsoft_graph"}, offline=True)
+    agent.graph_url = f"{url}/v1.0"
+    agent.access_token = "load-test-token"
+    return agent
+
+
+# nearest-rank percentile of sorted values
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1)]
+
+
+# submit all events with given workers, or adaptive up to max_concurrency if workers is 0. Returns report dict
+def run_load(agent, events: list, workers: int, max_concurrency: int = 32) -> dict:
+    latencies = []
+
+    def submit(event):
+        start = time.perf_counter()
+        res, msg = agent.create_event(event)
+        latencies.append(time.perf_counter() - start)
+        return res, msg
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = [res for res, msg in executor.map(submit, events)]
+        else:
+            controller = AdaptiveController(max_concurrency)
+            results = [res for i, e, res, msg in run_adaptive(enumerate(events), submit, agent.endpoint, controller)]
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'events': len(events),
+        'ok': sum(results),
+        'failed': len(results) - sum(results),
+        'seconds': elapsed,
+        'events/s': len(events) / elapsed if elapsed else 0,
+        'p50 ms': percentile(latencies, 50) * 1000,
+        'p95 ms': percentile(latencies, 95) * 1000,
+        'p99 ms': percentile(latencies, 99) * 1000,
+        'max ms': latencies[-1] * 1000 if latencies else 0,
+        'limits': controller.limits() if not workers else None,
+    }
+
+
+
+@click.command()
+@click.option("--mode", type=click.Choice(['caldav', 'microsoft_graph', 'both']), default='both', help='agent(s) to drive. Default: both')
+@click.option("--events", type=int, default=1000, help='events to submit per agent. Default: 1000')
+@click.option("--workers", type=str, default="1,4,16,adaptive", help='comma separated concurrent workers to test, or adaptive. Default: "1,4,16,adaptive"')
+@click.option("--max_concurrency", type=int, default=32, help='max in-flight requests of adaptive workers. Default: 32')
+@click.option("--transport", type=click.Choice(['http1', 'http2', 'both']), default='http1', help='HTTP transport(s) to test. Default: http1')
+@click.option("--payload", type=click.Choice(['full', 'lean']), default='full', help='agents payload profile. Default: full')
+@click.option("--gzip", is_flag=True, default=False, help='gzip request bodies')
+@click.option("--url", type=str, default="", help='base URL of running servers. Default: start local stand-in servers')
+@click.option("--latency", type=float, default=0.02, help='stand-in servers latency per request, seconds. Default: 0.02')
+@click.option("--jitter", type=float, default=0.01, help='stand-in servers random latency, seconds. Default: 0.01')
+@click.option("--error_rate", type=float, default=0.0, help='stand-in servers fraction of 503 answers')
+@click.option("--throttle_rps", type=float, default=0.0, help='stand-in servers requests per second before 429')
+@click.option("--capacity", type=int, default=0, help='stand-in servers concurrent requests at full speed. Default: no limit')
+def main(mode, events, workers, max_concurrency, transport, payload, gzip, url, latency, jitter, error_rate, throttle_rps, capacity):
+    server = None
+    if not url:
+        server, url = start_server(backend=MockBackend(latency, jitter, error_rate, throttle_rps, capacity))
+
+    modes = ['caldav', 'microsoft_graph'] if mode == 'both' else [mode]
+    transports = ['http1', 'http2'] if transport == 'both' else [transport]
+    events_list = make_events(events)
+
+    print(f"{'mode':<17}{'http':>6}{'workers':>8}{'ok':>8}{'failed':>8}{'events/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for agent_mode in modes:
+        for agent_transport in transports:
+            for n_workers in [0 if w.strip() == 'adaptive' else int(w) for w in workers.split(',')]:
+                # one pooled connection per worker on HTTP/1.1, HTTP/2 multiplexes them anyway
+                agent = make_agent(agent_mode, url, agent_transport, pool_size=n_workers or max_concurrency, payload=payload, gzip=gzip)
+                report = run_load(agent, events_list, n_workers, max_concurrency)
+                print(f"{agent_mode:<17}{agent_transport:>6}{n_workers or 'adapt':>8}{report['ok']:>8}{report['failed']:>8}{report['events/s']:>10.0f}"
+                      f"{report['p50 ms']:>9.1f}{report['p95 ms']:>9.1f}{report['p99 ms']:>9.1f}{report['max ms']:>9.1f}"
+                      f"{'  limits: ' + str(report['limits']) if report['limits'] else ''}")
+
+    if server:
+        print(f"\nStand-in servers stats: {server.backend.stats}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+
+"""
+# mirror_calendars.py
+2025-07-04
+
+Mirrors the events of a calendar from one account to another one, CalDAV to Graph or Graph to CalDAV (or same backend),
+see calendar_pyhandler/mirror.py. Reruns send only new and changed events, the UID/ID mapping is kept in the sync index.
+Recurring events are copied as single occurrences, expanded by the source server. Dates are dd/mm/YYYY, end included.
+
+Usage:
+    python utils/mirror_calendars.py --source caldav_settings.json --target graph_settings.json --start 01/07/2025 --end 31/12/2025
+                                     [--source_cal personal] [--target_cal personal] [--target_group] [--delete] [--attendees]
+"""
+
+import os
+import sys
+import time
+import click
+from datetime import datetime, timedelta
+
+# repo root on path, to import internal libs
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from calendar_pyhandler import Client, mirror
+from core.eventBuilder import check_date, is_after_date
+
+
+
+@click.command()
+@click.option("--source", type=str, required=True, help='"path\\to\\source_settings.json", account to read events from')
+@click.option("--target", type=str, required=True, help='"path\\to\\target_settings.json", account to write events to')
+@click.option("--start", type=str, required=True, help='"dd/mm/YYYY", first day to mirror')
+@click.option("--end", type=str, required=True, help='"dd/mm/YYYY", last day to mirror')
+@click.option("--source_cal", type=str, default="", help='source calendar ID. Default: source settings "calendar"')
+@click.option("--source_group", is_flag=True, help="source calendar is a group calendar (Graph)")
+@click.option("--target_cal", type=str, default="", help='target calendar ID. Default: target settings "calendar"')
+@click.option("--target_group", is_flag=True, help="target calendar is a group calendar (Graph)")
+@click.option("--delete", is_flag=True, help="delete from the target the events mirrored before and gone from the source")
+@click.option("--attendees", is_flag=True, help="copy attendees too: the target backend sends them the invitations")
+def main(source, target, start, end, source_cal, source_group, target_cal, target_group, delete, attendees):
+    for day in (start, end):
+        date_ok, date_err = check_date(day)
+        if not date_ok:
+            raise click.BadParameter(str(date_err))
+    if is_after_date(start, end):
+        raise click.BadParameter(f"Start date cannot be after end date: {start}, {end}")
+
+    sync_index_file = os.path.join(ROOT_DIR, "sync_index.json")
+    etag_cache_file = os.path.join(ROOT_DIR, "etag_cache.json")
+    with Client(config=source, sync_index_file=sync_index_file) as source_client, \
+            Client(config=target, etag_cache_file=etag_cache_file, sync_index_file=sync_index_file) as target_client:
+        source_cal = source_cal or source_client.settings.get('calendar') or 'personal'
+        target_cal = target_cal or target_client.settings.get('calendar') or 'personal'
+
+        begin = time.perf_counter()
+        result = mirror(source_client, target_client,
+                        datetime.strptime(start, "%d/%m/%Y").date(), datetime.strptime(end, "%d/%m/%Y").date() + timedelta(days=1),
+                        source_cal, target_cal, source_group, target_group, delete=delete, attendees=attendees)
+
+    for r in result.failures:
+        print(f"ERROR {r.action}: {r.message}")
+    print(f"Mirror {source_cal} -> {target_cal}: {result.read} events read, {result.ok} sent, {result.failed} failed, "
+          f"{result.unchanged} unchanged, {result.echoes} mirrored from the target skipped, {time.perf_counter() - begin:.1f}s")
+    if result.error:
+        print(result.error)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,571 @@
+#!/usr/bin/python
+
+# Copyright 2025 Daniele Vercelli - ynad <info@danielevercelli.it>
+# https://github.com/ynad/calendar-pyhandler
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/>
+
+"""
+# mock_servers.py
+2025-06-12
+
+Local stand-in HTTP servers for CalDAV and Microsoft Graph, for benchmarks, load tests and offline tests of the agents.
+Events are kept in memory. Implemented subset:
+  * CalDAV: PUT / GET / DELETE / REPORT on {base}/caldav/{username}/{calendar}/{uid}, with ETags,
+            If-None-Match: * and If-Match conditional writes. PROPFIND on {base}/caldav/{username}/
+  * Graph:  POST / GET / PATCH / DELETE on /v1.0/me/events, /v1.0/me/calendars/{id}/events,
+            /v1.0/groups/{id}/events and /v1.0/$batch (max 20 requests per batch).
+            GET /v1.0/me/calendars and /v1.0/me/memberOf/microsoft.graph.group
+            POST /v1.0/me/calendar/getSchedule and CalDAV free-busy POST to {base}/caldav/{username}/outbox/, with
+            synthetic busy intervals per address (see busy_of). GET calendarView in UTC, paged with $top and $skip. CalDAV calendar-query filtered by time-range on the
+            DTSTART day, without expansion of recurring events
+
+Backend behavior is configurable: fixed latency plus random jitter, error rate (503 answers),
+throttling (429 with Retry-After once over the given requests per second) and capacity (concurrent requests
+served at full speed: over it latency grows with the load, over twice it requests are answered 503) and loss rate
+(event writes acknowledged, CalDAV with 202, but never stored: to test post-submit verification).
+Gzip request bodies (Content-Encoding: gzip) are accepted, Graph POST honors 'Prefer: return=minimal',
+received bytes are counted in stats.
+
+HTTP/1.1 keep-alive, and HTTP/2 with prior knowledge (h2c) when the client starts with the HTTP/2 preface
+and the optional h2 package is installed: streams of a connection are served concurrently.
+
+Usage:
+    python utils/mock_servers.py [--port 8080] [--latency 0.05] [--jitter 0.02] [--error_rate 0.01] [--throttle_rps 200] [--capacity 8] [--loss_rate 0.05]
+    CalDAV server setting: http://127.0.0.1:8080/caldav
+    Graph base URL:        http://127.0.0.1:8080/v1.0
+"""
+
+import gzip
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+import click
+import regex as re
+from datetime import datetime, time as day_time, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+from zoneinfo import ZoneInfo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+
+
+# logger
+logger = logging.getLogger(__name__)
+
+# Graph JSON batching limit
+GRAPH_BATCH_MAX = 20
+
+# HTTP/2 connection preface
+H2_PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+
+PATTERN_GRAPH_EVENTS = re.compile(r'^/v1\.0/(me|me/calendars/[^/]+|groups/[^/]+)/events(?:/([^/?]+))?')
+PATTERN_FOLD = re.compile(r'\r?\n[ \t]')
+PATTERN_GRAPH_VIEW = re.compile(r'^/v1\.0/(me|me/calendars/[^/]+|groups/[^/]+)/calendarView$')
+PATTERN_TIME_RANGE = re.compile(r'<(?:[\w-]+:)?time-range start="(\d{8})T\d{6}Z" end="(\d{8})T\d{6}Z"')
+PATTERN_DTSTART = re.compile(rb'\nDTSTART[^:\r\n]*:(\d{8})')
+PATTERN_ATTENDEE = re.compile(r'^ATTENDEE[^:\r\n]*:mailto:([^\r\n]+)', re.MULTILINE | re.IGNORECASE)
+PATTERN_FREEBUSY_RANGE = re.compile(r'^(DTSTART|DTEND)[^:\r\n]*:(\d{8}T\d{6}Z)', re.MULTILINE)
+PATTERN_MULTIGET_HREF = re.compile(r'<(?:[\w-]+:)?href>([^<]+)</(?:[\w-]+:)?href>')
+
+
+
+class MockBackend():
+
+    def __init__(self,
+                latency: float = 0.0,
+                jitter: float = 0.0,
+                error_rate: float = 0.0,
+                throttle_rps: float = 0.0,
+                capacity: int = 0,
+                loss_rate: float = 0.0,
+        ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.capacity = capacity
+        self.loss_rate = loss_rate
+        self.__in_flight = 0
+
+        # stored objects: CalDAV path -> (etag, ics), Graph event id -> event
+        self.caldav = {}
+        self.graph = {}
+
+        # discoverable calendars and groups, Graph events are not split by calendar
+        self.calendars = [{'id': 'personal', 'name': 'Personal'}, {'id': 'training-room', 'name': 'Training Room'}]
+        self.groups = [{'id': 'group-it', 'displayName': 'IT Team', 'groupTypes': ['Unified']}]
+        self.lock = threading.Lock()
+
+        # throttling token bucket
+        self.__tokens = throttle_rps
+        self.__last_refill = time.monotonic()
+
+        # counters
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'bytes_in': 0, 'lost': 0}
+
+
+    # True if request is allowed by the token bucket
+    def __take_token(self) -> bool:
+        if not self.throttle_rps:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.__tokens = min(self.throttle_rps, self.__tokens + (now - self.__last_refill) * self.throttle_rps)
+            self.__last_refill = now
+            if self.__tokens < 1:
+                return False
+            self.__tokens -= 1
+            return True
+
+
+    # route a request, returns status, headers and body
+    def handle(self, method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_in'] += len(body)
+
+        if headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        if not self.__take_token():
+            with self.lock:
+                self.stats['throttled'] += 1
+            return 429, {'Retry-After': '1'}, b'Too Many Requests'
+
+        with self.lock:
+            self.__in_flight += 1
+            in_flight = self.__in_flight
+        try:
+            # over capacity requests queue up, latency grows with load; over twice the capacity 503
+            if self.capacity and in_flight > 2 * self.capacity:
+                with self.lock:
+                    self.stats['errors'] += 1
+                return 503, {'Retry-After': '1'}, b'Service Unavailable'
+
+            if self.latency or self.jitter:
+                load = max(1.0, in_flight / self.capacity) if self.capacity else 1.0
+                time.sleep((self.latency + random.uniform(0, self.jitter)) * load)
+
+            if self.error_rate and random.random() < self.error_rate:
+                with self.lock:
+                    self.stats['errors'] += 1
+                return 503, {}, b'Service Unavailable'
+
+            return self.__route(method, path, headers, body)
+        finally:
+            with self.lock:
+                self.__in_flight -= 1
+
+
+    def __route(self, method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+
+        if path.startswith('/caldav/'):
+            return self.__caldav(method, path, headers, body)
+        if path == '/v1.0/$batch' and method == 'POST':
+            return self.__graph_batch(body)
+        if path.startswith('/v1.0/'):
+            return self.__graph(method, path, headers, body)
+        return 404, {}, b'Not Found'
+
+
+    def __caldav(self, method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        if method == 'PUT':
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            with self.lock:
+                current = self.caldav.get(path)
+                if headers.get('If-None-Match') == '*' and current:
+                    return 412, {}, b'Precondition Failed'
+                if headers.get('If-Match') and (not current or headers['If-Match'] != current[0]):
+                    return 412, {}, b'Precondition Failed'
+                # accepted for later processing, and never stored
+                if self.loss_rate and random.random() < self.loss_rate:
+                    self.stats['lost'] += 1
+                    return 202, {}, b''
+                self.caldav[path] = (etag, body)
+            return (204 if current else 201), {'ETag': etag}, b''
+
+        if method == 'GET':
+            current = self.caldav.get(path)
+            if not current:
+                return 404, {}, b'Not Found'
+            if headers.get('If-None-Match') == current[0]:
+                return 304, {'ETag': current[0]}, b''
+            return 200, {'ETag': current[0], 'Content-Type': 'text/calendar'}, current[1]
+
+        if method == 'DELETE':
+            with self.lock:
+                current = self.caldav.pop(path, None)
+            return (204 if current else 404), {}, b''
+
+        if method == 'POST' and path.rstrip('/').endswith('/outbox'):
+            return self.__caldav_freebusy(body)
+
+        if method == 'PROPFIND':
+            return 207, {'Content-Type': 'application/xml; charset=utf-8'}, self.__propfind(path)
+
+        if method == 'REPORT':
+            # calendar-multiget: only listed hrefs, calendar-query: whole collection or events starting in the time-range
+            text = body.decode('utf-8', errors='replace')
+            hrefs = PATTERN_MULTIGET_HREF.findall(text)
+            time_range = PATTERN_TIME_RANGE.search(text)
+            collection = path.rstrip('/') + '/'
+            with self.lock:
+                if hrefs:
+                    items = [(h, self.caldav.get(h)) for h in hrefs]
+                else:
+                    items = [(h, v) for h, v in self.caldav.items() if h.startswith(collection)]
+            if time_range:
+                items = [(h, v) for h, v in items if self.__starts_in(v[1], *time_range.groups())]
+            return 207, {'Content-Type': 'application/xml; charset=utf-8'}, self.__multistatus(items)
+
+        return 405, {}, b'Method Not Allowed'
+
+
+    # calendar home listing: configured calendars plus the ones with stored events
+    def __propfind(self, path: str) -> bytes:
+        home = path.rstrip('/') + '/'
+        with self.lock:
+            names = {c['id']: c['name'] for c in self.calendars}
+            for href in self.caldav:
+                if href.startswith(home):
+                    names.setdefault(href[len(home):].split('/')[0], None)
+        out = ['<?xml version="1.0" encoding="utf-8"?>\n<d:multistatus xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">',
+               f'<d:response><d:href>{home}</d:href><d:propstat><d:prop><d:resourcetype><d:collection/></d:resourcetype></d:prop></d:propstat></d:response>']
+        for cal_id, name in names.items():
+            out.append(f'<d:response><d:href>{home}{cal_id}/</d:href><d:propstat><d:prop><d:displayname>{name or cal_id}</d:displayname>'
+                       f'<d:resourcetype><d:collection/><cal:calendar/></d:resourcetype></d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>')
+        out.append('</d:multistatus>')
+        return "\n".join(out).encode('utf-8')
+
+
+    # DTSTART day of an ICS in [start, end), days as YYYYMMDD. Time zones are ignored
+    @staticmethod
+    def __starts_in(ics: bytes, start: str, end: str) -> bool:
+        match = PATTERN_DTSTART.search(ics, max(0, ics.find(b'BEGIN:VEVENT')))
+        return bool(match) and start <= match.group(1).decode('ascii') < end
+
+
+    @staticmethod
+    def __multistatus(items: list) -> bytes:
+        out = ['<?xml version="1.0" encoding="utf-8"?>\n<d:multistatus xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">']
+        for href, value in items:
+            if value is None:
+                out.append(f'<d:response><d:href>{href}</d:href><d:status>HTTP/1.1 404 Not Found</d:status></d:response>')
+                continue
+            ics = value[1].decode('utf-8').replace('&', '&amp;').replace('<', '&lt;')
+            out.append(f'<d:response><d:href>{href}</d:href><d:propstat><d:prop><d:getetag>{value[0]}</d:getetag>'
+                       f'<cal:calendar-data>{ics}</cal:calendar-data></d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>')
+        out.append('</d:multistatus>')
+        return "\n".join(out).encode('utf-8')
+
+
+    def __graph(self, method: str, path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        if method == 'GET' and path.split('?')[0] == '/v1.0/me/calendars':
+            return 200, {'Content-Type': 'application/json'}, json.dumps({'value': self.calendars}).encode('utf-8')
+        if method == 'GET' and path.split('?')[0] == '/v1.0/me/memberOf/microsoft.graph.group':
+            return 200, {'Content-Type': 'application/json'}, json.dumps({'value': self.groups}).encode('utf-8')
+
+        if method == 'POST' and path == '/v1.0/me/calendar/getSchedule':
+            return self.__graph_schedule(body)
+        if method == 'GET' and PATTERN_GRAPH_VIEW.match(path.split('?')[0]):
+            return self.__graph_view(path, headers)
+
+        match = PATTERN_GRAPH_EVENTS.match(path)
+        if not match:
+            return 404, {}, b'{"error": {"code": "ResourceNotFound"}}'
+        event_id = match.group(2)
+
+        if method == 'POST' and not event_id:
+            event = json.loads(body or b'{}')
+            event['id'] = uuid.uuid4().hex
+            with self.lock:
+                # created and then lost, e.g. removed by a mailbox policy
+                if self.loss_rate and random.random() < self.loss_rate:
+                    self.stats['lost'] += 1
+                else:
+                    self.graph[event['id']] = event
+            if headers.get('Prefer') == 'return=minimal':
+                return 204, {'Location': f"{path}/{event['id']}"}, b''
+            return 201, {'Content-Type': 'application/json'}, json.dumps(event).encode('utf-8')
+
+        if method == 'GET' and not event_id:
+            with self.lock:
+                events = list(self.graph.values())
+            return 200, {'Content-Type': 'application/json'}, json.dumps({'value': events}).encode('utf-8')
+
+        with self.lock:
+            event = self.graph.get(event_id)
+        if event is None:
+            return 404, {}, b'{"error": {"code": "ErrorItemNotFound"}}'
+
+        if method == 'GET':
+            return 200, {'Content-Type': 'application/json'}, json.dumps(event).encode('utf-8')
+        if method == 'PATCH':
+            with self.lock:
+                event.update(json.loads(body or b'{}'))
+            return 200, {'Content-Type': 'application/json'}, json.dumps(event).encode('utf-8')
+        if method == 'DELETE':
+            with self.lock:
+                self.graph.pop(event_id, None)
+            return 204, {}, b''
+
+        return 405, {}, b''
+
+
+    # synthetic busy intervals of an address, the same on every call: 0 to 3 blocks of 1 to 3 hours per weekday, from 07
+    # to 19 UTC. Addresses of .invalid domains have no free/busy (None)
+    @staticmethod
+    def busy_of(address: str, start: datetime, end: datetime) -> list:
+        if address.lower().endswith('.invalid'):
+            return None
+        busy = []
+        day = start.date()
+        while datetime.combine(day, day_time(), timezone.utc) < end:
+            if day.weekday() < 5:
+                rng = random.Random(f"{address.lower()}|{day}")
+                for _ in range(rng.randint(0, 3)):
+                    block_start = datetime.combine(day, day_time(rng.randint(7, 16)), timezone.utc)
+                    block_end = block_start + timedelta(hours=rng.randint(1, 3))
+                    if block_start < end and block_end > start:
+                        busy.append((max(block_start, start), min(block_end, end)))
+            day += timedelta(days=1)
+        return busy
+
+
+    # getSchedule with synthetic busy intervals, in UTC
+    def __graph_schedule(self, body: bytes) -> tuple[int, dict, bytes]:
+        request = json.loads(body or b'{}')
+        start, end = (datetime.fromisoformat(request[k]['dateTime'][:19]).replace(tzinfo=timezone.utc) for k in ('startTime', 'endTime'))
+        value = []
+        for address in request.get('schedules', []):
+            busy = self.busy_of(address, start, end)
+            if busy is None:
+                value.append({'scheduleId': address, 'error': {'message': 'Mailbox not found', 'responseCode': 'ErrorMailRecipientNotFound'}})
+                continue
+            value.append({'scheduleId': address, 'scheduleItems': [
+                {'status': 'busy', 'start': {'dateTime': s.strftime('%Y-%m-%dT%H:%M:%S.0000000'), 'timeZone': 'UTC'},
+                 'end': {'dateTime': e.strftime('%Y-%m-%dT%H:%M:%S.0000000'), 'timeZone': 'UTC'}} for s, e in busy]})
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'value': value}).encode('utf-8')
+
+
+    # VFREEBUSY request to the scheduling outbox, with synthetic busy intervals
+    def __caldav_freebusy(self, body: bytes) -> tuple[int, dict, bytes]:
+        text = body.decode('utf-8', errors='replace')
+        times = dict(PATTERN_FREEBUSY_RANGE.findall(text))
+        if len(times) != 2:
+            return 400, {}, b'Bad Request'
+        start, end = (datetime.strptime(times[k], '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc) for k in ('DTSTART', 'DTEND'))
+        out = ['<?xml version="1.0" encoding="utf-8"?>\n<cal:schedule-response xmlns:d="DAV:" xmlns:cal="urn:ietf:params:xml:ns:caldav">']
+        for address in PATTERN_ATTENDEE.findall(PATTERN_FOLD.sub('', text)):
+            busy = self.busy_of(address.strip(), start, end)
+            if busy is None:
+                out.append(f'<cal:response><cal:recipient><d:href>mailto:{address}</d:href></cal:recipient>'
+                           '<cal:request-status>3.7;Invalid calendar user</cal:request-status></cal:response>')
+                continue
+            lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "METHOD:REPLY", "BEGIN:VFREEBUSY", f"DTSTART:{start:%Y%m%dT%H%M%SZ}", f"DTEND:{end:%Y%m%dT%H%M%SZ}"]
+            if busy:
+                lines.append("FREEBUSY;FBTYPE=BUSY:" + ",".join(f"{s:%Y%m%dT%H%M%SZ}/{e:%Y%m%dT%H%M%SZ}" for s, e in busy))
+            data = "\r\n".join(lines + ["END:VFREEBUSY", "END:VCALENDAR", ""])
+            out.append(f'<cal:response><cal:recipient><d:href>mailto:{address}</d:href></cal:recipient>'
+                       f'<cal:request-status>2.0;Success</cal:request-status><cal:calendar-data>{data}</cal:calendar-data></cal:response>')
+        out.append('</cal:schedule-response>')
+        return 200, {'Content-Type': 'application/xml; charset=utf-8'}, "\n".join(out).encode('utf-8')
+
+
+    # calendarView: events starting in [startDateTime, endDateTime), in UTC, paged by $top and $skip
+    # all the events are in one collection, like for /events
+    def __graph_view(self, path: str, headers: dict) -> tuple[int, dict, bytes]:
+        query = {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+        start, end = (datetime.fromisoformat(query[k].replace('Z', '+00:00')) for k in ('startDateTime', 'endDateTime'))
+        top, skip = int(query.get('$top', 10)), int(query.get('$skip', 0))
+
+        def utc(value: dict) -> dict:
+            moment = datetime.fromisoformat(value['dateTime'][:19]).replace(tzinfo=ZoneInfo(value.get('timeZone') or 'UTC'))
+            return {'dateTime': moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.0000000'), 'timeZone': 'UTC'}
+
+        with self.lock:
+            # full day events are not moved across time zones
+            events = [event if event.get('isAllDay') else event | {'start': utc(event['start']), 'end': utc(event['end'])}
+                      for event in self.graph.values()]
+        events = [e for e in events if start <= datetime.fromisoformat(e['start']['dateTime'][:19]).replace(tzinfo=timezone.utc) < end]
+        events.sort(key=lambda e: (e['start']['dateTime'], e['id']))
+
+        page = {'value': events[skip:skip + top]}
+        if skip + top < len(events):
+            query['$skip'] = str(skip + top)
+            page['@odata.nextLink'] = f"http://{headers.get('Host') or headers.get(':authority')}{urlsplit(path).path}?" + "&".join(f"{k}={v}" for k, v in query.items())
+        return 200, {'Content-Type': 'application/json'}, json.dumps(page).encode('utf-8')
+
+
+    # JSON batching: each request is routed as a standalone one
+    def __graph_batch(self, body: bytes) -> tuple[int, dict, bytes]:
+        batch = json.loads(body or b'{}').get('requests', [])
+        if len(batch) > GRAPH_BATCH_MAX:
+            return 400, {}, f'{{"error": {{"code": "BadRequest", "message": "max {GRAPH_BATCH_MAX} requests per batch"}}}}'.encode('utf-8')
+
+        responses = []
+        for req in batch:
+            req_body = json.dumps(req['body']).encode('utf-8') if 'body' in req else b''
+            status, headers, resp = self.handle(req['method'], f"/v1.0{req['url']}", req.get('headers', {}), req_body)
+            responses.append({
+                'id': req['id'],
+                'status': status,
+                'headers': headers,
+                'body': json.loads(resp) if resp and headers.get('Content-Type') == 'application/json' else None
+            })
+        return 200, {'Content-Type': 'application/json'}, json.dumps({'responses': responses}).encode('utf-8')
+
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # keep-alive, like the real servers
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes, Nagle + delayed ACK would add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+    def __dispatch(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+
+        status, headers, resp = self.server.backend.handle(self.command, self.path, dict(self.headers), body)
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(resp)))
+        self.end_headers()
+        if resp:
+            self.wfile.write(resp)
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = do_REPORT = do_PROPFIND = __dispatch
+
+
+    def handle(self):
+        # HTTP/2 prior knowledge clients start with 'PRI * HTTP/2.0'
+        if h2 and self.rfile.peek(len(H2_PREFACE)).startswith(H2_PREFACE[:4]):
+            return self.__handle_h2()
+        super().handle()
+
+
+    # serve an h2c connection: each request stream is answered by its own thread
+    def __handle_h2(self):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        cond = threading.Condition()
+        streams = {}
+
+        def flush():
+            data = conn.data_to_send()
+            if data:
+                self.wfile.write(data)
+
+        def respond(stream_id, headers, body):
+            # backend expects HTTP/1.1 style header names
+            method, path = headers.pop(':method'), headers.pop(':path')
+            headers = {'-'.join(p.capitalize() for p in k.split('-')): v for k, v in headers.items() if not k.startswith(':')}
+            status, resp_headers, resp = self.server.backend.handle(method, path, headers, bytes(body))
+
+            with cond:
+                conn.send_headers(stream_id, [(':status', str(status))] + [(k.lower(), v) for k, v in resp_headers.items()]
+                                  + [('content-length', str(len(resp)))], end_stream=not resp)
+                # send body within flow control window
+                while resp:
+                    size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size, len(resp))
+                    if size <= 0:
+                        flush()
+                        cond.wait()
+                        continue
+                    conn.send_data(stream_id, resp[:size], end_stream=(size == len(resp)))
+                    resp = resp[size:]
+                flush()
+
+        with cond:
+            conn.initiate_connection()
+            flush()
+
+        while True:
+            data = self.rfile.read1(65536)
+            if not data:
+                break
+            with cond:
+                events = conn.receive_data(data)
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        streams[event.stream_id] = (dict(event.headers), bytearray())
+                    elif isinstance(event, h2.events.DataReceived):
+                        streams[event.stream_id][1].extend(event.data)
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        threading.Thread(target=respond, args=(event.stream_id, *streams.pop(event.stream_id)), daemon=True).start()
+                    elif isinstance(event, h2.events.WindowUpdated):
+                        cond.notify_all()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        flush()
+                        return
+                flush()
+
+
+
+class MockServer(ThreadingHTTPServer):
+    # default backlog of 5 drops connections under load tests
+    request_queue_size = 128
+
+
+
+# start a server in a daemon thread, returns server and its base URL. Backend state is server.backend
+def start_server(port: int = 0, host: str = '127.0.0.1', backend: MockBackend = None) -> tuple[MockServer, str]:
+    server = MockServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.backend = backend if backend else MockBackend()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://{host}:{server.server_address[1]}"
+    logger.info(f"mock server listening on {url}")
+    return server, url
+
+
+
+@click.command()
+@click.option("--port", type=int, default=8080, help='listening port. Default: 8080')
+@click.option("--latency", type=float, default=0.0, help='fixed latency per request, seconds')
+@click.option("--jitter", type=float, default=0.0, help='max random latency added per request, seconds')
+@click.option("--error_rate", type=float, default=0.0, help='fraction of requests answered with 503')
+@click.option("--throttle_rps", type=float, default=0.0, help='requests per second before answering 429. Default: no limit')
+@click.option("--capacity", type=int, default=0, help='concurrent requests served at full speed. Default: no limit')
+@click.option("--loss_rate", type=float, default=0.0, help='fraction of event writes acknowledged but not stored (CalDAV 202)')
+def main(port, latency, jitter, error_rate, throttle_rps, capacity, loss_rate):
+    server, url = start_server(port, backend=MockBackend(latency, jitter, error_rate, throttle_rps, capacity, loss_rate))
+    print(f"Mock servers listening on {url}\n  CalDAV server: {url}/caldav\n  Graph base URL: {url}/v1.0\nCTRL+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Stats: {server.backend.stats}")
+
+
+if __name__ == '__main__':
+    main()